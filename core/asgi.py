@@ -13,4 +13,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: sends 103 Early Hints on servers that support them
+from elearning_app.preload import EarlyHintsApp  # noqa: E402
+from elearning_app.suggest import warm_index  # noqa: E402
+
+# The search suggestion index is ready before the first request
+warm_index()
+
+application = EarlyHintsApp(django_application)
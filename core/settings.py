@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from pathlib import Path
 
 
@@ -32,6 +33,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'elearning_app.middleware.CompressionMiddleware',
+    'elearning_app.middleware.HTMLMinifyMiddleware',
+    'elearning_app.middleware.PreloadMiddleware',
+    'elearning_app.middleware.PageViewMiddleware',
+    'elearning_app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,9 +74,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            # Wait for concurrent writers instead of failing immediately
+            'timeout': 20,
+            # Take the write lock at BEGIN: upgrading a read lock mid-transaction
+            # fails at once with SQLITE_BUSY instead of waiting out the timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file, not :memory:, so tests can use concurrent connections
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Read-only snapshot of 'default' kept fresh by `manage.py refresh_replica`
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['elearning_app.routers.ReplicaRouter']
+
+# Public GET requests read from the replica, except under these paths
+REPLICA_EXCLUDED_PATHS = ['/admin/']
+# After a write the visitor reads from the primary for this long (> refresh interval)
+REPLICA_STICKY_SECONDS = 120
+# Reads go back to the primary when `refresh_replica` hasn't checked in for this
+# long (it touches the replica file on every pass, even with nothing to copy)
+REPLICA_MAX_AGE_SECONDS = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -121,7 +159,128 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Cache
+# Both caches are SQLite files on local disk, shared by every gunicorn worker
+CACHES = {
+    'default': {
+        'BACKEND': 'elearning_app.cache_backends.SQLiteCache',
+        'LOCATION': BASE_DIR / '.cache' / 'default.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'ratelimit': {
+        'BACKEND': 'elearning_app.cache_backends.SQLiteCache',
+        'LOCATION': BASE_DIR / '.cache' / 'ratelimit.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+}
+
+# Response compression (brotli when the Brotli package is installed, else gzip)
+COMPRESSION_MIN_SIZE = 860              # smaller bodies fit in one packet anyway
+COMPRESSION_CACHE = 'default'           # compressed bodies are memoized here...
+COMPRESSION_CACHE_TIMEOUT = 60 * 60     # ...keyed by a hash of the uncompressed page
+
+# Strip comments and collapse whitespace in rendered HTML
+# (`manage.py benchmark_minify` shows the bytes saved and the CPU cost)
+HTML_MINIFY = True
+
+# No preload Link headers for these (HTML fragments, JSON)
+PRELOAD_EXCLUDED_PATHS = ['/api/']
+
+# Contact form abuse protection
+RATELIMIT_CACHE = 'ratelimit'
+# Proxies in front of Django that append to X-Forwarded-For. 0 (the header is
+# ignored) unless the deployment sets it: TRUSTED_PROXY_COUNT=1 behind nginx.
+# Trusting a header nobody appends to lets every visitor pick their own address.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+CONTACT_RATELIMIT_BURST = 5             # messages allowed back to back per IP
+CONTACT_RATELIMIT_REFILL_SECONDS = 120  # one more message allowed every 2 minutes
+CONTACT_DUPLICATE_WINDOW = 60 * 60      # drop identical messages for an hour
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once under a content hash (see elearning_app/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'elearning_app.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_GC_MIN_AGE = 60 * 60  # gc_media leaves files younger than this alone (uploads in flight)
+
+# Module attachments are kept here, outside MEDIA_ROOT, so no /media/ URL reaches
+# them. '' streams them from Django, 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache) lets the web server send the file (see downloads.py)
+PRIVATE_MEDIA_ROOT = BASE_DIR / 'private_media'
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Resumable chunked uploads from the admin (see elearning_app/uploads.py).
+# Keep the directory on the same disk as PRIVATE_MEDIA_ROOT so finishing an upload
+# is a rename; nginx client_max_body_size must be at least the chunk size.
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'tmp' / 'uploads'
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+CHUNKED_UPLOAD_EXPIRE_SECONDS = 24 * 60 * 60  # unfinished uploads are dropped after a day
+
+
+
+# Email
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '') == '1'
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'  # used by the filebased backend
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@satfergana.uz')
+
+# Contact form notifications (sent in the background by `manage.py run_worker`)
+CONTACT_NOTIFICATION_EMAILS = [
+    email for email in os.environ.get('CONTACT_NOTIFICATION_EMAILS', '').split(',') if email
+]
+CONTACT_DIGEST_SIZE = 20        # one email per this many messages...
+CONTACT_DIGEST_SECONDS = 300    # ...or after this many seconds, whichever comes first
+
+# Pre-rendered public pages served by nginx (`manage.py prerender_site`)
+PRERENDER_ROOT = BASE_DIR / 'prerendered'
+PRERENDER_ON_SAVE = True        # re-render affected pages after admin edits
+PRERENDER_DELAY_SECONDS = 10    # edits within this window share one re-render
+
+# sitemap.xml, pre-generated with .gz siblings (`manage.py build_sitemaps`)
+SITE_URL = os.environ.get('SITE_URL', 'https://satfergana.uz')  # sitemap URLs are absolute
+SITEMAP_ROOT = PRERENDER_ROOT / 'sitemaps'
+SITEMAP_SHARD_SIZE = 50000      # URLs per course sitemap file (the protocol's maximum)
+SITEMAP_ON_SAVE = True          # rebuild after course, category and testimonial edits
+SITEMAP_DELAY_SECONDS = 60      # edits within this window share one rebuild
+
+# Related courses (see elearning_app/related.py)
+RELATED_COURSES_K = 4
+RELATED_COURSES_DELAY_SECONDS = 30  # course edits within this window share one rebuild
+
+# Search suggestions: how often a worker checks whether its prefix index is stale
+SUGGEST_CHECK_SECONDS = 1.0
+
+# View counters are kept in memory and written every ANALYTICS_FLUSH_SECONDS
+# (see elearning_app/analytics.py); a crash loses at most one interval
+ANALYTICS_ENABLED = True
+ANALYTICS_FLUSH_SECONDS = 10
+ANALYTICS_EXCLUDED_PATHS = ['/admin/', '/api/']
+
+# Trending score (see elearning_app/trending.py): what each event is worth
+# and how fast it fades
+TRENDING_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+TRENDING_HALF_LIFE_DAYS = 7
+TRENDING_WEIGHTS = {
+    'enrollment': 5.0,
+    'testimonial': 3.0,
+    'rating': 1.0,  # per review, scaled from -1 (1 star) to +1 (5 stars)
+    'view': 0.1,
+}
+# Scores move without saving anything, so pages listing trending courses are
+# refreshed (and re-rendered) on this schedule by the job worker
+TRENDING_REFRESH_SECONDS = 15 * 60
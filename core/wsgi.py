@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Imported after setup: the search suggestion index is ready before the first request
+from elearning_app.suggest import warm_index  # noqa: E402
+
+warm_index()
@@ -1,7 +1,21 @@
 # media/admin.py
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.urls import path, reverse
 from django.utils.html import format_html
 from .models import *
+from .jobs import requeue_dead_jobs
+from .caching import invalidate
+from .enrollment import claim_enrollment, delete_enrollment, release_enrollment
+from .prerender import schedule_prerender
+from .uploads import upload_chunk_view, upload_complete_view, upload_start_view
+
+
+def data_changed(*tags):
+    """queryset.update() sends no signals: drop cached blocks and re-render pages here"""
+    invalidate(*tags)
+    schedule_prerender(tags)
 
 
 @admin.register(Category)
@@ -78,6 +92,7 @@ class InstructorAdmin(admin.ModelAdmin):
 
     def mark_as_featured(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        data_changed('instructors', 'courses')
         self.message_user(request, f'{updated} instructors marked as featured.')
 
     mark_as_featured.short_description = "Mark selected instructors as featured"
@@ -158,12 +173,14 @@ class CourseAdmin(admin.ModelAdmin):
 
     def publish_courses(self, request, queryset):
         updated = queryset.update(is_published=True)
+        data_changed('courses')
         self.message_user(request, f'{updated} courses published.')
 
     publish_courses.short_description = "Publish selected courses"
 
     def feature_courses(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        data_changed('courses')
         self.message_user(request, f'{updated} courses marked as featured.')
 
     feature_courses.short_description = "Feature selected courses"
@@ -268,23 +285,49 @@ class TestimonialAdmin(admin.ModelAdmin):
 
     def mark_as_featured(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        data_changed('testimonials')
         self.message_user(request, f'{updated} testimonials marked as featured.')
 
     mark_as_featured.short_description = "Mark selected testimonials as featured"
 
     def mark_as_verified(self, request, queryset):
         updated = queryset.update(verified=True)
+        data_changed('testimonials')
         self.message_user(request, f'{updated} testimonials verified.')
 
     mark_as_verified.short_description = "Mark selected testimonials as verified"
 
     def activate_testimonials(self, request, queryset):
         updated = queryset.update(is_active=True)
+        # queryset.update() skips the signals that keep the rollup in sync
+        TestimonialStats.rebuild()
+        data_changed('testimonials')
         self.message_user(request, f'{updated} testimonials activated.')
 
     activate_testimonials.short_description = "Activate selected testimonials"
 
 
+@admin.register(TestimonialStats)
+class TestimonialStatsAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'course', 'count', 'average_rating', 'satisfaction_rate', 'updated_at']
+    readonly_fields = [
+        'scope', 'course', 'count',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'updated_at'
+    ]
+    actions = ['rebuild_stats']
+
+    def has_add_permission(self, request):
+        return False
+
+    def rebuild_stats(self, request, queryset):
+        TestimonialStats.rebuild()
+        data_changed('testimonials')
+        self.message_user(request, 'Testimonial statistics rebuilt.')
+
+    rebuild_stats.short_description = "Rebuild all testimonial statistics"
+
+
 @admin.register(Banner)
 class BannerAdmin(admin.ModelAdmin):
     list_display = ['title', 'is_active', 'display_order']
@@ -327,4 +370,166 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_editable = ['status']
 
 
-admin.site.register(Module)
+
+class EnrollmentAdminForm(forms.ModelForm):
+    class Meta:
+        model = Enrollment
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        course = cleaned_data.get('course') or getattr(self.instance, 'course', None)
+        taking_seat = cleaned_data.get('is_active') and not (self.instance.pk and self.initial.get('is_active'))
+        # The admin's transaction holds the write lock (transaction_mode IMMEDIATE),
+        # so the seat count can't change between this check and save_model()
+        if taking_seat and course is not None:
+            course.refresh_from_db(fields=['enrolled_students', 'max_students'])
+            if course.enrolled_students >= course.max_students:
+                raise ValidationError(f'{course} is full ({course.max_students} students).')
+        return cleaned_data
+
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(admin.ModelAdmin):
+    """Seats are claimed and given back through enrollment.py, as on the site"""
+    form = EnrollmentAdminForm
+    list_display = ['student', 'course', 'is_active', 'enrolled_at', 'completed_at']
+    list_filter = ['is_active', 'course']
+    list_select_related = ['student__user', 'course']
+    search_fields = ['student__user__username', 'student__user__email', 'course__title']
+    raw_id_fields = ['student', 'course']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Moving an enrollment to another course would skip both seat counts
+        return ['student', 'course', 'enrolled_at'] if obj else ['enrolled_at']
+
+    def save_model(self, request, obj, form, change):
+        was_active = change and form.initial.get('is_active')
+        if obj.is_active and not was_active:
+            enrollment = claim_enrollment(obj.student, obj.course)
+            obj.pk, obj.enrolled_at = enrollment.pk, enrollment.enrolled_at
+            obj._state.adding = False
+        elif was_active and not obj.is_active:
+            release_enrollment(obj.student, obj.course)
+        super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        delete_enrollment(obj)
+
+    def delete_queryset(self, request, queryset):
+        for enrollment in queryset:
+            delete_enrollment(enrollment)
+
+class ChunkedFileInput(forms.ClearableFileInput):
+    """File input that sends the file in resumable chunks before the form is submitted"""
+
+    def __init__(self, upload_url_name, attrs=None):
+        super().__init__(attrs)
+        self.upload_url_name = upload_url_name
+
+    class Media:
+        js = ['js/chunked_upload.js']
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = {**(attrs or {}), 'data-chunked-upload': reverse(self.upload_url_name)}
+        return format_html(
+            '{}<input type="hidden" name="{}_upload" value="">'
+            '<div class="help chunked-upload-status" data-for="{}"></div>',
+            super().render(name, value, attrs, renderer),
+            name,
+            name,
+        )
+
+
+class ModuleAdminForm(forms.ModelForm):
+    # Set by ModuleAdmin.get_form; the upload must belong to whoever submits the form
+    request = None
+
+    class Meta:
+        model = Module
+        fields = '__all__'
+        widgets = {'attachment': ChunkedFileInput('admin:elearning_app_module_upload')}
+
+    def clean_attachment(self):
+        upload_id = self.data.get('attachment_upload')
+        if not upload_id:
+            return self.cleaned_data['attachment']
+        try:
+            upload = ChunkedUpload.objects.get(
+                pk=upload_id, user=self.request.user, status=ChunkedUpload.STATUS_COMPLETE
+            )
+        except (ChunkedUpload.DoesNotExist, ValidationError):
+            raise ValidationError('The uploaded file could not be found. Please upload it again.')
+        # Already in storage: the field only needs its name
+        return upload.stored_name
+
+
+@admin.register(Module)
+class ModuleAdmin(admin.ModelAdmin):
+    form = ModuleAdminForm
+    list_display = ['title', 'course', 'order', 'duration_minutes', 'is_free_preview']
+    list_filter = ['course', 'is_free_preview']
+    search_fields = ['title', 'course__title']
+
+    def get_form(self, request, obj=None, **kwargs):
+        # get_form builds a new class on every call, so this never leaks between requests
+        form = super().get_form(request, obj, **kwargs)
+        form.request = request
+        return form
+
+    def get_urls(self):
+        upload_urls = [
+            path('upload/', self.admin_site.admin_view(upload_start_view),
+                 name='elearning_app_module_upload'),
+            path('upload/<uuid:upload_id>/', self.admin_site.admin_view(upload_chunk_view),
+                 name='elearning_app_module_upload_chunk'),
+            path('upload/<uuid:upload_id>/complete/', self.admin_site.admin_view(self.upload_complete),
+                 name='elearning_app_module_upload_complete'),
+        ]
+        return upload_urls + super().get_urls()
+
+    def upload_complete(self, request, upload_id):
+        return upload_complete_view(request, upload_id, Module._meta.get_field('attachment'))
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['attempts', 'last_error', 'locked_by', 'locked_at', 'created_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = requeue_dead_jobs(queryset)
+        self.message_user(request, f'{updated} dead jobs queued again.')
+
+    retry_jobs.short_description = "Retry selected dead jobs"
+
+
+@admin.register(PageViewCount)
+class PageViewCountAdmin(admin.ModelAdmin):
+    list_display = ['path', 'day', 'views']
+    list_filter = ['day']
+    search_fields = ['path']
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CourseViewCount)
+class CourseViewCountAdmin(admin.ModelAdmin):
+    list_display = ['course', 'day', 'views', 'impressions']
+    list_filter = ['day', 'course']
+    list_select_related = ['course']
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
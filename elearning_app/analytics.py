@@ -0,0 +1,172 @@
+# elearning_app/analytics.py
+"""
+Page-view and course-impression counters, written in batches.
+
+Requests only bump in-process counters, which costs a dict update under a
+lock. A daemon thread per worker process writes the accumulated deltas
+every ANALYTICS_FLUSH_SECONDS, and whatever is left is written at
+interpreter exit. Each write is one transaction with one upsert statement
+per table, shaped `views = views + excluded.views`.
+
+Workers only ever add their own deltas, never absolute totals, so any
+number of processes can write the same rows. Counters are swapped out
+before they are written, and put back if the write fails, so every hit
+lands exactly once. A forked child starts with empty counters instead of
+its parent's copy. A crash loses at most one flush interval. Course page
+views also feed the trending score (trending.py) in the same transaction.
+
+Pre-rendered pages served directly by nginx (prerender.py) never reach
+Django and are not counted here. Rendering them runs the views, but on a
+request marked _prerender, which the record_* helpers skip.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Course, CourseViewCount, PageViewCount
+from .trending import record_views
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pages = Counter()      # (path, day) -> views
+_courses = Counter()    # (course_id, day, 'views' | 'impressions') -> count
+_owner = {'pid': None, 'database': None}
+
+
+def _started():
+    """Start this process's flusher once (again after a fork)"""
+    if _owner['pid'] == os.getpid():
+        return
+    with _lock:
+        if _owner['pid'] == os.getpid():
+            return
+        # Counts inherited from the parent are the parent's to write
+        _pages.clear()
+        _courses.clear()
+        _owner['pid'] = os.getpid()
+        _owner['database'] = connection.settings_dict['NAME']
+    threading.Thread(target=_flush_loop, name='analytics-flush', daemon=True).start()
+
+
+def _counted(request):
+    # prerender.render_page() runs views with no visitor behind the request
+    return settings.ANALYTICS_ENABLED and not getattr(request, '_prerender', False)
+
+
+def record_page_view(request):
+    if not _counted(request):
+        return
+    _started()
+    key = (request.path[:PageViewCount._meta.get_field('path').max_length], timezone.localdate())
+    with _lock:
+        _pages[key] += 1
+
+
+def record_course_view(request, course_id):
+    if not _counted(request):
+        return
+    _started()
+    with _lock:
+        _courses[(course_id, timezone.localdate(), 'views')] += 1
+
+
+def record_impressions(request, course_ids):
+    if not _counted(request):
+        return
+    _started()
+    day = timezone.localdate()
+    with _lock:
+        for course_id in course_ids:
+            _courses[(course_id, day, 'impressions')] += 1
+
+
+def _upsert(model, conflict_fields, count_fields, rows):
+    """INSERT ... ON CONFLICT DO UPDATE adding the new counts to the stored ones"""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [model._meta.get_field(name).column for name in (*conflict_fields, *count_fields)]
+    conflict = ', '.join(quote(model._meta.get_field(name).column) for name in conflict_fields)
+    updates = ', '.join(
+        f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}'
+        for column in (model._meta.get_field(name).column for name in count_fields)
+    )
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def flush():
+    """Write the counted deltas; returns the number of rows touched"""
+    with _lock:
+        pages, courses = _pages.copy(), _courses.copy()
+        _pages.clear()
+        _courses.clear()
+    if not pages and not courses:
+        return 0
+
+    per_course = {}
+    for (course_id, day, field), count in courses.items():
+        per_course.setdefault((course_id, day), {'views': 0, 'impressions': 0})[field] += count
+    page_rows = [(path, day, views) for (path, day), views in pages.items()]
+
+    try:
+        # A course deleted since it was counted would fail the whole batch
+        existing = set(Course.objects.filter(pk__in={key[0] for key in per_course}).values_list('pk', flat=True))
+        course_rows = [
+            (course_id, day, counts['views'], counts['impressions'])
+            for (course_id, day), counts in per_course.items()
+            if course_id in existing
+        ]
+        with transaction.atomic():
+            _upsert(PageViewCount, ['path', 'day'], ['views'], page_rows)
+            _upsert(CourseViewCount, ['course', 'day'], ['views', 'impressions'], course_rows)
+            views = Counter()
+            for course_id, _, count, _ in course_rows:
+                views[course_id] += count
+            record_views(views)
+    except Exception:
+        # Nothing was written: keep the deltas for the next attempt
+        with _lock:
+            _pages.update(pages)
+            _courses.update(courses)
+        raise
+    return len(page_rows) + len(course_rows)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.ANALYTICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Writing view counters failed; retrying next interval")
+        finally:
+            # This thread's connection must not outlive CONN_MAX_AGE unnoticed
+            connection.close()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _owner['pid'] != os.getpid():
+        return
+    if connection.settings_dict['NAME'] != _owner['database']:
+        # Counted against a database that is gone (a test run's), not this one
+        return
+    try:
+        flush()
+    except Exception:
+        logger.exception("Writing view counters at shutdown failed")
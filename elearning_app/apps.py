@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = 'elearning_app'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
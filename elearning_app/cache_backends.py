@@ -0,0 +1,296 @@
+# elearning_app/cache_backends.py
+"""
+Cache backend stored in a standalone SQLite file (WAL mode).
+
+Every gunicorn worker on the machine opens the same file, so cached values
+and invalidations are shared without running Redis or memcached. On top of
+the standard Django cache API it offers:
+
+* LRU eviction once MAX_ENTRIES is exceeded (OPTIONS['MAX_ENTRIES']),
+* atomic incr()/decr() done inside SQLite, safe across processes,
+* tags: set(key, value, tags=['courses']) then delete_tag('courses').
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_tag (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+"""
+
+# Reads only refresh the LRU timestamp when it is older than this, so hot
+# keys don't turn every get() into a write.
+ACCESS_RESOLUTION = 30
+
+# Check the entry count on roughly one in this many writes
+CULL_CHECK_EVERY = 50
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        self._schema_ready = False
+
+    # ---------- connection handling ----------
+
+    def _connection(self):
+        # One connection per thread, re-opened after a fork (gunicorn --preload)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- value encoding ----------
+
+    @staticmethod
+    def _encode(value):
+        # Plain ints are stored natively so incr() can run inside SQLite
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        # BaseCache already turns the timeout into an absolute timestamp (or None)
+        return self.get_backend_timeout(timeout)
+
+    # ---------- Django cache API ----------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._delete_keys([key])
+            return default
+        if now - accessed > ACCESS_RESOLUTION:
+            self._connection().execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ','.join('?' * len(key_map))
+        conn = self._connection()
+        rows = conn.execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*key_map, now),
+        ).fetchall()
+        # Same LRU bookkeeping as get(), one statement for the whole batch
+        stale = [key for key, _, accessed in rows if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            conn.execute(
+                f"UPDATE cache SET accessed = ? WHERE key IN ({','.join('?' * len(stale))})",
+                (now, *stale),
+            )
+        return {key_map[key]: self._decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self._expiry(timeout), time.time()),
+            )
+            self._tag(conn, key, tags)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        conn = self._connection()
+        expires, now = self._expiry(timeout), time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                key = self.make_and_validate_key(key, version=version)
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                    (key, self._encode(value), expires, now),
+                )
+                self._tag(conn, key, tags)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Insert, or overwrite only an entry that has already expired
+            cursor = conn.execute(
+                'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+                'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, self._encode(value), self._expiry(timeout), now, now),
+            )
+            added = cursor.rowcount == 1
+            if added:
+                self._tag(conn, key, tags)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "UPDATE cache SET value = value + ?, accessed = ? WHERE key = ? "
+            "AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) RETURNING value",
+            (delta, time.time(), key, time.time()),
+        ).fetchall()
+        if not row:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0][0]
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete_keys([key]) > 0
+
+    def delete_many(self, keys, version=None):
+        self._delete_keys([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache')
+        conn.execute('DELETE FROM cache_tag')
+
+    def close(self, **kwargs):
+        # Connections are long-lived on purpose; nothing to do per request
+        pass
+
+    # ---------- tags ----------
+
+    def delete_tag(self, *tags):
+        """Delete every entry that was stored with any of the given tags"""
+        if not tags:
+            return 0
+        conn = self._connection()
+        placeholders = ','.join('?' * len(tags))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute(
+                f'DELETE FROM cache WHERE key IN (SELECT key FROM cache_tag WHERE tag IN ({placeholders}))',
+                tags,
+            )
+            conn.execute(f'DELETE FROM cache_tag WHERE tag IN ({placeholders})', tags)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return cursor.rowcount
+
+    @staticmethod
+    def _tag(conn, key, tags):
+        if tags:
+            conn.executemany(
+                'INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)',
+                [(tag, key) for tag in tags],
+            )
+
+    # ---------- housekeeping ----------
+
+    def _delete_keys(self, keys):
+        if not keys:
+            return 0
+        placeholders = ','.join('?' * len(keys))
+        conn = self._connection()
+        cursor = conn.execute(f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+        conn.execute(f'DELETE FROM cache_tag WHERE key IN ({placeholders})', keys)
+        return cursor.rowcount
+
+    def _maybe_cull(self):
+        if random.randrange(CULL_CHECK_EVERY) == 0:
+            self.cull()
+
+    def cull(self):
+        """Drop expired entries, then the least recently used ones over MAX_ENTRIES"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries:
+                # Like Django's backends, remove 1/CULL_FREQUENCY of the entries at once
+                if self._cull_frequency == 0:
+                    excess = count
+                else:
+                    excess = count - self._max_entries + self._max_entries // self._cull_frequency
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (excess,),
+                )
+            conn.execute('DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache)')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
@@ -0,0 +1,105 @@
+# elearning_app/caching.py
+"""
+Single-flight caching for expensive blocks (home page, course facets, stats).
+
+cached() stores the value with a soft expiry and keeps serving it after that
+point while exactly one worker, holding a short cache lock, recomputes it
+(stale-while-revalidate). Entries may also be refreshed a little early at
+random, weighted by how long they take to compute, so a hot key doesn't
+expire in every worker at the same instant.
+
+Invalidation goes through per-tag generation stamps: invalidate('courses')
+makes every entry built with that tag stale, without deleting it. It only
+uses get/set/add/delete, so it works with any configured cache backend.
+"""
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import caches
+
+LOCK_WAIT_SECONDS = 5
+LOCK_POLL_SECONDS = 0.05
+
+# Set inside fresh_values(): stale entries are recomputed instead of served
+_fresh_only = ContextVar('cached_fresh_only', default=False)
+
+
+def _generation(cache, tags):
+    if not tags:
+        return ()
+    keys = [f'cache-gen:{tag}' for tag in tags]
+    stamps = cache.get_many(keys)
+    return tuple(stamps.get(key, 0) for key in keys)
+
+
+def generation(*tags, cache_alias='default'):
+    """Current stamps of tags; changes whenever one of them is invalidated"""
+    return _generation(caches[cache_alias], tags)
+
+
+def invalidate(*tags, cache_alias='default'):
+    """Mark every entry computed with one of these tags as stale"""
+    cache = caches[cache_alias]
+    cache.set_many({f'cache-gen:{tag}': time.time_ns() for tag in tags}, None)
+
+
+@contextmanager
+def fresh_values():
+    """Never serve stale entries inside this block (for output that outlives the request)"""
+    token = _fresh_only.set(True)
+    try:
+        yield
+    finally:
+        _fresh_only.reset(token)
+
+
+def _store(cache, key, compute, ttl, stale_ttl, generation):
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    cache.set(key, (value, time.time() + ttl, delta, generation), ttl + stale_ttl)
+    return value
+
+
+def cached(key, compute, ttl=300, stale_ttl=3600, tags=(), lock_timeout=30, beta=1.0, cache_alias='default'):
+    """Return the cached result of compute(), recomputing it in one worker at a time"""
+    cache = caches[cache_alias]
+    generation = _generation(cache, tags)
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, expires, delta, entry_generation = entry
+        # Probabilistic early expiration: -log(u) is usually small, occasionally large
+        early = delta * beta * -math.log(1.0 - random.random())
+        if entry_generation == generation and time.time() + early < expires:
+            return value
+
+        if _fresh_only.get():
+            return _store(cache, key, compute, ttl, stale_ttl, generation)
+
+        # Stale: one worker refreshes it, everyone else keeps serving the old value
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                return _store(cache, key, compute, ttl, stale_ttl, generation)
+            finally:
+                cache.delete(lock_key)
+        return value
+
+    # Nothing to serve yet: the lock holder computes, the others wait briefly for it
+    if not cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return compute()
+
+    try:
+        return _store(cache, key, compute, ttl, stale_ttl, generation)
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,53 @@
+# elearning_app/cards.py
+"""
+Rendered course cards, cached per course.
+
+The courses grid and its infinite-scroll batches are made of the same
+card, so each course's card HTML is rendered once and reused. Keys
+include the course's updated_at and the 'instructors' generation (the card
+shows the instructor's name), so an edit simply produces a new key. A
+whole batch is looked up with one get_many().
+
+Cards in the first row are rendered with an eagerly loaded, high-priority
+image (the largest paint on /courses/) and cached apart from the lazy ones.
+"""
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import generation
+
+CARD_TIMEOUT = 300  # enrolled_students changes without touching updated_at
+FALLBACK_IMAGES = 3  # static/img/course-1.jpg ... course-3.jpg
+
+
+def _card_key(course, instructors, eager):
+    loading = 'eager' if eager else 'lazy'
+    return f'course-card:{course.pk}:{course.updated_at.timestamp():.6f}:{instructors}:{loading}'
+
+
+def render_card(course, eager=False):
+    return render_to_string('course_card.html', {
+        'course': course,
+        'eager': eager,
+        'fallback_image': f'img/course-{course.pk % FALLBACK_IMAGES + 1}.jpg',
+    })
+
+
+def course_cards(courses, eager=0):
+    """[(course, card HTML), ...] in the same order, rendering only the cards not cached;
+    the first `eager` cards are above the fold and don't lazy-load their image"""
+    cache = caches['default']
+    instructors = '-'.join(map(str, generation('instructors')))
+    keys = [_card_key(course, instructors, index < eager) for index, course in enumerate(courses)]
+    found = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for index, (course, key) in enumerate(zip(courses, keys)):
+        card = found.get(key)
+        if card is None:
+            card = rendered[key] = render_card(course, eager=index < eager)
+        cards.append((course, mark_safe(card)))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return cards
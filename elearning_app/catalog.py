@@ -0,0 +1,134 @@
+# elearning_app/catalog.py
+"""
+Filtering and sorting of the published course list, shared by the courses
+page and /api/courses/.
+
+Everything runs in SQL: prices are compared and sorted on the generated
+Course.effective_price column (discount applied), which is indexed, as are
+rating and trending_score. Each ordering ends with the primary key so
+equal values always come back in the same order.
+
+Batches after the first are fetched by keyset ("seek") pagination: the
+cursor carries the sort values of the last course shown, and the next
+batch is whatever sorts after it. Unlike OFFSET, that doesn't re-read the
+rows already shown, and a course added meanwhile doesn't shift the list.
+The cursor is signed, so a forged one is simply ignored.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core import signing
+from django.db.models import Q
+
+from .models import Course
+
+# ?sort= value -> (label, ORDER BY)
+COURSE_SORTS = {
+    'newest': ('Newest', ['-created_at', '-pk']),
+    'trending': ('Trending', ['-trending_score', '-pk']),
+    'popular': ('Most popular', ['-enrolled_students', '-pk']),
+    'rating': ('Top rated', ['-rating', '-rating_count', '-pk']),
+    'price': ('Price: low to high', ['effective_price', '-pk']),
+    '-price': ('Price: high to low', ['-effective_price', '-pk']),
+}
+DEFAULT_COURSE_SORT = 'newest'
+
+
+def parse_price(value):
+    """A non-negative Decimal from a query parameter, or None"""
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def course_filters(params):
+    """The filters and sort requested in a QueryDict, with bad values dropped"""
+    sort = params.get('sort')
+    return {
+        'category': params.get('category') or None,
+        'level': params.get('level') or None,
+        'search': params.get('search') or None,
+        'min_price': parse_price(params.get('min_price')),
+        'max_price': parse_price(params.get('max_price')),
+        'sort': sort if sort in COURSE_SORTS else DEFAULT_COURSE_SORT,
+    }
+
+
+def filter_courses(filters, queryset=None):
+    """Published courses matching course_filters() output, in the requested order"""
+    courses = queryset if queryset is not None else Course.objects.all()
+    courses = courses.filter(is_published=True)
+
+    if filters['category']:
+        courses = courses.filter(category__slug=filters['category'])
+    if filters['level']:
+        courses = courses.filter(level=filters['level'])
+    if filters['min_price'] is not None:
+        courses = courses.filter(effective_price__gte=filters['min_price'])
+    if filters['max_price'] is not None:
+        courses = courses.filter(effective_price__lte=filters['max_price'])
+    if filters['search']:
+        search = filters['search']
+        courses = courses.filter(
+            Q(title__icontains=search) |
+            Q(short_description__icontains=search) |
+            Q(full_description__icontains=search) |
+            Q(instructor__name__icontains=search)
+        )
+    return courses.order_by(*COURSE_SORTS[filters['sort']][1])
+
+
+CURSOR_SALT = 'elearning_app.catalog.cursor'
+
+
+def _ordering_field(name):
+    field = Course._meta.pk if name == 'pk' else Course._meta.get_field(name)
+    # Generated columns convert values like the field they produce
+    return getattr(field, 'output_field', None) or field
+
+
+def encode_cursor(course, sort):
+    values = []
+    for name in (field.lstrip('-') for field in COURSE_SORTS[sort][1]):
+        value = getattr(course, name)
+        if isinstance(value, (Decimal, datetime)):
+            value = value.isoformat() if isinstance(value, datetime) else str(value)
+        values.append(value)
+    return signing.dumps([sort, values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, sort):
+    """The sort values in a cursor made for this sort, or None"""
+    try:
+        cursor_sort, values = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    ordering = COURSE_SORTS[sort][1]
+    if cursor_sort != sort or len(values) != len(ordering):
+        return None
+    return [_ordering_field(field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)]
+
+
+def seek_after(ordering, values):
+    """Q for rows that sort after `values` under `ordering` (e.g. ['-created_at', '-pk'])"""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        step = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": values[index]})
+        for earlier, value in zip(ordering[:index], values[:index]):
+            step &= Q(**{earlier.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def course_batch(courses, sort, cursor=None, size=12):
+    """Up to size courses after cursor, and the cursor for the batch after them (or None)"""
+    values = decode_cursor(cursor, sort) if cursor else None
+    if values is not None:
+        courses = courses.filter(seek_after(COURSE_SORTS[sort][1], values))
+    batch = list(courses[:size + 1])
+    if len(batch) <= size:
+        return batch, None
+    return batch[:size], encode_cursor(batch[size - 1], sort)
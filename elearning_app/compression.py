@@ -0,0 +1,98 @@
+# elearning_app/compression.py
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+# Only text-like responses are worth compressing
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/rss+xml',
+    'image/svg+xml',
+)
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def is_compressible(content_type):
+    return content_type.split(';')[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding):
+    """Pick the best encoding the client accepts (q-values honoured), or None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+
+    best = None
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress(data, encoding, best=False):
+    """Compress a whole body; best=True trades CPU for size (files compressed ahead of time)"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks incrementally"""
+    compressor = _StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    compressor = _StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class _StreamCompressor:
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=5)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            # Flush every chunk so the browser can start rendering early
+            return self._obj.process(chunk) + self._obj.flush()
+        return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.finish() if self.encoding == 'br' else self._obj.flush()
@@ -0,0 +1,321 @@
+# elearning_app/cssbundle.py
+"""
+Build one purged, content-hashed stylesheet out of the site's CSS files.
+
+The templates and scripts are scanned for the class names and ids they use;
+rules whose selectors need anything else are dropped. What remains is
+concatenated into static/dist/bundle.<hash>.css. The rules needed by the part
+of each page above its fold marker are written separately as critical CSS,
+which base.html inlines so the first paint doesn't wait for the bundle.
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+from .minify import minify_css
+
+# Order matters: later files override earlier ones, same as the <link> tags
+SOURCES = [
+    'lib/animate.min.css',
+    'css/owl.carousel.min.css',
+    'css/bootstrap.min.css',
+    'css/style.css',
+    'css/custom.css',
+]
+
+# Everything above the first of these comments in a template is "above the fold"
+FOLD_MARKERS = ['<!-- Page Header End -->', '<!-- Carousel End -->', '<!-- Header End -->']
+
+# Classes added at runtime by Bootstrap, Owl Carousel and WOW.js, never written in markup
+SAFELIST = {
+    'active', 'animated', 'center', 'cloned', 'collapse', 'collapsed', 'collapsing', 'disabled',
+    'dropdown-menu-end', 'fade', 'show', 'showing', 'hiding', 'was-validated', 'is-invalid', 'is-valid',
+}
+SAFELIST_PREFIXES = ('owl-',)
+
+# Conditional blocks whose content is itself a list of rules
+NESTED_AT_RULES = {'media', 'supports', 'document', 'layer', 'container'}
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+TEMPLATE_TAG = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.DOTALL)
+ATTRIBUTE = re.compile(r'\b(?:class|id)\s*=\s*("[^"]*"|\'[^\']*\')', re.IGNORECASE)
+SCRIPT = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+STRING_LITERAL = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'')
+NAME = re.compile(r'-?[_a-zA-Z][\w-]*')
+
+SELECTOR_NAME = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+SELECTOR_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+SELECTOR_ARGUMENTS = re.compile(r'\([^()]*\)')
+ANIMATION = re.compile(r'animation(?:-name)?\s*:([^;}]*)', re.IGNORECASE)
+
+
+# ---------- collecting names from markup ----------
+
+def names_in_markup(text):
+    """Class names and ids used by a template: its attributes plus strings in its scripts"""
+    names = set()
+    for value in ATTRIBUTE.findall(text):
+        names.update(NAME.findall(TEMPLATE_TAG.sub(' ', value[1:-1])))
+    for script in SCRIPT.findall(text):
+        names.update(names_in_script(script))
+    return names
+
+
+def names_in_script(text):
+    # Any word inside a string literal may end up as a class: '.sticky-top', addClass('show')
+    names = set()
+    for double, single in STRING_LITERAL.findall(text):
+        names.update(NAME.findall(double or single))
+    return names
+
+
+def above_the_fold(text):
+    positions = [text.find(marker) for marker in FOLD_MARKERS if marker in text]
+    return text[:min(positions)] if positions else ''
+
+
+def template_files():
+    directory = Path(settings.BASE_DIR) / 'elearning_app' / 'templates'
+    return sorted(directory.rglob('*.html'))
+
+
+def script_files():
+    directory = Path(settings.BASE_DIR) / 'static' / 'js'
+    return sorted(directory.rglob('*.js'))
+
+
+def used_names():
+    """Return (all names used anywhere, names used above the fold)"""
+    used, critical = set(), set()
+    for path in template_files():
+        text = path.read_text(encoding='utf-8')
+        used |= names_in_markup(text)
+        critical |= names_in_markup(above_the_fold(text))
+    for path in script_files():
+        used |= names_in_script(path.read_text(encoding='utf-8'))
+    return used, critical
+
+
+# ---------- a small CSS parser ----------
+
+def _scan(css, start, stops):
+    """Index of the first character in stops at brace depth 0, skipping strings"""
+    quote, index = None, start
+    while index < len(css):
+        char = css[index]
+        if quote:
+            if char == '\\':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in stops:
+            return index
+        index += 1
+    return -1
+
+
+def _block_end(css, start):
+    """Index just past the '}' matching the '{' at start"""
+    depth, index = 0, start
+    while index < len(css):
+        index = _scan(css, index, '{}')
+        if index == -1:
+            return len(css)
+        depth += 1 if css[index] == '{' else -1
+        index += 1
+        if depth == 0:
+            return index
+    return len(css)
+
+
+def parse(css):
+    """Parse a stylesheet into a list of (prelude, body, children) nodes
+
+    body is the declaration text for plain rules and opaque at-rules
+    (@font-face, @keyframes), children the nested rules for @media and
+    friends, and both are None for statements such as @import.
+    """
+    return _parse_block(CSS_COMMENT.sub('', css))
+
+
+def _parse_block(css):
+    nodes, index = [], 0
+    while True:
+        stop = _scan(css, index, '{;}')
+        if stop == -1:
+            break
+        prelude = ' '.join(css[index:stop].split())
+        if css[stop] != '{':
+            if prelude and css[stop] == ';':
+                nodes.append((prelude, None, None))
+            index = stop + 1
+            continue
+        end = _block_end(css, stop)
+        body = css[stop + 1:end - 1]
+        if prelude.startswith('@') and _at_name(prelude) in NESTED_AT_RULES:
+            nodes.append((prelude, None, _parse_block(body)))
+        else:
+            nodes.append((prelude, body, None))
+        index = end
+    return nodes
+
+
+def _at_name(prelude):
+    name = re.match(r'@([\w-]+)', prelude).group(1).lower()
+    # @-webkit-keyframes and @keyframes are handled alike
+    return re.sub(r'^-\w+-', '', name)
+
+
+def serialize(nodes):
+    output = []
+    for prelude, body, children in nodes:
+        if children is not None:
+            output.append(f'{prelude}{{{serialize(children)}}}')
+        elif body is not None:
+            output.append(f'{prelude}{{{body}}}')
+        else:
+            output.append(f'{prelude};')
+    return minify_css(''.join(output))
+
+
+# ---------- purging ----------
+
+def _split_selectors(selector_list):
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(selector_list):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(selector_list[start:index].strip())
+            start = index + 1
+    selectors.append(selector_list[start:].strip())
+    return selectors
+
+
+def is_safelisted(name):
+    return name in SAFELIST or name.startswith(SAFELIST_PREFIXES)
+
+
+def selector_is_used(selector, used):
+    # Attribute values and pseudo-class arguments (:not(.x), :nth-child(2n)) don't
+    # have to be present for the selector to match something
+    bare = SELECTOR_ATTRIBUTE.sub('', selector)
+    while True:
+        stripped = SELECTOR_ARGUMENTS.sub('', bare)
+        if stripped == bare:
+            break
+        bare = stripped
+    return all(name in used or is_safelisted(name) for name in SELECTOR_NAME.findall(bare))
+
+
+def _purge_rules(nodes, used, animations):
+    kept = []
+    for prelude, body, children in nodes:
+        if children is not None:
+            children = _purge_rules(children, used, animations)
+            if children:
+                kept.append((prelude, None, children))
+        elif prelude.lower().startswith('@charset'):
+            # Only valid as the very first bytes of a file; the bundle is served as UTF-8 anyway
+            continue
+        elif prelude.startswith('@') or body is None:
+            kept.append((prelude, body, children))
+        else:
+            selectors = [s for s in _split_selectors(prelude) if selector_is_used(s, used)]
+            if selectors:
+                for value in ANIMATION.findall(body):
+                    animations.update(NAME.findall(value))
+                kept.append((','.join(selectors), body, None))
+    return kept
+
+
+def _purge_keyframes(nodes, animations):
+    kept = []
+    for prelude, body, children in nodes:
+        if children is not None:
+            kept.append((prelude, None, _purge_keyframes(children, animations)))
+        elif prelude.startswith('@') and _at_name(prelude) == 'keyframes':
+            if prelude.split(None, 1)[-1].strip('\'" ') in animations:
+                kept.append((prelude, body, None))
+        else:
+            kept.append((prelude, body, children))
+    return kept
+
+
+def purge(nodes, used):
+    """Drop rules that need a class or id not in used, then unreferenced @keyframes"""
+    animations = set()
+    nodes = _purge_rules(nodes, used, animations)
+    return _purge_keyframes(nodes, animations)
+
+
+# ---------- building ----------
+
+def output_dir():
+    return Path(settings.BASE_DIR) / 'static' / 'dist'
+
+
+def build(keep=2):
+    """Write the bundle, critical CSS and manifest; return the manifest"""
+    static_dir = Path(settings.BASE_DIR) / 'static'
+    sources = [(name, (static_dir / name).read_text(encoding='utf-8')) for name in SOURCES]
+    used, critical_used = used_names()
+
+    bundle_parts, critical_parts, original_size = [], [], 0
+    for name, css in sources:
+        original_size += len(css.encode())
+        nodes = parse(css)
+        bundle_parts.append(serialize(purge(nodes, used)))
+        critical_parts.append(serialize(purge(nodes, critical_used)))
+    bundle = '\n'.join(part for part in bundle_parts if part)
+    critical = '\n'.join(part for part in critical_parts if part)
+
+    directory = output_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.blake2b(bundle.encode(), digest_size=6).hexdigest()
+    bundle_name = f'bundle.{digest}.css'
+    (directory / bundle_name).write_text(bundle, encoding='utf-8')
+    (directory / 'critical.css').write_text(critical, encoding='utf-8')
+
+    # Keep the previous bundle around for pages rendered before this build
+    bundles = sorted(directory.glob('bundle.*.css'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in bundles[keep:]:
+        if old.name != bundle_name:
+            old.unlink()
+
+    manifest = {
+        'bundle': f'dist/{bundle_name}',
+        'critical': 'critical.css',
+        'sources': SOURCES,
+        'original_size': original_size,
+        'bundle_size': len(bundle.encode()),
+        'critical_size': len(critical.encode()),
+    }
+    temp = directory / 'manifest.json.tmp'
+    temp.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    temp.replace(directory / 'manifest.json')
+    return manifest
+
+
+_loaded = {}
+
+
+def load_manifest():
+    """The manifest plus inlined critical CSS, re-read only when the file changes"""
+    path = output_dir() / 'manifest.json'
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _loaded.get('mtime') != mtime:
+        manifest = json.loads(path.read_text(encoding='utf-8'))
+        manifest['critical_css'] = (path.parent / manifest['critical']).read_text(encoding='utf-8')
+        _loaded.update(mtime=mtime, manifest=manifest)
+    return _loaded['manifest']
@@ -0,0 +1,167 @@
+# elearning_app/downloads.py
+"""
+Protected file delivery for module attachments (PDFs, self-hosted videos).
+
+serve_file() never reads a whole file into memory: it answers conditional
+requests (ETag / Last-Modified) with 304, a single byte range with 206 so
+<video> can seek and downloads can resume, and anything else with a
+streamed FileResponse.
+
+With settings.MEDIA_SENDFILE the bytes aren't sent by Python at all; the
+response only names the file and the front-end server takes over
+(including Range handling):
+
+    'x-accel-redirect' (nginx):
+        location /protected-media/ { internal; alias /srv/sat/private_media/; }
+
+Attachments live in PRIVATE_MEDIA_ROOT (storage.PrivateMediaStorage), not
+under MEDIA_ROOT, so no /media/ URL serves them whatever the web server's
+configuration.
+    'x-sendfile' (Apache mod_xsendfile, lighttpd)
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import Enrollment, Student
+from .storage import is_hashed_name
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Played in the page rather than downloaded
+INLINE_TYPES = ('video/', 'audio/', 'image/', 'application/pdf')
+
+
+def can_access_module(user, module):
+    """Free previews are public; the rest needs an active enrollment (or staff)"""
+    if module.is_free_preview:
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return Enrollment.objects.filter(
+        student__in=Student.objects.filter(user=user),
+        course_id=module.course_id,
+        is_active=True,
+    ).exists()
+
+
+def _etag(name, stat):
+    # Content-addressed names already are a hash of the bytes
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if is_hashed_name(name):
+        return f'"{stem}"'
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to send everything,
+    or False when the range can't be satisfied"""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match:
+        # Malformed or multiple ranges: a full response is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith(('"', 'W/')):
+        # Weak validators never match for ranges
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and date == int(last_modified)
+
+
+class FileRange:
+    """Read-only view of bytes start..end of an open file (for FileResponse)"""
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _disposition(content_type, filename):
+    kind = 'inline' if content_type.startswith(INLINE_TYPES) else 'attachment'
+    return f"{kind}; filename*=UTF-8''{quote(filename)}"
+
+
+def serve_file(request, field_file, filename=None):
+    """Stream a stored file with conditional and Range support, or hand it to the web server"""
+    path = field_file.path
+    stat = os.stat(path)
+    filename = filename or os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = _etag(field_file.name, stat)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    mode = getattr(settings, 'MEDIA_SENDFILE', '')
+    if mode:
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + field_file.name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        if request.headers.get('Range') and _if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        file = open(path, 'rb')
+        if byte_range:
+            start, end = byte_range
+            response = FileResponse(FileRange(file, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(file, content_type=content_type)
+            response['Content-Length'] = str(stat.st_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Content-Disposition'] = _disposition(content_type, filename)
+    # Access-controlled: browsers may keep it, shared caches may not
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
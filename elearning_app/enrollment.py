@@ -0,0 +1,134 @@
+# elearning_app/enrollment.py
+import random
+import time
+from functools import wraps
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.db.models import Count, F, Q
+
+from .models import Course, Enrollment
+
+
+class EnrollmentError(Exception):
+    """Base class for enrollment failures shown to the student"""
+
+
+class CourseFull(EnrollmentError):
+    pass
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+def _is_busy_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_busy(attempts=8, base_delay=0.02):
+    """Retry a transaction when SQLite reports the database as locked"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if connection.in_atomic_block:
+                # A failed statement breaks the outer transaction; retrying inside it can't work
+                raise TransactionManagementError(f"{func.__name__}() must not run inside an atomic block")
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as error:
+                    if not _is_busy_error(error) or attempt == attempts - 1:
+                        raise
+                    # Exponential backoff with jitter so retries don't collide again
+                    time.sleep(base_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return wrapper
+    return decorator
+
+
+def _claim_seat(course_id):
+    """Atomically take one seat; returns False when the course is full"""
+    return Course.objects.filter(
+        pk=course_id,
+        enrolled_students__lt=F('max_students'),
+    ).update(enrolled_students=F('enrolled_students') + 1) == 1
+
+
+def _release_seat(course_id):
+    Course.objects.filter(pk=course_id, enrolled_students__gt=0).update(
+        enrolled_students=F('enrolled_students') - 1
+    )
+
+
+def claim_enrollment(student, course):
+    """
+    Enroll a student, never exceeding course.max_students, inside the
+    caller's transaction (the admin). Pages use enroll_student().
+    """
+    with transaction.atomic():
+        existing = Enrollment.objects.filter(student=student, course=course).first()
+        if existing and existing.is_active:
+            raise AlreadyEnrolled("You are already enrolled in this course.")
+
+        if not _claim_seat(course.pk):
+            raise CourseFull("Sorry, this course is full.")
+
+        if existing:
+            existing.is_active = True
+            existing.save(update_fields=['is_active'])
+            return existing
+
+        try:
+            with transaction.atomic():
+                return Enrollment.objects.create(student=student, course=course)
+        except IntegrityError:
+            # A concurrent request enrolled the same student first;
+            # raising rolls back the seat claimed above.
+            raise AlreadyEnrolled("You are already enrolled in this course.")
+
+
+def release_enrollment(student, course):
+    """Deactivate an enrollment and give its seat back, inside the caller's transaction"""
+    with transaction.atomic():
+        updated = Enrollment.objects.filter(
+            student=student, course=course, is_active=True
+        ).update(is_active=False)
+        if updated:
+            _release_seat(course.pk)
+        return bool(updated)
+
+
+def delete_enrollment(enrollment):
+    """Delete an enrollment, giving its seat back if it held one"""
+    with transaction.atomic():
+        if enrollment.is_active:
+            _release_seat(enrollment.course_id)
+        enrollment.delete()
+
+
+@retry_on_busy()
+def enroll_student(student, course):
+    """Enroll a student, never exceeding course.max_students"""
+    return claim_enrollment(student, course)
+
+
+@retry_on_busy()
+def unenroll_student(student, course):
+    """Deactivate an enrollment and give its seat back"""
+    return release_enrollment(student, course)
+
+
+def recount_enrolled_students(courses=None):
+    """Reset Course.enrolled_students from the real active enrollments"""
+    courses = courses if courses is not None else Course.objects.all()
+    counted = courses.annotate(
+        actual=Count('enrollment', filter=Q(enrollment__is_active=True))
+    ).values_list('pk', 'enrolled_students', 'actual')
+
+    updated = 0
+    for pk, stored, actual in counted:
+        if stored != actual:
+            Course.objects.filter(pk=pk).update(enrolled_students=actual)
+            updated += 1
+    return updated
@@ -0,0 +1,185 @@
+# elearning_app/jobs.py
+import logging
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered task functions, filled by the @task decorator
+TASKS = {}
+
+# Retry delay is RETRY_BASE_SECONDS * 2 ** (attempt - 1), capped
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 60 * 60
+
+# A running job whose worker has been silent this long is requeued; the
+# worker refreshes locked_at every HEARTBEAT_SECONDS while a job runs
+STALE_LOCK_SECONDS = 15 * 60
+HEARTBEAT_SECONDS = 60
+
+# Finished jobs are deleted after this long (dead ones stay for the admin)
+DONE_RETENTION_DAYS = 7
+
+
+def task(func=None, *, name=None):
+    """Register a function so it can be enqueued by name"""
+    def decorator(f):
+        TASKS[name or f.__name__] = f
+        f.task_name = name or f.__name__
+        return f
+    return decorator(func) if func else decorator
+
+
+def enqueue(task_name, *args, priority=0, run_at=None, delay=None, max_attempts=5, **kwargs):
+    """Store a job for the worker; returns the Job row"""
+    if callable(task_name):
+        task_name = getattr(task_name, 'task_name', task_name.__name__)
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        task=task_name,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        run_at=run_at,
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_on_commit(task_name, *args, **kwargs):
+    """Enqueue once the surrounding transaction commits (safe in post_save hooks)"""
+    transaction.on_commit(lambda: enqueue(task_name, *args, **kwargs))
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker_id, batch=5):
+    """Atomically move the next due job from queued to running"""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('pk', flat=True)[:batch]
+    )
+    for pk in candidates:
+        # Only one worker can win this conditional update
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """Keep the job's lock fresh while the block runs, so it isn't taken for stale"""
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval or HEARTBEAT_SECONDS):
+                Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, locked_by=job.locked_by).update(
+                    locked_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job):
+    """Execute a claimed job and record the outcome"""
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task '{job.task}'")
+        with heartbeat(job):
+            func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.task, job.attempts)
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_DEAD,
+                last_error=error,
+                finished_at=timezone.now(),
+                locked_by='',
+                locked_at=None,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_QUEUED,
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+                locked_by='',
+                locked_at=None,
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_DONE,
+        finished_at=timezone.now(),
+        locked_by='',
+        locked_at=None,
+    )
+    return True
+
+
+def requeue_stale_jobs():
+    """Give jobs from crashed workers back to the queue (or bury them)"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_DEAD,
+        last_error='Worker stopped responding',
+        finished_at=timezone.now(),
+        locked_by='',
+        locked_at=None,
+    )
+    return stale.update(
+        status=Job.STATUS_QUEUED,
+        locked_by='',
+        locked_at=None,
+    )
+
+
+def prune_finished_jobs(days=DONE_RETENTION_DAYS):
+    """Delete jobs that finished successfully more than `days` ago"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.STATUS_DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def requeue_dead_jobs(queryset):
+    return queryset.filter(status=Job.STATUS_DEAD).update(
+        status=Job.STATUS_QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+        finished_at=None,
+    )
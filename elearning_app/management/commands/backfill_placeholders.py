@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from elearning_app.caching import invalidate
+from elearning_app.placeholders import PLACEHOLDER_FIELDS, update_placeholder
+from elearning_app.prerender import schedule_prerender
+from elearning_app.signals import CACHE_TAGS
+
+
+class Command(BaseCommand):
+    help = "Compute image placeholders and sizes for rows uploaded before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Recompute every placeholder, not just the missing ones")
+
+    def handle(self, *args, **options):
+        tags = set()
+        for model, field_name in PLACEHOLDER_FIELDS.items():
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            if not options['force']:
+                rows = rows.filter(placeholder='')
+
+            updated = failed = 0
+            for instance in rows.only('pk', field_name, 'placeholder', 'image_width', 'image_height').iterator():
+                if update_placeholder(instance, force=True):
+                    # update() skips save() and signals: no timestamps bumped, one invalidation at the end
+                    model.objects.filter(pk=instance.pk).update(
+                        placeholder=instance.placeholder,
+                        image_width=instance.image_width,
+                        image_height=instance.image_height,
+                    )
+                    updated += 1
+                elif not instance.placeholder:
+                    failed += 1
+            if updated:
+                tags.update(CACHE_TAGS[model])
+            self.stdout.write(f"{model.__name__}: {updated} updated, {failed} unreadable")
+
+        if tags:
+            invalidate(*tags)
+            schedule_prerender(tags)
+        self.stdout.write(self.style.SUCCESS("Placeholders are up to date."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Compare read/write speed of a configured cache with an in-process locmem cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help="Cache alias to benchmark")
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        keys = [f'bench:{i}' for i in range(options['keys'])]
+        value = {'title': 'SAT Math', 'price': 120, 'modules': list(range(20))}
+        backends = [
+            ('locmem', LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': len(keys) * 2}})),
+            (options['alias'], caches[options['alias']]),
+        ]
+
+        for name, cache in backends:
+            start = time.perf_counter()
+            for key in keys:
+                cache.set(key, value, 300)
+            write = (time.perf_counter() - start) / len(keys)
+
+            start = time.perf_counter()
+            for _ in range(options['rounds']):
+                for key in keys:
+                    cache.get(key)
+            read = (time.perf_counter() - start) / (len(keys) * options['rounds'])
+
+            cache.set('bench:counter', 0)
+            start = time.perf_counter()
+            for _ in range(len(keys)):
+                cache.incr('bench:counter')
+            incr = (time.perf_counter() - start) / len(keys)
+
+            cache.delete_many(keys + ['bench:counter'])
+            self.stdout.write(
+                f"{name:<10} get {read * 1e6:8.1f} us   set {write * 1e6:8.1f} us   incr {incr * 1e6:8.1f} us"
+            )
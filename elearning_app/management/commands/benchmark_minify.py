@@ -0,0 +1,37 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from elearning_app.minify import minify_html
+
+PAGES = ['/', '/about/', '/courses/', '/team/', '/testimonials/', '/contact/']
+
+
+class Command(BaseCommand):
+    help = "Show how many bytes HTML minification saves per page and what it costs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        client = Client()
+        self.stdout.write(f"{'page':<16}{'html':>9}{'minified':>10}{'saved':>8}{'gzip':>8}{'gzip min':>10}{'cpu':>10}")
+        with override_settings(HTML_MINIFY=False):
+            for path in PAGES:
+                response = client.get(path, HTTP_ACCEPT_ENCODING='identity')
+                html = response.content.decode(response.charset)
+
+                start = time.perf_counter()
+                for _ in range(options['rounds']):
+                    minified = minify_html(html)
+                cpu = (time.perf_counter() - start) / options['rounds']
+
+                original, small = html.encode(), minified.encode()
+                self.stdout.write(
+                    f"{path:<16}{len(original):>9}{len(small):>10}"
+                    f"{(1 - len(small) / len(original)) * 100:>7.1f}%"
+                    f"{len(gzip.compress(original)):>8}{len(gzip.compress(small)):>10}"
+                    f"{cpu * 1000:>8.2f}ms"
+                )
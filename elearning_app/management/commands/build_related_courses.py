@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from elearning_app.models import CourseTerms
+from elearning_app.related import rebuild_related_courses
+
+
+class Command(BaseCommand):
+    help = "Update the precomputed related-courses index (only changed courses are re-read)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Re-count the terms of every course")
+        parser.add_argument('-k', type=int, default=settings.RELATED_COURSES_K,
+                            help="Related courses kept per course")
+
+    def handle(self, *args, **options):
+        if options['full']:
+            CourseTerms.objects.all().delete()
+        recounted, rewritten = rebuild_related_courses(k=options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{recounted} course(s) re-read, {rewritten} neighbour list(s) rewritten."
+        ))
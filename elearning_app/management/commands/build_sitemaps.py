@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from elearning_app.sitemaps import build_sitemaps, sitemap_root
+
+
+class Command(BaseCommand):
+    help = "Write sitemap.xml and its sections (with .gz/.br siblings); unchanged files are left alone"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = build_sitemaps()
+        self.stdout.write(
+            f"{stats['urls']} URL(s): {stats['written']} file(s) written, {stats['unchanged']} unchanged, "
+            f"{stats['removed']} removed in {time.monotonic() - started:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Sitemaps are in {sitemap_root()}"))
@@ -0,0 +1,96 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from elearning_app.caching import invalidate
+from elearning_app.prerender import schedule_prerender
+from elearning_app.signals import CACHE_TAGS
+from elearning_app.storage import file_fields, is_hashed_name, private_storage, referenced_names
+from elearning_app.uploads import cleanup_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete media files that no FileField/ImageField refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help="First move files saved under their upload name to content-hash names")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted")
+        parser.add_argument('--min-age', type=int, default=settings.MEDIA_GC_MIN_AGE,
+                            help="Keep files modified less than this many seconds ago")
+
+    def handle(self, *args, **options):
+        # Pages, cards and the replica still point at the old names for a while:
+        # those files are left for a later run
+        renamed = self.rehash(options['dry_run']) if options['rehash'] else set()
+
+        cutoff = time.time() - options['min_age']
+        removed = freed = in_use = 0
+
+        # Public media and the attachments kept outside MEDIA_ROOT
+        for storage in (default_storage, private_storage):
+            referenced = referenced_names(storage)
+            in_use += len(referenced)
+            for directory, _, files in os.walk(storage.location):
+                for filename in files:
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                    if name in referenced or name in renamed or os.path.getmtime(path) > cutoff:
+                        continue
+                    size = os.path.getsize(path)
+                    self.stdout.write(f"{'would remove' if options['dry_run'] else 'removed'} {name} ({size} bytes)")
+                    if not options['dry_run']:
+                        os.remove(path)
+                    removed += 1
+                    freed += size
+            if not options['dry_run']:
+                self.remove_empty_directories(storage.location)
+
+        if not options['dry_run']:
+            stale = cleanup_stale_uploads()
+            if stale:
+                self.stdout.write(f"removed {stale} abandoned chunked upload(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{removed} unreferenced file(s), {freed / 1024 / 1024:.1f} MB"
+            f"{' (dry run)' if options['dry_run'] else ' freed'}; {in_use} in use."
+        ))
+
+    def rehash(self, dry_run):
+        """Give files uploaded before content addressing their hashed name; returns the old names"""
+        renamed, tags = set(), set()
+        for model, field in file_fields():
+            storage = field.storage
+            if not hasattr(storage, 'hashed_name'):
+                continue
+            rows = model._base_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            for pk, name in rows.values_list('pk', field.name):
+                if is_hashed_name(name) or not storage.exists(name):
+                    continue
+                if dry_run:
+                    self.stdout.write(f"would rename {name}")
+                    renamed.add(name)
+                    continue
+                with storage.open(name) as content:
+                    new_name = storage.save(name, content)
+                # update() keeps save() hooks (timestamps, placeholders) out of this
+                model._base_manager.filter(pk=pk, **{field.name: name}).update(**{field.name: new_name})
+                # Restart the --min-age grace period for the old copy
+                os.utime(storage.path(name))
+                self.stdout.write(f"{name} -> {new_name}")
+                renamed.add(name)
+                tags.update(CACHE_TAGS.get(model, ()))
+
+        # Cached pages still carry the old URLs
+        if tags:
+            invalidate(*tags)
+            schedule_prerender(tags)
+        self.stdout.write(f"{len(renamed)} file(s) {'to rename' if dry_run else 'renamed'}.")
+        return renamed
+
+    def remove_empty_directories(self, root):
+        for directory, subdirectories, files in os.walk(root, topdown=False):
+            if directory != str(root) and not os.listdir(directory):
+                os.rmdir(directory)
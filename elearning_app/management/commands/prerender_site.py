@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning_app.prerender import PAGES, prerender, prerender_root
+
+
+class Command(BaseCommand):
+    help = "Render the public pages (and every course filter) to static HTML with .gz/.br siblings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', help=f"Pages to render (default: all of {', '.join(PAGES)})")
+        parser.add_argument('--changed', nargs='+', metavar='TAG',
+                            help="Only the pages built from these cache tags, e.g. --changed courses")
+
+    def handle(self, *args, **options):
+        unknown = set(options['pages']) - set(PAGES)
+        if unknown:
+            raise CommandError(f"Unknown page(s): {', '.join(sorted(unknown))}")
+
+        started = time.monotonic()
+        stats = prerender(pages=options['pages'] or None, tags=options['changed'])
+        self.stdout.write(
+            f"{stats['written']} written, {stats['unchanged']} unchanged, "
+            f"{stats['removed']} removed in {time.monotonic() - started:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pages are in {prerender_root()}"))
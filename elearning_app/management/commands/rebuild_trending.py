@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from elearning_app.trending import rebuild_trending, refresh_trending_pages
+
+
+class Command(BaseCommand):
+    help = "Recompute Course.trending_score from enrollments, testimonials and view counts"
+
+    def handle(self, *args, **options):
+        updated = rebuild_trending()
+        refresh_trending_pages()
+        self.stdout.write(self.style.SUCCESS(f"{updated} course scores recomputed."))
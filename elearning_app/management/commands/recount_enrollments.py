@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from elearning_app.enrollment import recount_enrolled_students
+
+
+class Command(BaseCommand):
+    help = "Reset Course.enrolled_students from the actual active enrollments"
+
+    def handle(self, *args, **options):
+        updated = recount_enrolled_students()
+        self.stdout.write(self.style.SUCCESS(f"{updated} courses corrected."))
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from elearning_app.caching import generation, invalidate
+from elearning_app.routers import CONTENT_TAG
+from elearning_app.signals import CACHE_TAGS
+
+# A stepped copy that starts over this many times is finished in one step
+MAX_RESTARTS = 3
+
+
+class PrimaryChanged(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Every refresh is a full copy of the primary, taken with SQLite's online
+    backup API a few pages per step into a temp file swapped in afterwards.
+
+    A copy is made when content shown on public pages was saved (CONTENT_TAG
+    moved), and then the cached blocks are invalidated. Other writes (view
+    counters, job bookkeeping, seat counts) only change PRAGMA data_version;
+    they are copied at most every --other-writes-interval seconds, without
+    touching the cache.
+    """
+    help = "Copy the default SQLite database to the read replica with SQLite's online backup API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep refreshing every N seconds (default: refresh once)")
+        # Below REPLICA_STICKY_SECONDS: a visitor's own writes (an enrollment) are
+        # copied before their requests go back to the replica
+        parser.add_argument('--other-writes-interval', type=float, default=60,
+                            help="Seconds between copies made only for writes outside the content models")
+        parser.add_argument('--pages', type=int, default=256,
+                            help="Pages copied per step; the primary stays writable between steps")
+        parser.add_argument('--step-sleep', type=float, default=0.005)
+
+    def handle(self, *args, **options):
+        source = sqlite3.connect(str(settings.DATABASES['default']['NAME']), timeout=20)
+        copied_stamp = copied_version = None
+        copied_at = 0
+        try:
+            while True:
+                # Read before copying: a save made during the copy triggers the next one
+                stamp = generation(CONTENT_TAG)
+                # data_version changes whenever another connection commits to the primary
+                version = source.execute('PRAGMA data_version').fetchone()[0]
+                content_changed = stamp != copied_stamp
+                if content_changed or (
+                    version != copied_version
+                    and time.monotonic() - copied_at >= options['other_writes_interval']
+                ):
+                    started = time.monotonic()
+                    self.refresh(source, options['pages'], options['step_sleep'])
+                    copied_stamp, copied_version, copied_at = stamp, version, time.monotonic()
+                    if content_changed:
+                        # Blocks cached from the old replica may predate the newest saves
+                        invalidate(*{tag for tags in CACHE_TAGS.values() for tag in tags})
+                    self.stdout.write(f"Replica refreshed in {time.monotonic() - started:.2f}s.")
+                else:
+                    # Current enough: tell the web workers it is being looked after
+                    os.utime(settings.DATABASES['replica']['NAME'])
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            source.close()
+
+    def refresh(self, source, pages, step_sleep):
+        replica_path = str(settings.DATABASES['replica']['NAME'])
+        temp_path = f"{replica_path}.tmp"
+        copy = {'remaining': None, 'restarts': 0}
+
+        def progress(status, remaining, total):
+            # SQLite starts the copy over when another connection writes to the primary
+            if copy['remaining'] is not None and remaining > copy['remaining']:
+                copy['restarts'] += 1
+                if copy['restarts'] > MAX_RESTARTS:
+                    raise PrimaryChanged
+            copy['remaining'] = remaining
+
+        target = sqlite3.connect(temp_path)
+        try:
+            try:
+                source.backup(target, pages=pages, progress=progress, sleep=step_sleep)
+            except PrimaryChanged:
+                # Writes keep landing mid-copy: hold the read lock for one whole pass
+                source.backup(target, pages=-1)
+        finally:
+            target.close()
+
+        # Readers that already opened the old file keep it; new connections see the fresh copy
+        os.replace(temp_path, replica_path)
@@ -0,0 +1,61 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from elearning_app.jobs import claim_next, default_worker_id, prune_finished_jobs, requeue_stale_jobs, run_job
+from elearning_app.trending import refresh_trending_pages
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when no job is due")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Exit after this many jobs (0 = no limit)")
+        parser.add_argument('--worker-id', default=None)
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f"Worker {worker_id} started.")
+        processed = 0
+        last_stale_check = 0
+        last_prune = 0
+        last_trending_refresh = time.monotonic()
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_stale_check > 60:
+                requeue_stale_jobs()
+                last_stale_check = time.monotonic()
+            if time.monotonic() - last_prune > 60 * 60:
+                prune_finished_jobs()
+                last_prune = time.monotonic()
+            if time.monotonic() - last_trending_refresh > settings.TRENDING_REFRESH_SECONDS:
+                refresh_trending_pages()
+                last_trending_refresh = time.monotonic()
+
+            job = claim_next(worker_id)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            ok = run_job(job)
+            processed += 1
+            self.stdout.write(f"{'done' if ok else 'failed'}: {job.task} #{job.pk}")
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f"Worker {worker_id} stopped after {processed} jobs.")
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit the loop
+        self.stopping = True
@@ -0,0 +1,213 @@
+# elearning_app/middleware.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+from .analytics import record_page_view
+from .minify import minify_html
+from .preload import remember, site_links
+from .compression import (
+    compress, compress_async_stream, compress_stream, is_compressible, negotiate
+)
+from .routers import replica_is_fresh, use_replica
+
+STICKY_COOKIE = 'db_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route safe public requests to the replica database.
+
+    After a POST (or any unsafe method) the browser gets a short-lived cookie
+    that pins its next requests to the primary, so a visitor sees their own
+    write even before the replica has been refreshed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _can_use_replica(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if request.COOKIES.get(STICKY_COOKIE):
+            return False
+        if any(request.path.startswith(prefix) for prefix in settings.REPLICA_EXCLUDED_PATHS):
+            return False
+        # Nothing to read before the first refresh, or once refreshing stopped
+        return replica_is_fresh()
+
+    def __call__(self, request):
+        token = use_replica.set(self._can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+def _unique_per_visitor(request, response):
+    """Responses not worth a shared memo entry: they won't be served again byte for byte"""
+    # A CSRF token (re-masked on every request) or session use sets a cookie
+    # and Vary: Cookie; search and filter URLs rarely repeat
+    vary = {header.strip().lower() for header in response.get('Vary', '').split(',')}
+    return 'cookie' in vary or bool(response.cookies) or bool(request.GET)
+
+
+class PageViewMiddleware:
+    """Count successful HTML page views per path (written in batches by analytics.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and response.get('Content-Type', '').startswith('text/html')
+            and not any(request.path.startswith(prefix) for prefix in settings.ANALYTICS_EXCLUDED_PATHS)
+        ):
+            record_page_view(request)
+        return response
+
+
+class PreloadMiddleware:
+    """
+    Send Link: rel=preload headers for a page's above-the-fold resources.
+
+    Covers the site-wide stylesheets and fonts plus whatever the view
+    declared with preload.preload(). The links are also remembered per path
+    for 103 Early Hints (see preload.EarlyHintsApp).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+            or not response.get('Content-Type', '').startswith('text/html')
+            # HTML fragments are inserted into a page that already has the links
+            or any(request.path.startswith(prefix) for prefix in settings.PRELOAD_EXCLUDED_PATHS)
+        ):
+            return response
+
+        links = getattr(request, 'preload_links', []) + site_links()
+        existing = response.get('Link')
+        response.headers['Link'] = ', '.join([existing, *links] if existing else links)
+        remember(request.path, links)
+        return response
+
+
+class HTMLMinifyMiddleware:
+    """
+    Collapse whitespace and drop comments in rendered HTML (settings.HTML_MINIFY).
+
+    Must sit below CompressionMiddleware so pages are minified before they
+    are compressed. Results are memoized by content hash like compression.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not settings.HTML_MINIFY
+            or response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith('text/html')
+        ):
+            return response
+
+        content = response.content
+        if _unique_per_visitor(request, response):
+            minified = minify_html(content.decode(response.charset)).encode(response.charset)
+        else:
+            cache = caches[settings.COMPRESSION_CACHE]
+            key = f"minified:{hashlib.blake2b(content, digest_size=20).hexdigest()}"
+            minified = cache.get(key)
+            if minified is None:
+                minified = minify_html(content.decode(response.charset)).encode(response.charset)
+                cache.set(key, minified, settings.COMPRESSION_CACHE_TIMEOUT)
+
+        response.content = minified
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(minified))
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip compression for HTML and other text responses.
+
+    Compressed bodies are memoized in the cache by a hash of the uncompressed
+    content, so an identical page (e.g. a cached one) is compressed once
+    rather than on every hit. Streaming responses are compressed on the fly.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding') or not is_compressible(response.get('Content-Type', '')):
+            return response
+        # Byte ranges refer to the uncompressed file (see downloads.serve_file)
+        if response.get('Accept-Ranges') == 'bytes':
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # The compressed size isn't known until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = self._compress_content(request, response, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag no longer matches the bytes on the wire
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_content(self, request, response, encoding):
+        content = response.content
+        if _unique_per_visitor(request, response):
+            return compress(content, encoding)
+
+        cache = caches[settings.COMPRESSION_CACHE]
+        key = f"compressed:{encoding}:{hashlib.blake2b(content, digest_size=20).hexdigest()}"
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(content, encoding)
+            cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+        return compressed
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-19 01:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_testimonial_stats(apps, schema_editor):
+    Testimonial = apps.get_model('elearning_app', 'Testimonial')
+    TestimonialStats = apps.get_model('elearning_app', 'TestimonialStats')
+
+    rows = {'all': TestimonialStats(scope='all')}
+    grouped = (
+        Testimonial.objects.filter(is_active=True)
+        .values('course_id', 'rating')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in grouped:
+        scopes = [('all', None)]
+        if row['course_id']:
+            scopes.append((f"course:{row['course_id']}", row['course_id']))
+        for scope, course_id in scopes:
+            stats = rows.setdefault(scope, TestimonialStats(scope=scope, course_id=course_id))
+            field = f"rating_{row['rating']}"
+            setattr(stats, field, getattr(stats, field) + row['total'])
+            stats.count += row['total']
+
+    TestimonialStats.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0005_rename_facebook_instructor_telegram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestimonialStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('rating_1', models.IntegerField(default=0)),
+                ('rating_2', models.IntegerField(default=0)),
+                ('rating_3', models.IntegerField(default=0)),
+                ('rating_4', models.IntegerField(default=0)),
+                ('rating_5', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='testimonial_stats', to='elearning_app.course')),
+            ],
+            options={
+                'verbose_name': 'Testimonial Statistics',
+                'verbose_name_plural': 'Testimonial Statistics',
+            },
+        ),
+        migrations.RunPython(build_testimonial_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 01:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_as_notified(apps, schema_editor):
+    # Don't email admins about messages that arrived before notifications existed
+    ContactMessage = apps.get_model('elearning_app', 'ContactMessage')
+    ContactMessage.objects.update(notified_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, help_text='When admins were emailed about it', null=True),
+        ),
+        migrations.RunPython(mark_existing_as_notified, migrations.RunPython.noop),
+    ]
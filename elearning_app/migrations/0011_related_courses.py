@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0010_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseTerms',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='terms', serialize=False, to='elearning_app.course')),
+                ('signature', models.CharField(help_text='Hash of the text the terms were counted from', max_length=32)),
+                ('terms', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Course terms',
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='elearning_app.course')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elearning_app.course')),
+            ],
+            options={
+                'ordering': ['course', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('course', 'rank'), name='related_course_rank_unique')],
+            },
+        ),
+    ]
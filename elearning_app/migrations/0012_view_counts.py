@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0011_related_courses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('views', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', '-views'],
+                'indexes': [models.Index(fields=['day'], name='page_view_count_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('path', 'day'), name='page_view_count_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.BigIntegerField(default=0, help_text='Course page views')),
+                ('impressions', models.BigIntegerField(default=0, help_text='Times the course card was shown in a list')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_counts', to='elearning_app.course')),
+            ],
+            options={
+                'ordering': ['-day', '-views'],
+                'indexes': [models.Index(fields=['day'], name='course_view_count_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'day'), name='course_view_count_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0012_view_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+    ]
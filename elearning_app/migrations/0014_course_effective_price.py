@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 03:15
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0013_course_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='discount_percent',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(discount_price__gt=0, price__gt=0, then=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '-', models.F('discount_price')), '*', models.Value(100)), '/', models.F('price')), models.IntegerField())), default=models.Value(0)), output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='effective_price',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(discount_price__gt=0, then=models.F('discount_price')), default=models.F('price')), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['effective_price'], name='course_effective_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['discount_percent'], name='course_discount_percent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['rating'], name='course_rating_idx'),
+        ),
+    ]
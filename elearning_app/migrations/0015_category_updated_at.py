@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 03:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # The default stamped every row with the migration time; the sitemap would
+    # report all categories as changed today
+    Category = apps.get_model('elearning_app', 'Category')
+    Category.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0014_course_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
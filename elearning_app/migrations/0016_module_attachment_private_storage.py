@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 04:10
+
+import os
+import shutil
+
+import elearning_app.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _move_attachments(apps, source_root, target_root):
+    Module = apps.get_model('elearning_app', 'Module')
+    names = Module.objects.exclude(attachment='').exclude(attachment__isnull=True).values_list('attachment', flat=True)
+    for name in set(names):
+        source, target = os.path.join(source_root, name), os.path.join(target_root, name)
+        if os.path.exists(source) and not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+
+
+def move_to_private_media(apps, schema_editor):
+    # Files left under MEDIA_ROOT stay downloadable from /media/ without the enrollment check
+    _move_attachments(apps, settings.MEDIA_ROOT, settings.PRIVATE_MEDIA_ROOT)
+
+
+def move_to_public_media(apps, schema_editor):
+    _move_attachments(apps, settings.PRIVATE_MEDIA_ROOT, settings.MEDIA_ROOT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning_app', '0015_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='module',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=elearning_app.storage.PrivateMediaStorage(), upload_to='course_modules/'),
+        ),
+        migrations.RunPython(move_to_private_media, move_to_public_media),
+    ]
@@ -0,0 +1,37 @@
+# elearning_app/minify.py
+import re
+
+# Content of these elements is kept byte for byte (whitespace matters or may matter)
+PRESERVED = re.compile(r'(<(pre|textarea|script)\b[^>]*>.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+STYLE = re.compile(r'(<style\b[^>]*>)(.*?)(</style\s*>)', re.IGNORECASE | re.DOTALL)
+
+# Conditional comments (<!--[if IE]>) carry markup, so they stay
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+WHITESPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    css = CSS_COMMENT.sub('', css)
+    css = WHITESPACE.sub(' ', css)
+    return CSS_PUNCTUATION.sub(r'\1', css).strip()
+
+
+def _minify_markup(markup):
+    markup = HTML_COMMENT.sub('', markup)
+    markup = STYLE.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), markup)
+    # A run of whitespace renders like a single space, so this is safe between inline elements
+    return WHITESPACE.sub(' ', markup)
+
+
+def minify_html(html):
+    """Strip comments and collapse whitespace, leaving <pre>, <textarea> and <script> untouched"""
+    parts = PRESERVED.split(html)
+    # split() with two groups yields: text, whole match, tag name, text, ...
+    output = []
+    for index in range(0, len(parts), 3):
+        output.append(_minify_markup(parts[index]))
+        if index + 1 < len(parts):
+            output.append(parts[index + 1])
+    return ''.join(output).strip()
@@ -1,9 +1,16 @@
 # media/models.py
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
+from .storage import private_storage
+
 
 class Category(models.Model):
     """Course categories (Web Design, Graphic Design, etc.)"""
@@ -14,6 +21,7 @@ class Category(models.Model):
     course_count = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -48,6 +56,10 @@ class Instructor(models.Model):
     experience = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='instructors/', blank=True, null=True)
+    # Blurred 20px preview and real size of profile_picture, filled on upload (placeholders.py)
+    placeholder = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     # Contact info
     email = models.EmailField(blank=True)
@@ -88,6 +100,9 @@ class Course(models.Model):
         ('archived', 'Archived'),
     ]
 
+    # Only ever changed with F() updates; save() on an existing course leaves them alone
+    COUNTER_FIELDS = ('enrolled_students', 'rating', 'rating_count', 'trending_score')
+
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, blank=True)
     short_description = models.CharField(max_length=300)
@@ -98,6 +113,27 @@ class Course(models.Model):
     # Course details
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # What a student pays and the discount, computed by the database (same rules as
+    # current_price / discount_percentage) so lists can sort and filter on them
+    effective_price = models.GeneratedField(
+        expression=Case(
+            When(discount_price__gt=0, then=F('discount_price')),
+            default=F('price'),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    discount_percent = models.GeneratedField(
+        expression=Case(
+            When(
+                discount_price__gt=0, price__gt=0,
+                then=Cast((F('price') - F('discount_price')) * 100 / F('price'), models.IntegerField()),
+            ),
+            default=Value(0),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, default='beginner')
     duration_hours = models.DecimalField(max_digits=5, decimal_places=1, help_text="Course duration in hours")
     max_students = models.IntegerField(default=30)
@@ -106,10 +142,16 @@ class Course(models.Model):
     # Media
     thumbnail = models.ImageField(upload_to='courses/thumbnails/')
     featured_image = models.ImageField(upload_to='courses/featured/', blank=True, null=True)
+    # Blurred 20px preview and real size of thumbnail, filled on upload (placeholders.py)
+    placeholder = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     # Ratings
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     rating_count = models.IntegerField(default=0)
+    # Popularity with exponential time decay; only changed through F() updates (trending.py)
+    trending_score = models.FloatField(default=0, db_index=True, editable=False)
 
     # Metadata
     is_featured = models.BooleanField(default=False)
@@ -123,10 +165,18 @@ class Course(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['effective_price'], name='course_effective_price_idx'),
+            models.Index(fields=['discount_percent'], name='course_discount_percent_idx'),
+            models.Index(fields=['rating'], name='course_rating_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return reverse('course_detail', args=[self.slug])
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -142,6 +192,10 @@ class Course(models.Model):
     def is_discounted(self):
         return self.discount_price is not None
 
+    @property
+    def seats_left(self):
+        return max(self.max_students - self.enrolled_students, 0)
+
     @property
     def discount_percentage(self):
         if self.discount_price and self.price > 0:
@@ -150,10 +204,19 @@ class Course(models.Model):
 
     def update_rating(self, new_rating):
         """Update course rating when new review is added"""
-        total_rating = (self.rating * self.rating_count) + new_rating
-        self.rating_count += 1
-        self.rating = total_rating / self.rating_count
-        self.save()
+        # In one UPDATE from the stored values, not from this possibly stale instance
+        total = ExpressionWrapper(F('rating') * F('rating_count') + new_rating, output_field=self._meta.get_field('rating'))
+        Course.objects.filter(pk=self.pk).update(
+            rating=Round(total / (F('rating_count') + 1), 2),
+            rating_count=F('rating_count') + 1,
+        )
+        self.refresh_from_db(fields=['rating', 'rating_count'])
+
+        from .caching import invalidate
+        transaction.on_commit(lambda: invalidate('courses'))
+
+        from .trending import record_rating
+        record_rating(self.pk, new_rating)
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
@@ -172,6 +235,14 @@ class Course(models.Model):
         if self.is_published and not self.published_date:
             self.published_date = timezone.now()
 
+        # Don't write back counters read before concurrent F() updates
+        # (enrollment.py, update_rating(), trending.py)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name not in self.COUNTER_FIELDS
+            ]
+
         super().save(*args, **kwargs)
 
         # Update course counts for categories
@@ -199,7 +270,8 @@ class Module(models.Model):
     description = models.TextField(blank=True)
     duration_minutes = models.IntegerField(default=0)
     video_url = models.URLField(blank=True)
-    attachment = models.FileField(upload_to='course_modules/', blank=True, null=True)
+    # Outside MEDIA_ROOT: only views.module_download sends it, after the access check
+    attachment = models.FileField(upload_to='course_modules/', storage=private_storage, blank=True, null=True)
     is_free_preview = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -217,6 +289,10 @@ class Testimonial(models.Model):
     profession = models.CharField(max_length=100, blank=True)
     company = models.CharField(max_length=100, blank=True, help_text="Company/School name")
     photo = models.ImageField(upload_to='testimonials/', blank=True, null=True)
+    # Blurred 20px preview and real size of photo, filled on upload (placeholders.py)
+    placeholder = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     message = models.TextField()
 
     # Optional: Link to a course the student took
@@ -280,12 +356,124 @@ class Testimonial(models.Model):
             return f"{self.name}, Student"
 
 
+class TestimonialStats(models.Model):
+    """Precomputed testimonial rollup (site-wide and per course)"""
+    SITE_SCOPE = 'all'
+
+    scope = models.CharField(max_length=50, unique=True)
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='testimonial_stats'
+    )
+
+    # Only active testimonials are counted
+    count = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Testimonial Statistics"
+        verbose_name_plural = "Testimonial Statistics"
+
+    def __str__(self):
+        return f"{self.scope} ({self.count} testimonials)"
+
+    @staticmethod
+    def scope_for(course_id):
+        return f"course:{course_id}" if course_id else TestimonialStats.SITE_SCOPE
+
+    @classmethod
+    def site(cls):
+        """Return the site-wide rollup (unsaved and empty if not built yet)"""
+        stats = cls.objects.filter(scope=cls.SITE_SCOPE).first()
+        return stats or cls(scope=cls.SITE_SCOPE)
+
+    @classmethod
+    def apply(cls, course_id, rating, delta):
+        """Add or remove one testimonial of the given rating from the rollup"""
+        changes = {'count': F('count') + delta, f'rating_{rating}': F(f'rating_{rating}') + delta}
+        scopes = [(cls.SITE_SCOPE, None)]
+        if course_id:
+            scopes.append((cls.scope_for(course_id), course_id))
+
+        for scope, scope_course_id in scopes:
+            if not cls.objects.filter(scope=scope).update(**changes):
+                cls.objects.get_or_create(scope=scope, defaults={'course_id': scope_course_id})
+                cls.objects.filter(scope=scope).update(**changes)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every rollup row from the testimonials table"""
+        rows = {}
+        grouped = (
+            Testimonial.objects.filter(is_active=True)
+            .values('course_id', 'rating')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for row in grouped:
+            scopes = [(cls.SITE_SCOPE, None)]
+            if row['course_id']:
+                scopes.append((cls.scope_for(row['course_id']), row['course_id']))
+            for scope, course_id in scopes:
+                stats = rows.setdefault(scope, cls(scope=scope, course_id=course_id))
+                field = f"rating_{row['rating']}"
+                setattr(stats, field, getattr(stats, field) + row['total'])
+                stats.count += row['total']
+
+        rows.setdefault(cls.SITE_SCOPE, cls(scope=cls.SITE_SCOPE))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rows.values())
+
+    @property
+    def rating_sum(self):
+        return sum(stars * getattr(self, f'rating_{stars}') for stars in range(1, 6))
+
+    @property
+    def average_rating(self):
+        if self.count > 0:
+            return round(self.rating_sum / self.count, 1)
+        return 0
+
+    @property
+    def satisfaction_rate(self):
+        """Percentage of 4-5 star ratings"""
+        if self.count > 0:
+            return round((self.rating_4 + self.rating_5) / self.count * 100)
+        return 0
+
+    @property
+    def histogram(self):
+        """Rating counts from 5 stars down to 1, with percentages"""
+        return [
+            {
+                'stars': stars,
+                'count': getattr(self, f'rating_{stars}'),
+                'percent': round(getattr(self, f'rating_{stars}') / self.count * 100) if self.count else 0,
+            }
+            for stars in range(5, 0, -1)
+        ]
+
+
 class Banner(models.Model):
     """Homepage banner/slider"""
     title = models.CharField(max_length=200)
     subtitle = models.TextField()
     description = models.TextField(blank=True)  # Add this line
     image = models.ImageField(upload_to='banners/')
+    # Blurred 20px preview and real size of image, filled on upload (placeholders.py)
+    placeholder = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     button_text = models.CharField(max_length=50, default='Learn More')
     button_url = models.CharField(max_length=200, default='#')
     secondary_button_text = models.CharField(max_length=50, blank=True)
@@ -404,6 +592,7 @@ class ContactMessage(models.Model):
     message = models.TextField()
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When admins were emailed about it")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -457,4 +646,145 @@ class FAQ(models.Model):
         verbose_name_plural = "FAQs"
 
     def __str__(self):
-        return self.question
\ No newline at end of file
+        return self.question
+
+class Job(models.Model):
+    """Background job stored in the database and run by `manage.py run_worker`"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_DEAD, 'Dead (gave up)'),
+    ]
+
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.IntegerField(default=0, help_text="Higher numbers run first")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # Scheduling and retries
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    # Worker bookkeeping
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'priority'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class ChunkedUpload(models.Model):
+    """A large file arriving in fixed-size chunks from the admin (see uploads.py)"""
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    stored_name = models.CharField(max_length=255, blank=True, help_text="Name in media storage once complete")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
+
+class CourseTerms(models.Model):
+    """Term counts of a course's text, kept so the related-courses job only re-reads changed courses"""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='terms')
+    signature = models.CharField(max_length=32, help_text="Hash of the text the terms were counted from")
+    terms = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Course terms"
+
+    def __str__(self):
+        return f"{self.course} ({len(self.terms)} terms)"
+
+
+class RelatedCourse(models.Model):
+    """Precomputed nearest neighbours of a course (see related.py)"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['course', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'rank'], name='related_course_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.course} -> {self.related} (#{self.rank})"
+
+
+class PageViewCount(models.Model):
+    """Page views per path and day, written in batches by analytics.py"""
+    path = models.CharField(max_length=255)
+    day = models.DateField()
+    views = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', '-views']
+        constraints = [
+            models.UniqueConstraint(fields=['path', 'day'], name='page_view_count_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='page_view_count_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} on {self.day}: {self.views}"
+
+
+class CourseViewCount(models.Model):
+    """Course page views and list impressions per day, written in batches by analytics.py"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='view_counts')
+    day = models.DateField()
+    views = models.BigIntegerField(default=0, help_text="Course page views")
+    impressions = models.BigIntegerField(default=0, help_text="Times the course card was shown in a list")
+
+    class Meta:
+        ordering = ['-day', '-views']
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'day'], name='course_view_count_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='course_view_count_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course} on {self.day}: {self.views} views"
@@ -0,0 +1,31 @@
+# elearning_app/outline.py
+"""
+The module outline shown on a course page, cached as rendered HTML.
+
+Each course's fragment carries its own tag, so saving or deleting a Module
+only invalidates the outline of the course it belongs to, plus the one it
+left when it was moved (signals.py). The
+modules are only queried when the fragment has to be rendered again; a
+cache hit costs no database query at all.
+"""
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import cached
+from .models import Module
+
+
+def outline_tag(course_id):
+    return f'course-outline:{course_id}'
+
+
+def _render_outline(course):
+    prefetch_related_objects([course], Prefetch('modules', queryset=Module.objects.order_by('order', 'pk')))
+    return render_to_string('course_outline.html', {'course': course, 'modules': course.modules.all()})
+
+
+def course_outline(course):
+    """The rendered outline of course's modules (safe HTML)"""
+    html = cached(f'course:{course.pk}:outline', lambda: _render_outline(course), tags=(outline_tag(course.pk),))
+    return mark_safe(html)
@@ -0,0 +1,78 @@
+# elearning_app/placeholders.py
+"""
+Low-quality image placeholders (LQIP).
+
+When an image is uploaded we shrink it to PLACEHOLDER_SIZE px and keep it as
+a base64 WebP data URI (a few hundred bytes) together with the real width
+and height. Templates paint the data URI as the <img> background and give
+the <img> explicit dimensions, so the card has its final size and a blurred
+preview before the lazy-loaded image arrives.
+"""
+import base64
+import io
+
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+from .models import Banner, Course, Instructor, Testimonial
+
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+
+# model -> the image field its placeholder describes
+PLACEHOLDER_FIELDS = {
+    Banner: 'image',
+    Course: 'thumbnail',
+    Instructor: 'profile_picture',
+    Testimonial: 'photo',
+}
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_placeholder(file):
+    """Return (data URI, width, height) for an image FieldFile, or None if it can't be read"""
+    stored = file._committed
+    try:
+        file.open('rb')
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            # Orientations 5-8 are rotated by 90 degrees: the page shows them the other way up
+            if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+            # JPEG decoders can downscale while decoding, far cheaper than a full decode
+            image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            preview = ImageOps.exif_transpose(image).convert('RGB')
+        preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        preview = preview.filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        preview.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    except (OSError, UnidentifiedImageError, ValueError):
+        return None
+    finally:
+        # An upload still has to be saved to storage after this, so only rewind it
+        if stored:
+            file.close()
+        elif not file.closed:
+            file.seek(0)
+    data = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/webp;base64,{data}', width, height
+
+
+def update_placeholder(instance, force=False):
+    """Fill instance.placeholder/image_width/image_height from its image; True if changed"""
+    file = getattr(instance, PLACEHOLDER_FIELDS[type(instance)])
+    if not file:
+        changed = bool(instance.placeholder or instance.image_width)
+        instance.placeholder, instance.image_width, instance.image_height = '', None, None
+        return changed
+    # Only a fresh upload (still uncommitted) is read on save. Stored files are
+    # left to backfill_placeholders, so an unreadable one isn't re-decoded on
+    # every later save of its row
+    if file._committed and not force:
+        return False
+    result = make_placeholder(file)
+    if result is None:
+        return False
+    instance.placeholder, instance.image_width, instance.image_height = result
+    return True
@@ -0,0 +1,79 @@
+# elearning_app/preload.py
+"""
+Resources the browser should start fetching before it has parsed the page.
+
+Views call preload(request, url, 'image') for what only they know about
+(the first home banner); PreloadMiddleware adds the site-wide ones (CSS
+bundle, web fonts) and sends everything as a Link header. The header sent
+for each path is remembered, so EarlyHintsApp can replay it as a
+103 Early Hints response on the next request, while the view is still
+running, on ASGI servers that offer the http.response.early_hint extension.
+"""
+from django.templatetags.static import static
+
+from .cssbundle import SOURCES, load_manifest
+
+# Must match the font stylesheets linked in base.html
+FONT_STYLESHEETS = [
+    'https://fonts.googleapis.com/css2?family=Cormorant+Garamond:wght@300;400;500;600;700'
+    '&family=Inter:wght@300;400;500;600;700&display=swap',
+    'https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;500;600;700&display=swap',
+]
+FONT_ORIGIN = 'https://fonts.gstatic.com'
+
+# Paths whose last Link header is kept for early hints; small on purpose
+MAX_REMEMBERED_PATHS = 256
+
+_hints = {}
+
+
+def preload(request, url, as_, type=None, crossorigin=False):
+    """Declare a resource the page needs above the fold"""
+    links = request.__dict__.setdefault('preload_links', [])
+    link = f'<{url}>; rel=preload; as={as_}'
+    if type:
+        link += f'; type="{type}"'
+    if crossorigin:
+        link += '; crossorigin'
+    if link not in links:
+        links.append(link)
+
+
+def site_links():
+    """Links every HTML page gets: stylesheets and fonts"""
+    manifest = load_manifest()
+    stylesheets = [manifest['bundle']] if manifest else SOURCES
+    links = [f'<{static(name)}>; rel=preload; as=style' for name in stylesheets]
+    links.append(f'<{FONT_ORIGIN}>; rel=preconnect; crossorigin')
+    links += [f'<{url}>; rel=preload; as=style' for url in FONT_STYLESHEETS]
+    return links
+
+
+def remember(path, links):
+    if path not in _hints and len(_hints) >= MAX_REMEMBERED_PATHS:
+        _hints.clear()
+    _hints[path] = links
+
+
+def hints_for(path):
+    return _hints.get(path)
+
+
+class EarlyHintsApp:
+    """ASGI wrapper sending 103 Early Hints with the Link header last sent for the path"""
+
+    EXTENSION = 'http.response.early_hint'
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] in ('GET', 'HEAD')
+            and self.EXTENSION in scope.get('extensions', {})
+        ):
+            links = hints_for(scope['path'])
+            if links:
+                await send({'type': self.EXTENSION, 'links': [link.encode('latin-1') for link in links]})
+        await self.app(scope, receive, send)
@@ -0,0 +1,194 @@
+# elearning_app/prerender.py
+"""
+Render the public pages to static files that nginx can serve on its own.
+
+Every page is written as PRERENDER_ROOT/<path>/index.html, filter variants
+as index.<query>.html, each with .gz and .br siblings for gzip_static and
+brotli_static. Files are replaced atomically and left alone when the
+content didn't change. Example nginx config:
+
+    location ~ ^/(|about/|courses/|team/|testimonials/)$ {
+        if ($request_method !~ ^(GET|HEAD)$) { return 418; }
+        set $page /prerendered${uri}index.html;
+        if ($args) { set $page /prerendered${uri}index.${args}.html; }
+        gzip_static on;
+        brotli_static on;
+        try_files $page @django;
+    }
+    error_page 418 = @django;
+
+Saving a model only re-renders the pages built from it: PAGES lists the
+cache tags (see signals.CACHE_TAGS) each page depends on.
+"""
+import hashlib
+import math
+import os
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .caching import fresh_values
+from .compression import available_encodings, compress
+from .jobs import enqueue
+from .minify import minify_html
+from .models import Category, Course, Job, Testimonial
+
+PRERENDER_TASK = 'prerender_pages'
+
+# url name -> cache tags of the data the page shows
+PAGES = {
+    'home': ('banners', 'courses', 'instructors', 'testimonials', 'students', 'trending'),
+    'about': ('instructors', 'courses', 'students'),
+    'courses': ('courses', 'instructors'),
+    'team': ('instructors', 'courses'),
+    'testimonials': ('testimonials', 'courses'),
+}
+
+ENCODING_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def prerender_root():
+    return Path(getattr(settings, 'PRERENDER_ROOT', Path(settings.BASE_DIR) / 'prerendered'))
+
+
+def pages_for_tags(tags):
+    tags = set(tags)
+    return [name for name, page_tags in PAGES.items() if tags.intersection(page_tags)]
+
+
+# ---------- which URLs exist ----------
+
+def _course_queries():
+    # Same parameter order as the links in courses.html: category, then level
+    categories = [None, *Category.objects.filter(is_active=True).values_list('slug', flat=True)]
+    levels = [None, *(code for code, _ in Course.LEVEL_CHOICES)]
+    for category in categories:
+        for level in levels:
+            query = {}
+            if category:
+                query['category'] = category
+            if level:
+                query['level'] = level
+            yield query
+
+
+def _testimonial_queries():
+    from .views import TESTIMONIALS_PER_PAGE
+    pages = math.ceil(Testimonial.objects.filter(is_active=True).count() / TESTIMONIALS_PER_PAGE)
+    yield {}
+    for page in range(2, pages + 1):
+        yield {'page': page}
+
+
+def queries_for(name):
+    if name == 'courses':
+        return list(_course_queries())
+    if name == 'testimonials':
+        return list(_testimonial_queries())
+    return [{}]
+
+
+def file_for(path, query):
+    directory = prerender_root() / path.strip('/')
+    if not query:
+        return directory / 'index.html'
+    return directory / f'index.{urlencode(query)}.html'
+
+
+# ---------- rendering ----------
+
+def render_page(path, query):
+    """Run the view the way an anonymous GET would, minus the middleware"""
+    request = RequestFactory().get(path, query)
+    request.user = AnonymousUser()
+    # Not a visitor: keeps the view out of the analytics counters
+    request._prerender = True
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    html = response.content.decode(response.charset)
+    if getattr(settings, 'HTML_MINIFY', False):
+        html = minify_html(html)
+    return html.encode('utf-8')
+
+
+def _write_atomic(path, data):
+    temp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _unchanged(path, data):
+    try:
+        current = path.read_bytes()
+    except FileNotFoundError:
+        return False
+    return hashlib.blake2b(current).digest() == hashlib.blake2b(data).digest()
+
+
+def write_page(path, html):
+    """Write html and its compressed siblings; False when nothing changed"""
+    if _unchanged(path, html):
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Siblings first, so a new index.html never goes out with an old .gz
+    for encoding in available_encodings():
+        _write_atomic(path.with_name(path.name + ENCODING_SUFFIXES[encoding]), compress(html, encoding, best=True))
+    _write_atomic(path, html)
+    return True
+
+
+def _remove_stale(path, keep):
+    # Variants that no longer exist (deleted category, fewer testimonial pages)
+    removed = 0
+    if not path.parent.is_dir():
+        return removed
+    for existing in path.parent.glob('index*.html*'):
+        name = existing.name
+        for suffix in ENCODING_SUFFIXES.values():
+            name = name.removesuffix(suffix)
+        if name in keep or name.endswith('.tmp'):
+            continue
+        existing.unlink()
+        removed += 1
+    return removed
+
+
+def prerender(pages=None, tags=None):
+    """Render the given pages (default: all, or those depending on tags); returns counts"""
+    if pages is None:
+        pages = pages_for_tags(tags) if tags else list(PAGES)
+    stats = {'written': 0, 'unchanged': 0, 'removed': 0}
+    with fresh_values():
+        for name in pages:
+            path = reverse(name)
+            written = set()
+            for query in queries_for(name):
+                target = file_for(path, query)
+                html = render_page(path, query)
+                if html is None:
+                    continue
+                stats['written' if write_page(target, html) else 'unchanged'] += 1
+                written.add(target.name)
+            stats['removed'] += _remove_stale(file_for(path, {}), written)
+    return stats
+
+
+# ---------- re-rendering after saves ----------
+
+def schedule_prerender(tags):
+    """Queue one delayed re-render; saves made meanwhile add their tags to the same job"""
+    if not getattr(settings, 'PRERENDER_ON_SAVE', True) or not prerender_root().is_dir():
+        return
+    tags = set(tags)
+    for job in Job.objects.filter(task=PRERENDER_TASK, status=Job.STATUS_QUEUED):
+        merged = sorted(tags.union(job.kwargs.get('tags', [])))
+        # Only touch the job while it is still waiting; a running one has read its kwargs
+        if Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(kwargs={'tags': merged}):
+            return
+    enqueue(PRERENDER_TASK, tags=sorted(tags), delay=getattr(settings, 'PRERENDER_DELAY_SECONDS', 10), priority=3)
@@ -0,0 +1,85 @@
+# elearning_app/ratelimit.py
+import hashlib
+import ipaddress
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class RateLimiter:
+    """
+    Requests allowed per key, counted in a cache shared by all workers.
+
+    Behaves like a token bucket holding `capacity` tokens that refill one per
+    `refill_seconds`, approximated with a sliding window: the count in the
+    current window of capacity * refill_seconds, plus the previous window's
+    count weighted by how much of it still overlaps. Counters only change
+    through add() and incr(), which are atomic in the cache, so parallel
+    requests can't all read the same count and all pass.
+    """
+
+    def __init__(self, name, capacity, refill_seconds, cache_alias=None):
+        self.name = name
+        self.capacity = capacity
+        self.window = capacity * refill_seconds
+        self.cache = caches[cache_alias or settings.RATELIMIT_CACHE]
+
+    def _key(self, key, window):
+        return f"ratelimit:{self.name}:{key}:{window}"
+
+    def allow(self, key):
+        """Count one request for `key`; False means the caller is over the limit"""
+        now = time.time()
+        window, position = divmod(now, self.window)
+        cache_key = self._key(key, int(window))
+        # Kept until it stops counting as the previous window
+        self.cache.add(cache_key, 0, int(2 * self.window) + 1)
+        try:
+            count = self.cache.incr(cache_key)
+        except ValueError:
+            # Expired between add() and incr(): this request starts a new counter
+            self.cache.add(cache_key, 1, int(2 * self.window) + 1)
+            count = 1
+
+        previous = self.cache.get(self._key(key, int(window) - 1), 0)
+        if previous * (1 - position / self.window) + count > self.capacity:
+            # Refused requests don't use up the allowance
+            try:
+                self.cache.decr(cache_key)
+            except ValueError:
+                pass
+            return False
+        return True
+
+
+def client_ip(request):
+    """
+    The visitor's address. Behind TRUSTED_PROXY_COUNT proxies (nginx) it is
+    the entry those proxies appended to X-Forwarded-For; anything further
+    left was sent by the client and can't be trusted. REMOTE_ADDR when that
+    entry isn't an IP address.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        try:
+            return str(ipaddress.ip_address(forwarded[-proxies]))
+        except ValueError:
+            pass
+    return request.META.get('REMOTE_ADDR')
+
+
+def is_duplicate_submission(*parts, window=None):
+    """True if the same content was already submitted within `window` seconds"""
+    window = window or settings.CONTACT_DUPLICATE_WINDOW
+    digest = hashlib.sha256("\x1f".join(str(part).strip().lower() for part in parts).encode()).hexdigest()
+    # add() only stores the key if it's absent, so the first submission wins
+    return not caches[settings.RATELIMIT_CACHE].add(f"duplicate:{digest}", 1, window)
+
+
+contact_limiter = RateLimiter(
+    'contact',
+    capacity=settings.CONTACT_RATELIMIT_BURST,
+    refill_seconds=settings.CONTACT_RATELIMIT_REFILL_SECONDS,
+)
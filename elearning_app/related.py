@@ -0,0 +1,189 @@
+# elearning_app/related.py
+"""
+"Related courses", precomputed.
+
+Each published course is described by the words of its title, short and
+full description, weighted per field by RELATED_FIELD_WEIGHTS.
+The word counts are stored in CourseTerms together with a hash of the
+text, so a rebuild only tokenizes courses whose text changed.
+
+The rebuild then turns the stored counts into a sparse TF-IDF matrix with
+unit-length rows, so one sparse product gives every cosine similarity.
+Sharing a category or a level adds a fixed bonus, and the RELATED_COURSES_K
+best-scoring courses are kept. Rows are processed in blocks, so memory
+stays at BLOCK_SIZE x (number of courses).
+
+The result lives in RelatedCourse, (course, rank) -> related course.
+Showing related courses is one indexed read, and only courses whose
+neighbour list actually changed are rewritten.
+"""
+import hashlib
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .jobs import enqueue
+from .models import Course, CourseTerms, Job, RelatedCourse
+
+RELATED_TASK = 'rebuild_related_courses'
+
+WORD = re.compile(r'[^\W\d_]{2,}')
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has have in into is it its of on or our so
+    that the their this to was we were will with you your can all more how what
+    which who than then them they these those also about over only
+""".split())
+
+# Title words describe a course better than the long description's
+RELATED_FIELD_WEIGHTS = {'title': 3, 'short_description': 2, 'full_description': 1}
+
+CATEGORY_BONUS = 0.3
+LEVEL_BONUS = 0.1
+BLOCK_SIZE = 512
+
+
+def tokenize(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def count_terms(values):
+    """Weighted word counts of a course's title and descriptions"""
+    counts = Counter()
+    for field, weight in RELATED_FIELD_WEIGHTS.items():
+        for word in tokenize(values[field] or ''):
+            counts[word] += weight
+    return dict(counts)
+
+
+def text_signature(values):
+    digest = hashlib.blake2b(digest_size=16)
+    for field in RELATED_FIELD_WEIGHTS:
+        digest.update((values[field] or '').encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def refresh_terms(courses):
+    """Re-count terms for courses whose text changed; returns how many were re-counted"""
+    stored = dict(CourseTerms.objects.filter(course_id__in=courses).values_list('course_id', 'signature'))
+    changed = []
+    for course_id, values in courses.items():
+        signature = text_signature(values)
+        if stored.get(course_id) != signature:
+            changed.append(CourseTerms(course_id=course_id, signature=signature, terms=count_terms(values)))
+    CourseTerms.objects.bulk_create(
+        changed, update_conflicts=True, unique_fields=['course'], update_fields=['signature', 'terms', 'updated_at'],
+    )
+    return len(changed)
+
+
+def tfidf_matrix(term_counts):
+    """Row-normalized sparse TF-IDF matrix for a list of {word: count} dicts"""
+    vocabulary = {}
+    rows, cols, values = [], [], []
+    for row, counts in enumerate(term_counts):
+        for word, count in counts.items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+            values.append(count)
+    shape = (len(term_counts), max(len(vocabulary), 1))
+    matrix = sparse.csr_matrix((np.asarray(values, dtype=np.float64), (rows, cols)), shape=shape)
+
+    # Sublinear term frequency and smoothed inverse document frequency
+    matrix.data = 1.0 + np.log(matrix.data)
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = np.log((1.0 + shape[0]) / (1.0 + document_frequency)) + 1.0
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def nearest_neighbours(matrix, categories, levels, k):
+    """For each row, [(column, score), ...] of the k best other rows"""
+    count = matrix.shape[0]
+    k = min(k, count - 1)
+    if k <= 0:
+        return [[] for _ in range(count)]
+    transposed = matrix.T.tocsc()
+    result = []
+    for start in range(0, count, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, count)
+        scores = (matrix[start:stop] @ transposed).toarray()
+        scores += CATEGORY_BONUS * ((categories[start:stop, None] == categories[None, :]) & (categories[None, :] >= 0))
+        scores += LEVEL_BONUS * (levels[start:stop, None] == levels[None, :])
+        # A course is not related to itself
+        scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for columns, row_scores in zip(best, best_scores):
+            result.append([(int(column), float(score)) for column, score in zip(columns, row_scores) if score > 0])
+    return result
+
+
+def rebuild_related_courses(k=None):
+    """Bring CourseTerms and RelatedCourse up to date; returns (re-counted, rewritten) courses"""
+    k = k or settings.RELATED_COURSES_K
+    courses = {
+        row['id']: row
+        for row in Course.objects.filter(is_published=True)
+        .order_by('id')
+        .values('id', 'category_id', 'level', *RELATED_FIELD_WEIGHTS)
+    }
+    recounted = refresh_terms(courses)
+
+    ids = list(courses)
+    terms = dict(CourseTerms.objects.filter(course_id__in=ids).values_list('course_id', 'terms'))
+    matrix = tfidf_matrix([terms.get(course_id, {}) for course_id in ids])
+    categories = np.array([courses[course_id]['category_id'] or -1 for course_id in ids])
+    level_codes = {level: code for code, (level, _) in enumerate(Course.LEVEL_CHOICES)}
+    levels = np.array([level_codes.get(courses[course_id]['level'], -1) for course_id in ids])
+    neighbours = nearest_neighbours(matrix, categories, levels, k) if ids else []
+
+    current = {}
+    for course_id, related_id in RelatedCourse.objects.order_by('course', 'rank').values_list('course_id', 'related_id'):
+        current.setdefault(course_id, []).append(related_id)
+
+    rows, rewritten = [], []
+    for course_id, found in zip(ids, neighbours):
+        related = [ids[column] for column, _ in found]
+        if current.get(course_id, []) != related:
+            rewritten.append(course_id)
+            rows += [
+                RelatedCourse(course_id=course_id, related_id=ids[column], rank=rank, score=score)
+                for rank, (column, score) in enumerate(found)
+            ]
+    # Unpublished or deleted courses drop out of the index
+    stale = set(current) - set(ids)
+
+    with transaction.atomic():
+        RelatedCourse.objects.filter(course_id__in=rewritten + list(stale)).delete()
+        RelatedCourse.objects.bulk_create(rows)
+    CourseTerms.objects.exclude(course_id__in=ids).delete()
+    return recounted, len(rewritten) + len(stale)
+
+
+def related_courses(course, limit=None):
+    """Published courses related to course, best first"""
+    limit = limit or settings.RELATED_COURSES_K
+    return [
+        entry.related
+        for entry in RelatedCourse.objects.filter(course=course, related__is_published=True)
+        .select_related('related')
+        .order_by('rank')[:limit]
+    ]
+
+
+def schedule_related_rebuild():
+    """Queue one delayed rebuild unless one is already waiting"""
+    if not Job.objects.filter(task=RELATED_TASK, status=Job.STATUS_QUEUED).exists():
+        enqueue(RELATED_TASK, delay=settings.RELATED_COURSES_DELAY_SECONDS, priority=2)
@@ -0,0 +1,48 @@
+# elearning_app/routers.py
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Set by ReplicaRoutingMiddleware for requests that may read from the replica
+use_replica = ContextVar('use_replica', default=False)
+
+# Sessions and users are read where they are written: a login or logout
+# must not be undone by a replica copied a minute earlier
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'contenttypes'}
+
+# Cache tag bumped after every commit that changes what public pages show
+# (signals.CACHE_TAGS); refresh_replica copies when it moves. Counter and job
+# writes don't touch it, so they don't cost a copy and a cache wipe each time.
+CONTENT_TAG = 'replica-content'
+
+
+def replica_is_fresh():
+    """The replica exists and `refresh_replica` checked it recently"""
+    try:
+        stat = os.stat(settings.DATABASES['replica']['NAME'])
+    except OSError:
+        return False
+    # Connecting to a missing SQLite file leaves an empty one behind
+    return stat.st_size > 0 and time.time() - stat.st_mtime <= settings.REPLICA_MAX_AGE_SECONDS
+
+
+class ReplicaRouter:
+    """Send reads to the 'replica' snapshot while a public read-only request is running"""
+
+    def db_for_read(self, model, **hints):
+        if use_replica.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return 'replica'
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a byte-for-byte copy made by `manage.py refresh_replica`
+        return db == 'default'
@@ -0,0 +1,171 @@
+# elearning_app/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from .caching import invalidate
+from .outline import outline_tag
+from .routers import CONTENT_TAG
+from .placeholders import PLACEHOLDER_FIELDS, update_placeholder
+from .models import (
+    Banner, Category, ContactMessage, Course, Enrollment, Instructor, Module,
+    Student, Testimonial, TestimonialStats
+)
+
+
+# ========== Testimonial statistics ==========
+@receiver(pre_save, sender=Testimonial)
+def remember_testimonial_state(sender, instance, **kwargs):
+    """Keep the stored row so post_save can apply only the difference"""
+    instance._stats_previous = None
+    if instance.pk:
+        instance._stats_previous = (
+            Testimonial.objects.filter(pk=instance.pk)
+            .values('is_active', 'rating', 'course_id')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Testimonial)
+def update_testimonial_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_stats_previous', None)
+    current = {'is_active': instance.is_active, 'rating': instance.rating, 'course_id': instance.course_id}
+    if previous == current:
+        return
+
+    if previous and previous['is_active']:
+        TestimonialStats.apply(previous['course_id'], previous['rating'], -1)
+    if current['is_active']:
+        TestimonialStats.apply(current['course_id'], current['rating'], 1)
+
+
+@receiver(post_delete, sender=Testimonial)
+def remove_testimonial_stats(sender, instance, **kwargs):
+    if instance.is_active:
+        TestimonialStats.apply(instance.course_id, instance.rating, -1)
+
+
+# ========== Trending score ==========
+@receiver(post_save, sender=Testimonial)
+def trend_testimonial(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_stats_previous', None)
+    newly_active = instance.is_active and not (previous and previous['is_active'])
+    if not raw and newly_active and instance.course_id:
+        from .trending import record_testimonial
+        record_testimonial(instance.course_id, instance.rating)
+
+
+@receiver(post_save, sender=Enrollment)
+def trend_enrollment(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # New enrollments and reactivated ones (enrollment.enroll_student)
+    reactivated = update_fields is not None and 'is_active' in update_fields
+    if not raw and instance.is_active and (created or reactivated):
+        from .trending import record_enrollment
+        record_enrollment(instance.course_id)
+
+
+# ========== Contact form notifications ==========
+@receiver(post_save, sender=ContactMessage)
+def queue_contact_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .notifications import schedule_contact_digest
+        transaction.on_commit(schedule_contact_digest)
+
+
+# ========== Image placeholders ==========
+def fill_image_placeholder(sender, instance, raw=False, **kwargs):
+    """Compute the blurred preview while the upload is still in memory"""
+    if not raw:
+        update_placeholder(instance)
+
+
+for model in PLACEHOLDER_FIELDS:
+    pre_save.connect(fill_image_placeholder, sender=model, dispatch_uid=f'placeholder-{model.__name__}')
+
+
+# ========== Course outlines ==========
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, raw=False, **kwargs):
+    """A module moved to another course leaves the old course's outline stale too"""
+    instance._outline_previous_course = None
+    if instance.pk and not raw:
+        instance._outline_previous_course = (
+            Module.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_module_outline(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_ids = {instance.course_id, getattr(instance, '_outline_previous_course', None)} - {None}
+    tags = [outline_tag(course_id) for course_id in course_ids]
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_outline(sender, instance, raw=False, **kwargs):
+    # Download links in the outline contain the slug
+    if not raw:
+        tag = outline_tag(instance.pk)
+        transaction.on_commit(lambda: invalidate(tag))
+
+
+# ========== Related courses ==========
+@receiver(post_save, sender=Course)
+def queue_related_rebuild(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from .related import schedule_related_rebuild
+        transaction.on_commit(schedule_related_rebuild)
+
+
+# ========== Sitemap ==========
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_delete, sender=Testimonial)
+def queue_sitemap_rebuild(sender, raw=False, **kwargs):
+    if not raw:
+        from .sitemaps import schedule_sitemap_rebuild
+        transaction.on_commit(schedule_sitemap_rebuild)
+
+
+# ========== Cache invalidation ==========
+# Cached blocks built from these models are tagged with the listed names
+CACHE_TAGS = {
+    Banner: ('banners',),
+    Category: ('courses',),
+    Course: ('courses',),
+    Module: ('courses',),
+    Instructor: ('instructors', 'courses'),
+    Testimonial: ('testimonials',),
+    Student: ('students',),
+}
+
+
+def invalidate_cached_blocks(sender, **kwargs):
+    # After commit: a reader recomputing earlier would store pre-commit data
+    # under the new generation, and keep it for the whole ttl
+    if not kwargs.get('raw'):
+        tags = CACHE_TAGS[sender]
+        transaction.on_commit(lambda: invalidate(*tags, CONTENT_TAG))
+
+
+def rerender_static_pages(sender, **kwargs):
+    if not kwargs.get('raw'):
+        from .prerender import schedule_prerender
+        tags = CACHE_TAGS[sender]
+        transaction.on_commit(lambda: schedule_prerender(tags))
+
+
+for model in CACHE_TAGS:
+    post_save.connect(invalidate_cached_blocks, sender=model, dispatch_uid=f'cache-{model.__name__}-save')
+    post_delete.connect(invalidate_cached_blocks, sender=model, dispatch_uid=f'cache-{model.__name__}-delete')
+    post_save.connect(rerender_static_pages, sender=model, dispatch_uid=f'prerender-{model.__name__}-save')
+    post_delete.connect(rerender_static_pages, sender=model, dispatch_uid=f'prerender-{model.__name__}-delete')
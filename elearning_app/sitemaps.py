@@ -0,0 +1,200 @@
+# elearning_app/sitemaps.py
+"""
+sitemap.xml, generated ahead of time.
+
+SITEMAP_ROOT holds a sitemap index (sitemap.xml) pointing at one file per
+section: the static pages, the category listings and the course pages.
+Each file has a .gz sibling (.br too when Brotli is installed). Files are
+only rewritten when their content changed, so their modification time is
+a truthful Last-Modified for nginx to answer If-Modified-Since with.
+Example nginx config:
+
+    location ~ ^/sitemap[-a-z0-9]*\\.xml$ {
+        root /srv/sat-fergana/prerendered/sitemaps;
+        gzip_static on;
+        try_files $uri @django;
+    }
+
+Course pages are split into shards of SITEMAP_SHARD_SIZE by primary key
+range (sitemap-courses-1.xml holds pks below the shard size, and so on),
+not by position. Publishing or deleting a course therefore changes a single
+shard, and the rest stay byte-for-byte the same.
+
+lastmod comes from updated_at. A category listing changes when the
+category or one of its courses does. Pages with no timestamp of their
+own (about, team, contact) have no lastmod; the protocol prefers none to
+a made-up one.
+
+Saving a course, category or testimonial queues one delayed rebuild
+(saves made meanwhile share it), the way prerender.py does for pages.
+"""
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Max
+from django.urls import reverse
+
+from .compression import available_encodings, negotiate
+from .jobs import enqueue
+from .models import Category, Course, Job, Testimonial
+from .prerender import ENCODING_SUFFIXES, write_page
+
+SITEMAP_TASK = 'build_sitemaps'
+INDEX_NAME = 'sitemap.xml'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap_root():
+    return Path(getattr(settings, 'SITEMAP_ROOT', Path(settings.BASE_DIR) / 'prerendered' / 'sitemaps'))
+
+
+def section_name(section):
+    return f'sitemap-{section}.xml'
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def _lastmod(value):
+    return value.isoformat(timespec='seconds') if value else None
+
+
+# ---------- which URLs exist ----------
+
+def _newest(queryset):
+    return queryset.aggregate(newest=Max('updated_at'))['newest']
+
+
+def page_urls():
+    courses = _newest(Course.objects.filter(is_published=True))
+    testimonials = _newest(Testimonial.objects.filter(is_active=True))
+    # url name -> when the content it shows last changed
+    pages = {
+        'home': max(filter(None, [courses, testimonials]), default=None),
+        'courses': courses,
+        'about': None,
+        'team': None,
+        'testimonials': testimonials,
+        'contact': None,
+    }
+    return [(absolute(reverse(name)), _lastmod(changed)) for name, changed in pages.items()]
+
+
+def category_urls():
+    # The courses page filtered to the category, as prerender.py writes it
+    listing = reverse('courses')
+    newest_course = dict(
+        Course.objects.filter(is_published=True, category__isnull=False)
+        .values('category').annotate(newest=Max('updated_at')).values_list('category', 'newest')
+    )
+    urls = []
+    for pk, slug, updated_at in Category.objects.filter(is_active=True).values_list('pk', 'slug', 'updated_at'):
+        changed = max(filter(None, [updated_at, newest_course.get(pk)]))
+        urls.append((absolute(f"{listing}?{urlencode({'category': slug})}"), _lastmod(changed)))
+    return urls
+
+
+def course_shards():
+    """{shard number: [(url, lastmod), ...]} of the published courses"""
+    size = settings.SITEMAP_SHARD_SIZE
+    shards = defaultdict(list)
+    courses = Course.objects.filter(is_published=True).order_by('pk').values_list('pk', 'slug', 'updated_at')
+    for pk, slug, updated_at in courses.iterator(chunk_size=2000):
+        shards[pk // size + 1].append(
+            (absolute(reverse('course_detail', args=[slug])), _lastmod(updated_at))
+        )
+    return dict(shards)
+
+
+def sections():
+    """{section: [(url, lastmod), ...]}, leaving out empty ones"""
+    found = {'pages': page_urls(), 'categories': category_urls()}
+    found.update((f'courses-{number}', urls) for number, urls in course_shards().items())
+    return {section: urls for section, urls in found.items() if urls}
+
+
+# ---------- rendering ----------
+
+def _entry(tag, location, lastmod):
+    lines = [f'<{tag}><loc>{escape(location)}</loc>']
+    if lastmod:
+        lines.append(f'<lastmod>{lastmod}</lastmod>')
+    lines.append(f'</{tag}>')
+    return ''.join(lines)
+
+
+def render_urlset(urls):
+    body = '\n'.join(_entry('url', location, lastmod) for location, lastmod in urls)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n{body}\n</urlset>\n'.encode('utf-8')
+
+
+def render_index(sitemaps):
+    body = '\n'.join(_entry('sitemap', location, lastmod) for location, lastmod in sitemaps)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n{body}\n</sitemapindex>\n'.encode('utf-8')
+
+
+def _remove_stale(root, keep):
+    # Shards that emptied out, or categories/pages no longer listed
+    removed = 0
+    for existing in root.glob('sitemap-*.xml*'):
+        name = existing.name
+        for suffix in ENCODING_SUFFIXES.values():
+            name = name.removesuffix(suffix)
+        if name in keep or name.endswith('.tmp'):
+            continue
+        existing.unlink()
+        removed += 1
+    return removed
+
+
+def build_sitemaps():
+    """Write the index and every section; returns counts"""
+    root = sitemap_root()
+    stats = {'written': 0, 'unchanged': 0, 'removed': 0, 'urls': 0}
+    index = []
+    written = set()
+    for section, urls in sections().items():
+        name = section_name(section)
+        written.add(name)
+        stats['written' if write_page(root / name, render_urlset(urls)) else 'unchanged'] += 1
+        stats['urls'] += len(urls)
+        lastmods = [lastmod for _, lastmod in urls if lastmod]
+        index.append((absolute(reverse('sitemap_section', args=[section])), max(lastmods, default=None)))
+    # Sections before the index, so it never points at a file not yet written
+    stats['written' if write_page(root / INDEX_NAME, render_index(index)) else 'unchanged'] += 1
+    stats['removed'] = _remove_stale(root, written)
+    return stats
+
+
+# ---------- serving ----------
+
+def read_sitemap(name, accept_encoding=''):
+    """(bytes, content encoding or None) of a generated file, or None if it doesn't exist"""
+    path = sitemap_root() / name
+    if not path.exists() and name == INDEX_NAME:
+        # First request after a deploy: build everything now
+        build_sitemaps()
+    encoding = negotiate(accept_encoding)
+    if encoding in available_encodings():
+        try:
+            return path.with_name(name + ENCODING_SUFFIXES[encoding]).read_bytes(), encoding
+        except FileNotFoundError:
+            pass
+    try:
+        return path.read_bytes(), None
+    except FileNotFoundError:
+        return None
+
+
+# ---------- rebuilding after saves ----------
+
+def schedule_sitemap_rebuild():
+    """Queue one delayed rebuild unless one is already waiting"""
+    if not getattr(settings, 'SITEMAP_ON_SAVE', True) or not (sitemap_root() / INDEX_NAME).exists():
+        return
+    if not Job.objects.filter(task=SITEMAP_TASK, status=Job.STATUS_QUEUED).exists():
+        enqueue(SITEMAP_TASK, delay=getattr(settings, 'SITEMAP_DELAY_SECONDS', 60), priority=1)
@@ -0,0 +1,127 @@
+# elearning_app/storage.py
+"""
+Media storage that names every file after a hash of its content.
+
+An upload to testimonials/ is stored as testimonials/<32 hex digits>.jpg:
+uploading the same picture again reuses the stored file instead of adding
+bunyodjon_2uHtiSR.jpg next to it, and a URL always serves the same bytes,
+so media can be cached forever:
+
+    location ~ "^/media/.+/[0-9a-f]{32}\\.\\w+$" {
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+Files are never overwritten in place, so nothing is deleted when a row
+changes; `manage.py gc_media` removes files no row refers to any more.
+
+Module attachments go to PrivateMediaStorage instead: the same naming, but
+under PRIVATE_MEDIA_ROOT, outside MEDIA_ROOT, with no URL at all. They only
+leave through downloads.serve_file(), after the enrollment check.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(content):
+    # Callers that have already read the whole file (chunked uploads) pass the digest along
+    known = getattr(content, 'content_hash', None)
+    if known:
+        return known
+    digest = new_hasher()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed_name(name):
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return bool(HASHED_NAME.match(stem))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, content_hash(content) + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Same bytes are already stored under this name
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The name is derived from the content: if it exists it already holds these bytes
+        return name
+
+    def _save(self, name, content):
+        # Write under a unique temporary name, then move into place atomically,
+        # so two identical uploads racing each other can't leave a torn file
+        directory, filename = posixpath.split(name)
+        temp_name = super()._save(posixpath.join(directory, f'.{filename}.{uuid.uuid4().hex}.part'), content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+
+class PrivateMediaStorage(ContentAddressedStorage):
+    """Files no URL points at (see downloads.py)"""
+
+    @property
+    def base_location(self):
+        # Read on every use, like MEDIA_ROOT, so tests can override it
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        # url() raises instead of pointing at the public /media/ tree
+        return None
+
+
+private_storage = PrivateMediaStorage()
+
+def file_fields():
+    """(model, field) for every FileField/ImageField of every installed model"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def referenced_names(storage):
+    """Names of all files stored in storage that some row still points at"""
+    names = set()
+    for model, field in file_fields():
+        if getattr(field.storage, 'location', None) != storage.location:
+            continue
+        names.update(
+            model._base_manager.exclude(**{field.name: ''})
+            .exclude(**{f'{field.name}__isnull': True})
+            .values_list(field.name, flat=True)
+        )
+    return names
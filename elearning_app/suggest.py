@@ -0,0 +1,132 @@
+# elearning_app/suggest.py
+"""
+Search-as-you-type suggestions from an in-process prefix index.
+
+Every worker keeps a sorted list of normalized keys for course titles,
+instructor names and category names, one key per word position ("sat math
+prep" is also found as "math prep" and "prep"). A lookup is a bisect to
+the first key starting with the query plus a short forward scan, so it
+needs neither the database nor the cache.
+
+The index is built from one values_list() query when a worker starts
+(core/wsgi.py, core/asgi.py) and rebuilt when the 'courses' cache
+generation changes (any Course, Category, Module or Instructor save bumps
+it, see signals.py). The stamp is read at most once
+every SUGGEST_CHECK_SECONDS, so most lookups never leave the process.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.urls import reverse
+
+from .caching import generation
+from .models import Course
+
+INDEX_TAGS = ('courses',)
+
+# Kinds in the order they are offered
+COURSE, CATEGORY, INSTRUCTOR = 0, 1, 2
+KIND_NAMES = {COURSE: 'course', CATEGORY: 'category', INSTRUCTOR: 'instructor'}
+
+# Matches examined per lookup before ranking; bounds the worst case
+MAX_SCAN = 200
+
+
+def normalize(text):
+    """Lowercase, accents stripped, single spaces"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """entries: iterable of (kind, label, url)"""
+        keys = []
+        self.entries = []
+        for kind, label, url in entries:
+            words = normalize(label).split(' ')
+            number = len(self.entries)
+            self.entries.append((kind, label, url))
+            for position in range(len(words)):
+                # Position 0 (the label's own start) ranks above matches inside it
+                keys.append((' '.join(words[position:]), position, number))
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.refs = [(position, number) for _, position, number in keys]
+
+    def search(self, query, limit=8):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        matches = {}
+        start = bisect_left(self.keys, prefix)
+        for index in range(start, min(start + MAX_SCAN, len(self.keys))):
+            if not self.keys[index].startswith(prefix):
+                break
+            position, number = self.refs[index]
+            if number not in matches or position < matches[number]:
+                matches[number] = position
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (item[1] > 0, self.entries[item[0]][0], len(self.entries[item[0]][1])),
+        )
+        return [self.entries[number] for number, _ in ranked[:limit]]
+
+
+def build_index():
+    """One query over published courses, with their instructors and categories"""
+    courses_url = reverse('courses')
+    entries, seen = [], set()
+    rows = Course.objects.filter(is_published=True).values_list(
+        'title', 'slug', 'instructor__name', 'category__name', 'category__slug', 'category__is_active',
+    )
+    for title, slug, instructor, category, category_slug, category_active in rows:
+        entries.append((COURSE, title, reverse('course_detail', args=[slug])))
+        if instructor and (INSTRUCTOR, instructor) not in seen:
+            seen.add((INSTRUCTOR, instructor))
+            entries.append((INSTRUCTOR, instructor, f"{courses_url}?{urlencode({'search': instructor})}"))
+        if category and category_active and (CATEGORY, category) not in seen:
+            seen.add((CATEGORY, category))
+            entries.append((CATEGORY, category, f"{courses_url}?{urlencode({'category': category_slug})}"))
+    return PrefixIndex(entries)
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'generation': None, 'checked': 0.0}
+
+
+def get_index():
+    """This process's index, rebuilt if the catalog changed since it was built"""
+    now = time.monotonic()
+    if _state['index'] is not None and now - _state['checked'] < settings.SUGGEST_CHECK_SECONDS:
+        return _state['index']
+    current = generation(*INDEX_TAGS)
+    if _state['index'] is None or current != _state['generation']:
+        with _lock:
+            if _state['index'] is None or current != _state['generation']:
+                _state['index'] = build_index()
+                _state['generation'] = current
+    _state['checked'] = now
+    return _state['index']
+
+
+def warm_index():
+    """Build the index while the worker starts instead of on its first request"""
+    try:
+        get_index()
+    except DatabaseError:
+        # Not migrated yet; the first request builds it
+        pass
+
+
+def suggest(query, limit=8):
+    return [
+        {'label': label, 'type': KIND_NAMES[kind], 'url': url}
+        for kind, label, url in get_index().search(query, limit)
+    ]
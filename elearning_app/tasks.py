@@ -0,0 +1,40 @@
+# elearning_app/tasks.py
+from .jobs import task
+
+
+@task
+def recount_enrollments():
+    from .enrollment import recount_enrolled_students
+    return recount_enrolled_students()
+
+
+@task
+def rebuild_testimonial_stats():
+    from .caching import invalidate
+    from .models import TestimonialStats
+    TestimonialStats.rebuild()
+    invalidate('testimonials')
+
+
+@task
+def send_contact_digest():
+    from .notifications import send_contact_digest as send_digest
+    return send_digest()
+
+
+@task
+def prerender_pages(tags=None):
+    from .prerender import prerender
+    return prerender(tags=tags)
+
+
+@task
+def rebuild_related_courses(k=None):
+    from .related import rebuild_related_courses as rebuild
+    return rebuild(k=k)
+
+
+@task
+def build_sitemaps():
+    from .sitemaps import build_sitemaps as build
+    return build()
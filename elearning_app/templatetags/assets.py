@@ -0,0 +1,41 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from elearning_app.cssbundle import SOURCES, load_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def stylesheets():
+    """Inline critical CSS and load the bundle without blocking; plain links if it isn't built"""
+    manifest = load_manifest()
+    if manifest is None:
+        return format_html_join(
+            '\n', '<link href="{}" rel="stylesheet">', ((static(name),) for name in SOURCES)
+        )
+    href = static(manifest['bundle'])
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link href="{}" rel="stylesheet"></noscript>',
+        mark_safe(manifest['critical_css']), href, href,
+    )
+
+
+@register.simple_tag
+def image_size(obj):
+    """width/height attributes from the stored image size, so the layout doesn't shift"""
+    if obj.image_width and obj.image_height:
+        return format_html('width="{}" height="{}"', obj.image_width, obj.image_height)
+    return ''
+
+
+@register.filter
+def placeholder_style(obj):
+    """CSS painting the blurred preview behind an <img> until the real image loads"""
+    if obj.placeholder:
+        return f'background: url({obj.placeholder}) center / cover no-repeat;'
+    return ''
@@ -1,3 +1,1415 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import analytics, compression, cssbundle, jobs, preload, suggest
+from .cache_backends import SQLiteCache
+from .cards import course_cards
+from .caching import generation
+from .catalog import COURSE_SORTS, course_batch, course_filters, decode_cursor, filter_courses, parse_price
+from .compression import available_encodings, negotiate
+from .enrollment import AlreadyEnrolled, CourseFull, enroll_student, unenroll_student
+from .models import (
+    ChunkedUpload, ContactMessage, Course, CourseTerms, CourseViewCount, Enrollment, Job, Module, PageViewCount,
+    RelatedCourse, Student, Testimonial, TestimonialStats,
+)
+from .notifications import DIGEST_TASK, schedule_contact_digest, send_contact_digest
+from .outline import course_outline, outline_tag
+from .prerender import pages_for_tags, render_page
+from .ratelimit import RateLimiter, client_ip
+from .related import count_terms, rebuild_related_courses, refresh_terms, related_courses
+from .middleware import CompressionMiddleware, HTMLMinifyMiddleware, PreloadMiddleware
+from .routers import ReplicaRouter, replica_is_fresh, use_replica
+from .sitemaps import build_sitemaps
+from .storage import private_storage
+from .suggest import PrefixIndex
+from .trending import refresh_trending_pages
+
+
+def setUpModule():
+    # Caches in a directory of their own, not the site's .cache files
+    directory = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(directory.cleanup)
+    test_caches = {
+        alias: {**config, 'LOCATION': f'{directory.name}/{alias}.sqlite3'}
+        for alias, config in settings.CACHES.items()
+    }
+    # No counters or background flusher during tests; AnalyticsTests turns them back on
+    test_settings = override_settings(CACHES=test_caches, ANALYTICS_ENABLED=False)
+    test_settings.enable()
+    unittest.addModuleCleanup(test_settings.disable)
+
+
+def make_course(**fields):
+    defaults = {
+        'title': 'Test course',
+        'short_description': 'Short',
+        'full_description': 'Full',
+        'price': 100,
+        'duration_hours': 10,
+        'thumbnail': 'courses/thumbnails/test.jpg',
+    }
+    return Course.objects.create(**{**defaults, **fields})
+
+
+def make_students(count, prefix='student'):
+    return [
+        Student.objects.create(user=User.objects.create_user(f'{prefix}{number}'))
+        for number in range(count)
+    ]
+
+
+def run_concurrently(func, arguments):
+    """Call func(argument) for every argument, each in its own thread and connection"""
+    results = [None] * len(arguments)
+    start = threading.Barrier(len(arguments))
+
+    def worker(index, argument):
+        try:
+            start.wait()
+            results[index] = func(argument)
+        except Exception as error:
+            results[index] = error
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=item) for item in enumerate(arguments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class EnrollmentTests(TransactionTestCase):
+    # enroll_student() refuses to run inside TestCase's transaction
+
+    def test_full_course_refuses_more_students(self):
+        course = make_course(max_students=2)
+        first, second, third = make_students(3)
+        enroll_student(first, course)
+        enroll_student(second, course)
+        with self.assertRaises(CourseFull):
+            enroll_student(third, course)
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 2)
+
+    def test_enrolling_twice_is_refused(self):
+        course = make_course()
+        student, = make_students(1)
+        enroll_student(student, course)
+        with self.assertRaises(AlreadyEnrolled):
+            enroll_student(student, course)
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 1)
+
+    def test_unenrolling_frees_the_seat(self):
+        course = make_course(max_students=1)
+        first, second = make_students(2)
+        enroll_student(first, course)
+        self.assertTrue(unenroll_student(first, course))
+        enroll_student(second, course)
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 1)
+
+    def test_saving_a_stale_course_keeps_the_counters(self):
+        course = make_course(max_students=1)
+        stale = Course.objects.get(pk=course.pk)
+        student, = make_students(1)
+        enroll_student(student, course)
+        course.update_rating(4)
+
+        stale.title = 'Renamed'
+        stale.save()
+        stale.update_rating(2)
+        course.refresh_from_db()
+        self.assertEqual(course.title, 'Renamed')
+        self.assertEqual(course.enrolled_students, 1)
+        self.assertEqual((course.rating, course.rating_count), (Decimal('3.00'), 2))
+        self.assertEqual((stale.rating, stale.rating_count), (Decimal('3.00'), 2))
+
+    def test_simultaneous_signups_never_exceed_max_students(self):
+        course = make_course(max_students=5)
+        students = make_students(20)
+        results = run_concurrently(lambda student: enroll_student(student, course), students)
+
+        enrolled = [result for result in results if isinstance(result, Enrollment)]
+        refused = [result for result in results if isinstance(result, CourseFull)]
+        self.assertEqual((len(enrolled), len(refused)), (5, 15), results)
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 5)
+        self.assertEqual(Enrollment.objects.filter(course=course, is_active=True).count(), 5)
+
+
+class TestimonialStatsTests(TestCase):
+
+    def setUp(self):
+        self.maths, self.physics = make_course(title='Maths'), make_course(title='Physics')
+
+    def assertStatsMatchTestimonials(self):
+        """Every rollup row equals a fresh aggregate of the active testimonials"""
+        for course in (None, self.maths, self.physics):
+            testimonials = Testimonial.objects.filter(is_active=True)
+            if course:
+                testimonials = testimonials.filter(course=course)
+            expected = {f'rating_{rating}': 0 for rating in range(1, 6)}
+            for rating, total in testimonials.values_list('rating').annotate(total=Count('id')).order_by():
+                expected[f'rating_{rating}'] = total
+            expected['count'] = sum(expected.values())
+            stats = TestimonialStats.objects.filter(scope=TestimonialStats.scope_for(course and course.pk)).first()
+            stored = {field: getattr(stats, field, 0) for field in expected}
+            self.assertEqual(stored, expected, course)
+
+    def add(self, **fields):
+        return Testimonial.objects.create(**{'name': 'Aziza', 'message': 'Great', 'course': self.maths, **fields})
+
+    def test_create_active_and_inactive(self):
+        self.add(rating=5)
+        self.add(rating=4, course=self.physics)
+        self.add(rating=3, is_active=False)
+        self.add(rating=2, course=None)
+        self.assertStatsMatchTestimonials()
+        self.assertEqual(TestimonialStats.site().count, 3)
+
+    def test_toggle_active(self):
+        testimonial = self.add(rating=5)
+        testimonial.is_active = False
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+        testimonial.is_active = True
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+
+    def test_change_rating(self):
+        testimonial = self.add(rating=5)
+        testimonial.rating = 2
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+        # Saving without changes doesn't count it twice
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+
+    def test_move_to_another_course(self):
+        testimonial = self.add(rating=4)
+        testimonial.course = self.physics
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+        testimonial.course = None
+        testimonial.save()
+        self.assertStatsMatchTestimonials()
+
+    def test_delete(self):
+        active, inactive = self.add(rating=5), self.add(rating=1, is_active=False)
+        active.delete()
+        inactive.delete()
+        self.assertStatsMatchTestimonials()
+
+    def test_raw_fixture_load_is_left_to_rebuild(self):
+        self.add(rating=5)
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fixture:
+            json.dump([{
+                'model': 'elearning_app.testimonial', 'pk': 9000,
+                'fields': {'name': 'Loaded', 'message': 'From a fixture', 'rating': 3,
+                           'course': self.physics.pk, 'is_active': True,
+                           'created_at': '2026-01-01T00:00:00Z', 'updated_at': '2026-01-01T00:00:00Z'},
+            }], fixture)
+            fixture.flush()
+            call_command('loaddata', fixture.name, verbosity=0)
+        # Raw saves skip the signal handlers...
+        self.assertEqual(TestimonialStats.site().count, 1)
+        # ...and rebuild_testimonial_stats catches up
+        TestimonialStats.rebuild()
+        self.assertStatsMatchTestimonials()
+
+
+class EnrollmentAdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.client.cookies['db_primary'] = '1'
+
+    def add(self, student, course):
+        return self.client.post('/admin/elearning_app/enrollment/add/', {
+            'student': student.pk, 'course': course.pk, 'is_active': 'on',
+        })
+
+    def test_admin_enrollments_take_seats(self):
+        course = make_course(max_students=1)
+        first, second = make_students(2)
+        self.assertEqual(self.add(first, course).status_code, 302)
+        response = self.add(second, course)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'is full')
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 1)
+
+        enrollment = Enrollment.objects.get(student=first, course=course)
+        self.client.post(f'/admin/elearning_app/enrollment/{enrollment.pk}/delete/', {'post': 'yes'})
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students, 0)
+
+
+class ModuleAdminUploadTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.client.cookies['db_primary'] = '1'
+
+    def add(self, course, upload):
+        return self.client.post('/admin/elearning_app/module/add/', {
+            'course': course.pk, 'title': 'Lesson', 'order': 0, 'duration_minutes': 0,
+            'attachment_upload': upload.pk,
+        })
+
+    def upload_by(self, user):
+        return ChunkedUpload.objects.create(
+            user=user, filename='notes.pdf', size=1, chunk_size=1, offset=1,
+            status=ChunkedUpload.STATUS_COMPLETE, stored_name='course_modules/notes.pdf',
+        )
+
+    def test_own_upload_is_attached(self):
+        course = make_course()
+        self.assertEqual(self.add(course, self.upload_by(self.admin)).status_code, 302)
+        self.assertEqual(Module.objects.get(course=course).attachment.name, 'course_modules/notes.pdf')
+
+    def test_someone_elses_upload_is_refused(self):
+        course = make_course()
+        other = User.objects.create_superuser('other', 'other@example.com', 'password')
+        response = self.add(course, self.upload_by(other))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'could not be found')
+        self.assertFalse(Module.objects.exists())
+
+
+@jobs.task(name='test_sleep')
+def sleep_task(seconds):
+    time.sleep(seconds)
+
+
+class JobTests(TransactionTestCase):
+
+    def test_running_job_keeps_its_lock_fresh(self):
+        job = jobs.enqueue('test_sleep', 0.5)
+        claimed = jobs.claim_next('worker-1')
+        # Claimed long ago: without a heartbeat it would count as stale right away
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        def look_for_stale_jobs():
+            time.sleep(0.3)
+            return jobs.requeue_stale_jobs()
+
+        with mock.patch.object(jobs, 'HEARTBEAT_SECONDS', 0.1):
+            results = run_concurrently(lambda step: step(), [lambda: jobs.run_job(claimed), look_for_stale_jobs])
+        self.assertEqual(results, [True, 0])
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_DONE)
+
+    def test_old_finished_jobs_are_pruned(self):
+        old = jobs.enqueue('test_sleep', 0)
+        recent = jobs.enqueue('test_sleep', 0)
+        dead = jobs.enqueue('test_sleep', 0)
+        Job.objects.filter(pk=old.pk).update(status=Job.STATUS_DONE, finished_at=timezone.now() - timedelta(days=30))
+        Job.objects.filter(pk=recent.pk).update(status=Job.STATUS_DONE, finished_at=timezone.now())
+        Job.objects.filter(pk=dead.pk).update(status=Job.STATUS_DEAD, finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(jobs.prune_finished_jobs(), 1)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {recent.pk, dead.pk})
+
+
+def make_contact_messages(count):
+    return [
+        ContactMessage.objects.create(
+            name=f'Visitor {number}', email=f'visitor{number}@example.com',
+            subject=f'Question {number}', message='Hello',
+        )
+        for number in range(count)
+    ]
+
+
+@override_settings(CONTACT_NOTIFICATION_EMAILS=['staff@example.com'], CONTACT_DIGEST_SIZE=3,
+                   CONTACT_DIGEST_SECONDS=300)
+class ContactDigestTests(TestCase):
+
+    def digest_jobs(self):
+        return Job.objects.filter(task=DIGEST_TASK, status=Job.STATUS_QUEUED)
+
+    def test_messages_share_one_delayed_digest(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_contact_messages(2)
+        job, = self.digest_jobs()
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=200))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_full_batch_is_sent_without_waiting(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_contact_messages(3)
+        job, = self.digest_jobs()
+        self.assertLessEqual(job.run_at, timezone.now())
+
+    def test_digest_batches_and_marks_messages(self):
+        make_contact_messages(7)
+        self.assertEqual(send_contact_digest(), 7)
+        self.assertEqual([len(email.body.split('From: ')) - 1 for email in mail.outbox], [3, 3, 1])
+        self.assertEqual(mail.outbox[0].to, ['staff@example.com'])
+        self.assertFalse(ContactMessage.objects.filter(notified_at__isnull=True).exists())
+        # Nothing left: a second run sends nothing
+        self.assertEqual(send_contact_digest(), 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+@override_settings(CONTACT_NOTIFICATION_EMAILS=['staff@example.com'])
+class ContactDigestConcurrencyTests(TransactionTestCase):
+
+    def test_simultaneous_submissions_queue_one_digest(self):
+        make_contact_messages(1)
+        run_concurrently(lambda _: schedule_contact_digest(), range(10))
+        self.assertEqual(Job.objects.filter(task=DIGEST_TASK).count(), 1)
+
+
+class RateLimiterTests(SimpleTestCase):
+
+    def limiter(self, capacity=5):
+        # A fresh name per test: the ratelimit cache is a shared file
+        return RateLimiter(f'test-{uuid.uuid4().hex}', capacity=capacity, refill_seconds=3600)
+
+    def test_burst_then_refused(self):
+        limiter = self.limiter(capacity=3)
+        self.assertEqual([limiter.allow('10.0.0.1') for _ in range(5)], [True, True, True, False, False])
+        # Other visitors have their own allowance
+        self.assertTrue(limiter.allow('10.0.0.2'))
+
+    def test_parallel_requests_share_one_allowance(self):
+        limiter = self.limiter(capacity=5)
+        results = run_concurrently(lambda _: limiter.allow('10.0.0.1'), range(30))
+        self.assertEqual(results.count(True), 5, results)
+        # Refusals were not counted against the visitor
+        self.assertFalse(limiter.allow('10.0.0.1'))
+
+    def test_previous_window_still_counts(self):
+        limiter = self.limiter(capacity=4)
+        with mock.patch('elearning_app.ratelimit.time.time', return_value=limiter.window * 1000 - 1):
+            self.assertEqual(sum(limiter.allow('10.0.0.1') for _ in range(4)), 4)
+        # A quarter into the next window three quarters of the old count remain
+        with mock.patch('elearning_app.ratelimit.time.time', return_value=limiter.window * 1000.25):
+            self.assertEqual(sum(limiter.allow('10.0.0.1') for _ in range(4)), 1)
+
+
+class ClientIPTests(SimpleTestCase):
+
+    def request(self, forwarded=None):
+        headers = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded else {}
+        return RequestFactory().get('/', REMOTE_ADDR='127.0.0.1', **headers)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_address_added_by_the_proxy(self):
+        # The client can prepend anything; only nginx's entry counts
+        self.assertEqual(client_ip(self.request('6.6.6.6, 203.0.113.7')), '203.0.113.7')
+        self.assertEqual(client_ip(self.request()), '127.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_no_proxy_ignores_the_header(self):
+        self.assertEqual(client_ip(self.request('6.6.6.6')), '127.0.0.1')
+
+    def test_header_is_ignored_by_default(self):
+        self.assertEqual(client_ip(self.request('6.6.6.6')), '127.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_entries_that_are_not_addresses_fall_back_to_the_peer(self):
+        for forwarded in ('not-an-ip', '203.0.113.7, unknown', '999.1.1.1'):
+            with self.subTest(forwarded=forwarded):
+                self.assertEqual(client_ip(self.request(forwarded)), '127.0.0.1')
+        self.assertEqual(client_ip(self.request('2001:db8::1')), '2001:db8::1')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = self.make_cache(f'{directory.name}/cache.sqlite3')
+
+    @staticmethod
+    def make_cache(path, **options):
+        return SQLiteCache(path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 5, **options}})
+
+    def test_add_only_stores_absent_or_expired_keys(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        with mock.patch('elearning_app.cache_backends.time.time', return_value=time.time() + 10):
+            self.cache.set('short', 1, timeout=5)
+        self.assertEqual(self.cache.get('short'), 1)
+        with mock.patch('elearning_app.cache_backends.time.time', return_value=time.time() + 20):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertTrue(self.cache.add('short', 2))
+
+    def test_incr_is_atomic_across_connections(self):
+        self.cache.set('counter', 0)
+        run_concurrently(lambda _: [self.cache.incr('counter') for _ in range(50)], range(8))
+        self.assertEqual(self.cache.get('counter'), 400)
+        self.assertEqual(self.cache.decr('counter', 100), 300)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_misses(self):
+        self.cache.set('key', 'value', timeout=60)
+        self.cache.set_many({'a': 1, 'b': 2}, timeout=60)
+        later = time.time() + 61
+        with mock.patch('elearning_app.cache_backends.time.time', return_value=later):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertEqual(self.cache.get_many(['a', 'b']), {})
+            self.assertFalse(self.cache.has_key('a'))
+
+    def test_least_recently_used_entries_are_culled(self):
+        start = time.time()
+        with mock.patch('elearning_app.cache_backends.time.time', return_value=start):
+            for number in range(10):
+                self.cache.set(f'key{number}', number)
+        # Read long enough later to refresh the LRU stamp, through get() and get_many()
+        with mock.patch('elearning_app.cache_backends.time.time', return_value=start + 100):
+            self.cache.get('key0')
+            self.cache.get_many(['key1', 'key2'])
+            self.cache.set('key10', 10)
+            self.cache.cull()
+        remaining = set(self.cache.get_many([f'key{number}' for number in range(11)]))
+        self.assertTrue({'key0', 'key1', 'key2', 'key10'} <= remaining, remaining)
+        self.assertLess(len(remaining), 11)
+
+    def test_delete_tag_drops_only_tagged_entries(self):
+        self.cache.set('course-list', 'html', tags=['courses'])
+        self.cache.set_many({'card-1': 'a', 'card-2': 'b'}, tags=['courses', 'instructors'])
+        self.cache.add('team', 'html', tags=['instructors'])
+        self.cache.set('banner', 'html')
+        self.assertEqual(self.cache.delete_tag('courses'), 3)
+        self.assertEqual(self.cache.get_many(['course-list', 'card-1', 'card-2', 'team', 'banner']),
+                         {'team': 'html', 'banner': 'html'})
+        self.assertEqual(self.cache.delete_tag('instructors'), 1)
+        self.assertIsNone(self.cache.get('team'))
+
+
+class CacheInvalidationTests(TestCase):
+
+    def test_tags_are_invalidated_after_commit(self):
+        before = generation('courses')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course()
+            self.assertEqual(generation('courses'), before)
+        self.assertNotEqual(generation('courses'), before)
+
+    def test_renaming_a_course_invalidates_its_outline_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = make_course(title='Old', slug='old')
+            Module.objects.create(course=course, title='Lesson', attachment='course_modules/notes.pdf')
+        self.assertIn('/old/', course_outline(course))
+        before = generation(outline_tag(course.pk))
+
+        course.slug = 'new'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+            self.assertEqual(generation(outline_tag(course.pk)), before)
+        self.assertNotEqual(generation(outline_tag(course.pk)), before)
+        outline = course_outline(Course.objects.get(pk=course.pk))
+        self.assertIn('/new/', outline)
+        self.assertNotIn('/old/', outline)
+
+    def test_moving_a_module_invalidates_both_outlines(self):
+        old_course, new_course = make_course(title='Old'), make_course(title='New')
+        module = Module.objects.create(course=old_course, title='Lesson')
+        course_outline(old_course), course_outline(new_course)
+        before = {course.pk: generation(outline_tag(course.pk)) for course in (old_course, new_course)}
+
+        module.course = new_course
+        with self.captureOnCommitCallbacks(execute=True):
+            module.save()
+        for course in (old_course, new_course):
+            self.assertNotEqual(generation(outline_tag(course.pk)), before[course.pk])
+        # Fresh instances: rendering left the modules prefetched on the old ones
+        self.assertNotIn('Lesson', course_outline(Course.objects.get(pk=old_course.pk)))
+        self.assertIn('Lesson', course_outline(Course.objects.get(pk=new_course.pk)))
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def test_sessions_and_users_are_read_from_the_primary(self):
+        router = ReplicaRouter()
+        token = use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+        finally:
+            use_replica.reset(token)
+        self.assertEqual(router.db_for_read(Course), 'default')
+
+    @override_settings(REPLICA_MAX_AGE_SECONDS=300)
+    def test_replica_is_abandoned_when_refreshing_stops(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/replica.sqlite3'
+        with mock.patch.dict(settings.DATABASES['replica'], NAME=path):
+            self.assertFalse(replica_is_fresh())
+            open(path, 'w').close()
+            self.assertFalse(replica_is_fresh())  # empty file left by a stray connect
+            with open(path, 'w') as replica:
+                replica.write('data')
+            self.assertTrue(replica_is_fresh())
+            old = time.time() - 301
+            os.utime(path, (old, old))
+            self.assertFalse(replica_is_fresh())
+
+
+class StopRefreshing(Exception):
+    pass
+
+
+class ReplicaRefreshTests(TransactionTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica = mock.patch.dict(settings.DATABASES['replica'], NAME=f'{directory.name}/replica.sqlite3')
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def refresh_between(self, *writes):
+        """Run refresh_replica --interval, doing one write per pause; returns the copies made"""
+        pauses = iter(writes)
+
+        def pause(seconds):
+            write = next(pauses, None)
+            if write is None:
+                raise StopRefreshing
+            write()
+
+        output = io.StringIO()
+        with mock.patch('elearning_app.management.commands.refresh_replica.time.sleep', pause):
+            with self.assertRaises(StopRefreshing):
+                call_command('refresh_replica', interval=1, stdout=output)
+        return output.getvalue().count('Replica refreshed')
+
+    def count_a_view(self):
+        PageViewCount.objects.create(path=f'/{uuid.uuid4()}/', day=timezone.localdate(), views=1)
+
+    def test_only_content_saves_trigger_a_copy(self):
+        course = make_course(title='Before')
+        courses_generation = generation('courses')
+
+        def rename_course():
+            course.title = 'After'
+            course.save()
+
+        # Initial copy, nothing for the counter writes, then one for the course
+        self.assertEqual(self.refresh_between(self.count_a_view, self.count_a_view, rename_course), 2)
+        titles = sqlite3.connect(settings.DATABASES['replica']['NAME']).execute(
+            f'SELECT title FROM {Course._meta.db_table}'
+        ).fetchall()
+        self.assertEqual(titles, [('After',)])
+        self.assertNotEqual(generation('courses'), courses_generation)
+
+    def test_counter_writes_are_copied_later_without_wiping_the_cache(self):
+        seen = {}
+
+        def count_a_view():
+            seen['generation'] = generation('courses')
+            self.count_a_view()
+
+        # Every pass finds --other-writes-interval elapsed
+        clock = itertools.count(step=1000)
+        with mock.patch('elearning_app.management.commands.refresh_replica.time.monotonic', lambda: next(clock)):
+            self.assertEqual(self.refresh_between(count_a_view), 2)
+        self.assertEqual(generation('courses'), seen['generation'])
+
+
+class CompressionTests(SimpleTestCase):
+    PAGE = '<html><body>' + 'Course outline. ' * 200 + '</body></html>'
+
+    def respond(self, accept_encoding='gzip', response=None, **headers):
+        if response is None:
+            response = HttpResponse(self.PAGE, content_type='text/html; charset=utf-8')
+        for name, value in headers.items():
+            response[name.replace('_', '-')] = value
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation_honours_q_values(self):
+        self.assertEqual(negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('*'), available_encodings()[0])
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate(''))
+
+    @unittest.skipUnless(compression.brotli, 'Brotli is not installed')
+    def test_brotli_is_preferred(self):
+        self.assertEqual(negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate('gzip, br;q=0.8'), 'gzip')
+        response = self.respond('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content).decode(), self.PAGE)
+
+    def test_html_is_compressed(self):
+        response = self.respond('gzip', ETag='"v1"')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), self.PAGE)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # The compressed bytes no longer match a strong validator
+        self.assertEqual(response['ETag'], 'W/"v1"')
+
+    def test_uncompressed_answer_still_varies(self):
+        response = self.respond('identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content.decode(), self.PAGE)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_encoded_ranged_small_and_binary_responses_pass_through(self):
+        cases = {
+            'already encoded': self.respond(Content_Encoding='br'),
+            'byte ranges': self.respond(Accept_Ranges='bytes'),
+            'small': self.respond(response=HttpResponse('<p>Hi</p>')),
+            'binary': self.respond(response=HttpResponse(b'\0' * 2000, content_type='image/png')),
+        }
+        for name, response in cases.items():
+            with self.subTest(name):
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+                self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(cases['already encoded'].content.decode(), self.PAGE)
+
+    def test_streaming_responses_are_compressed_on_the_fly(self):
+        chunks = [self.PAGE[:100], self.PAGE[100:]]
+        response = StreamingHttpResponse(iter(chunks), content_type='text/html')
+        response['Content-Length'] = str(len(self.PAGE))
+        response = self.respond('gzip', response=response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(), self.PAGE)
+
+
+@override_settings(HTML_MINIFY=True)
+class ResponseMemoTests(SimpleTestCase):
+
+    def respond(self, path='/', vary=None, cookie=False):
+        page = f'<html><body>{uuid.uuid4().hex}{" " * 2000}</body></html>'
+        response = HttpResponse(page, content_type='text/html; charset=utf-8')
+        if vary:
+            response['Vary'] = vary
+        if cookie:
+            response.set_cookie('csrftoken', 'token')
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip')
+        middleware = CompressionMiddleware(HTMLMinifyMiddleware(lambda request: response))
+        middleware(request)
+        return page
+
+    def memoized(self, page):
+        cache = caches[settings.COMPRESSION_CACHE]
+        digest = hashlib.blake2b(page.encode(), digest_size=20).hexdigest()
+        return cache.has_key(f'minified:{digest}')
+
+    def test_shared_pages_are_memoized(self):
+        self.assertTrue(self.memoized(self.respond()))
+
+    def test_per_visitor_pages_are_not(self):
+        self.assertFalse(self.memoized(self.respond(vary='Accept-Encoding, Cookie')))
+        self.assertFalse(self.memoized(self.respond(cookie=True)))
+        self.assertFalse(self.memoized(self.respond('/courses/?search=python')))
+
+
+@override_settings(ANALYTICS_ENABLED=True)
+@mock.patch('elearning_app.analytics._started')
+class AnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.client.cookies['db_primary'] = '1'
+        self.course = make_course(is_published=True)
+        for counter in (analytics._pages, analytics._courses):
+            counter.clear()
+            self.addCleanup(counter.clear)
+
+    def counted(self, field):
+        return sum(count for (_, _, kind), count in analytics._courses.items() if kind == field)
+
+    def test_visitors_are_counted(self, started):
+        self.client.get('/courses/')
+        self.client.get(self.course.get_absolute_url())
+        self.assertEqual((self.counted('impressions'), self.counted('views')), (1, 1))
+
+    def test_prerendering_is_not_counted(self, started):
+        self.assertIsNotNone(render_page('/courses/', {}))
+        self.assertIsNotNone(render_page(self.course.get_absolute_url(), {}))
+        self.assertEqual((self.counted('impressions'), self.counted('views')), (0, 0))
+
+    def test_flush_writes_the_counts(self, started):
+        self.client.get(self.course.get_absolute_url())
+        self.client.get(self.course.get_absolute_url())
+        analytics.flush()
+        counts = CourseViewCount.objects.get(course=self.course)
+        self.assertEqual((counts.views, counts.impressions), (2, 0))
+        self.assertEqual(PageViewCount.objects.get(path=self.course.get_absolute_url()).views, 2)
+        self.course.refresh_from_db()
+        self.assertGreater(self.course.trending_score, 0)
+        self.assertEqual(analytics.flush(), 0)
+
+    def test_exit_flush_leaves_other_databases_alone(self, started):
+        self.client.get(self.course.get_absolute_url())
+        # As after a test run: counted on the test database, which is gone by exit
+        with mock.patch.dict(analytics._owner, pid=os.getpid(), database='/gone/test_db.sqlite3'), \
+                mock.patch('elearning_app.analytics.flush') as flush:
+            analytics._flush_at_exit()
+        flush.assert_not_called()
+
+
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        self.client.cookies['db_primary'] = '1'
+
+    def test_home_page_picks_up_new_trending_scores(self):
+        course = make_course(title='Rising course', is_published=True)
+        self.assertNotContains(self.client.get('/'), 'Rising course')
+
+        # How scores change: an UPDATE, no save() and no signal
+        Course.objects.filter(pk=course.pk).update(trending_score=5)
+        refresh_trending_pages()
+        self.assertContains(self.client.get('/'), 'Rising course')
+        self.assertEqual(pages_for_tags(['trending']), ['home'])
+
+
+class CourseBatchWalker:
+    """Pages through the course list the way the courses page does"""
+
+    def walk(self, size=2, **params):
+        """pks of every batch in turn, checked against the same list fetched in one go"""
+        filters = course_filters(params)
+        courses = filter_courses(filters)
+        seen, cursor = [], None
+        # A cursor that doesn't move on would page forever
+        for _ in range(Course.objects.count() // size + 1):
+            batch, cursor = course_batch(courses, filters['sort'], cursor, size)
+            seen += [course.pk for course in batch]
+            if cursor is None:
+                self.assertEqual(seen, list(courses.values_list('pk', flat=True)), params)
+                return seen
+        self.fail(f'{params}: still paging after every course was shown')
+
+
+class CoursePagingTests(CourseBatchWalker, TestCase):
+
+    def setUp(self):
+        # Plenty of ties, so the pk tie-breaker matters for every sort
+        for number in range(7):
+            make_course(
+                title=f'Course {number}',
+                price=100 + 50 * (number % 2),
+                discount_price=80 if number == 3 else None,
+                rating=4 + number % 3 // 2,
+                rating_count=number % 2,
+                enrolled_students=number % 3,
+            )
+        Course.objects.filter(title__in=['Course 1', 'Course 2']).update(created_at=timezone.now())
+
+    def test_batches_follow_the_full_ordering(self):
+        for sort in COURSE_SORTS:
+            with self.subTest(sort=sort):
+                self.walk(sort=sort)
+
+    def test_course_added_meanwhile_does_not_shift_the_list(self):
+        courses = filter_courses(course_filters({'sort': 'newest'}))
+        first, cursor = course_batch(courses, 'newest', size=3)
+        make_course(title='Brand new')
+        second, _ = course_batch(courses, 'newest', cursor, size=3)
+        self.assertEqual(
+            [course.pk for course in first + second],
+            list(Course.objects.exclude(title='Brand new').order_by('-created_at', '-pk').values_list('pk', flat=True)[:6]),
+        )
+
+    def test_foreign_or_forged_cursors_restart_from_the_top(self):
+        courses = filter_courses(course_filters({'sort': 'price'}))
+        first, cursor = course_batch(courses, 'price', size=2)
+        self.assertEqual(course_batch(courses, 'price', cursor + 'x', size=2)[0], first)
+        self.assertIsNone(decode_cursor(cursor, 'rating'))
+
+
+class EffectivePriceTests(CourseBatchWalker, TestCase):
+    """Prices compared and sorted on the generated effective_price column"""
+
+    def setUp(self):
+        self.courses = {
+            'full': make_course(title='Full price', price=100),
+            'zero discount': make_course(title='Zero discount', price=120, discount_price=0),
+            'discounted': make_course(title='Discounted', price=200, discount_price=90),
+            'free': make_course(title='Free', price=0),
+            'same as discounted': make_course(title='Same as discounted', price=90),
+        }
+
+    def titles(self, **params):
+        return {course.title for course in filter_courses(course_filters(params))}
+
+    def test_generated_column_matches_current_price(self):
+        for name, course in self.courses.items():
+            with self.subTest(name):
+                course = Course.objects.get(pk=course.pk)
+                self.assertEqual(course.effective_price, course.current_price)
+        self.assertEqual(Course.objects.get(pk=self.courses['zero discount'].pk).effective_price, 120)
+
+    def test_min_and_max_price(self):
+        self.assertEqual(self.titles(min_price='90', max_price='100'), {'Full price', 'Discounted', 'Same as discounted'})
+        self.assertEqual(self.titles(max_price='0'), {'Free'})
+        self.assertEqual(self.titles(min_price='101'), {'Zero discount'})
+
+    def test_bad_prices_are_ignored(self):
+        for value in ('abc', '-5', 'NaN', 'Infinity', '', None):
+            with self.subTest(value=value):
+                self.assertIsNone(course_filters({'min_price': value})['min_price'])
+                self.assertEqual(len(self.titles(min_price=value, max_price=value)), len(self.courses))
+        self.assertEqual(parse_price('12.50'), Decimal('12.50'))
+        self.assertEqual(self.titles(min_price='1e999999'), set())
+
+    def test_price_sorts_page_through_every_course(self):
+        self.assertEqual(
+            [Course.objects.get(pk=pk).title for pk in self.walk(sort='price')],
+            ['Free', 'Same as discounted', 'Discounted', 'Full price', 'Zero discount'],
+        )
+        self.assertEqual(self.walk(sort='-price')[0], self.courses['zero discount'].pk)
+        self.assertEqual(len(self.walk(size=1, sort='price', min_price='50')), 4)
+
+
+class CourseCardTests(TestCase):
+
+    def test_first_row_loads_its_images_right_away(self):
+        courses = [make_course(title=f'Course {number}') for number in range(3)]
+        cards = [str(card) for _, card in course_cards(courses, eager=1)]
+        self.assertIn('fetchpriority="high"', cards[0])
+        self.assertNotIn('loading="lazy"', cards[0])
+        self.assertTrue(all('loading="lazy"' in card for card in cards[1:]))
+        # The same course further down the list is a different (cached) card
+        self.assertIn('loading="lazy"', str(course_cards(courses[:1])[0][1]))
+
+    def test_stored_images_are_not_decoded_on_save(self):
+        course = make_course()
+        with mock.patch('elearning_app.placeholders.make_placeholder') as make_placeholder:
+            course.title = 'Renamed'
+            course.save()
+        make_placeholder.assert_not_called()
+
+
+class RelatedCoursesTests(TestCase):
+
+    def setUp(self):
+        self.python = make_course(
+            title='Python programming basics', short_description='Learn Python programming',
+            full_description='Variables, loops and functions in Python',
+        )
+        self.advanced = make_course(
+            title='Advanced Python programming', short_description='Python programming patterns',
+            full_description='Generators, decorators and functions',
+        )
+        self.django = make_course(
+            title='Django web development', short_description='Build websites with Python',
+            full_description='Models, views and templates',
+        )
+        self.pottery = make_course(
+            title='Pottery at the wheel', short_description='Throwing clay bowls',
+            full_description='Glazing and firing',
+        )
+
+    def entries(self, course):
+        return list(RelatedCourse.objects.filter(course=course).order_by('rank').values_list('pk', 'related', 'score'))
+
+    def test_related_courses_come_best_first(self):
+        self.assertEqual(rebuild_related_courses(k=3), (4, 4))
+        self.assertEqual(related_courses(self.python), [self.advanced, self.django, self.pottery])
+        self.assertEqual(related_courses(self.python, limit=1), [self.advanced])
+        scores = [score for _, _, score in self.entries(self.python)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertNotIn(self.python, related_courses(self.python))
+
+    def test_only_changed_lists_are_rewritten(self):
+        rebuild_related_courses(k=1)
+        before = {course.pk: self.entries(course) for course in (self.python, self.advanced, self.pottery)}
+        self.assertEqual(rebuild_related_courses(k=1), (0, 0))
+
+        ceramics = make_course(
+            title='Pottery glazing', short_description='Glazing clay bowls', full_description='Firing the kiln',
+        )
+        # The new course and the one it displaces are the only lists written
+        self.assertEqual(rebuild_related_courses(k=1), (1, 2))
+        self.assertEqual(self.entries(self.python), before[self.python.pk])
+        self.assertEqual(self.entries(self.advanced), before[self.advanced.pk])
+        self.assertEqual(related_courses(self.pottery), [ceramics])
+        self.assertNotEqual(self.entries(self.pottery)[0][0], before[self.pottery.pk][0][0])
+
+    def test_unpublished_courses_drop_out(self):
+        rebuild_related_courses(k=3)
+        self.advanced.is_published = False
+        self.advanced.save()
+        self.assertEqual(rebuild_related_courses(k=3), (0, 4))
+        self.assertFalse(RelatedCourse.objects.filter(course=self.advanced).exists())
+        self.assertFalse(RelatedCourse.objects.filter(related=self.advanced).exists())
+        self.assertFalse(CourseTerms.objects.filter(course=self.advanced).exists())
+        self.assertEqual(related_courses(self.python), [self.django, self.pottery])
+
+    def test_unchanged_text_is_not_recounted(self):
+        def texts():
+            return {
+                row['id']: row
+                for row in Course.objects.values('id', 'title', 'short_description', 'full_description')
+            }
+
+        self.assertEqual(refresh_terms(texts()), 4)
+        with mock.patch('elearning_app.related.count_terms', wraps=count_terms) as counted:
+            self.assertEqual(refresh_terms(texts()), 0)
+            counted.assert_not_called()
+
+            Course.objects.filter(pk=self.django.pk).update(title='Django for Python developers')
+            self.assertEqual(refresh_terms(texts()), 1)
+            counted.assert_called_once()
+        self.assertIn('developers', CourseTerms.objects.get(course=self.django).terms)
+
+
+class PrefixIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex([
+            (suggest.COURSE, 'Crème brûlée basics', '/courses/creme/'),
+            (suggest.COURSE, 'SAT Math Prep', '/courses/sat-math/'),
+            (suggest.COURSE, 'Applied mathematics', '/courses/applied/'),
+            (suggest.CATEGORY, 'Mathematics', '/courses/?category=maths'),
+            (suggest.INSTRUCTOR, 'Mathilde Roux', '/courses/?search=Mathilde+Roux'),
+        ])
+
+    def labels(self, query, limit=8):
+        return [label for _, label, _ in self.index.search(query, limit)]
+
+    def test_matches_ignore_accents_and_case(self):
+        for query in ('creme', 'CRÈME', 'crème  bru', 'brulee'):
+            with self.subTest(query=query):
+                self.assertEqual(self.labels(query), ['Crème brûlée basics'])
+
+    def test_words_inside_a_label_match(self):
+        self.assertEqual(self.labels('math prep'), ['SAT Math Prep'])
+        self.assertEqual(self.labels('prep'), ['SAT Math Prep'])
+        self.assertEqual(self.labels('sat math'), ['SAT Math Prep'])
+        self.assertEqual(self.labels('ath'), [])
+        self.assertEqual(self.labels('  '), [])
+
+    def test_label_start_ranks_first(self):
+        # Label starts first (courses, categories, instructors), then matches inside a label
+        self.assertEqual(
+            self.labels('math'), ['Mathematics', 'Mathilde Roux', 'SAT Math Prep', 'Applied mathematics'],
+        )
+        self.assertEqual(self.labels('math', limit=1), ['Mathematics'])
+
+    def test_label_found_at_several_positions_is_listed_once(self):
+        index = PrefixIndex([(suggest.COURSE, 'Data for data scientists', '/courses/data/')])
+        self.assertEqual(len(index.search('data')), 1)
+
+
+@override_settings(SUGGEST_CHECK_SECONDS=0)
+class SuggestionIndexRebuildTests(TestCase):
+
+    def setUp(self):
+        state = mock.patch.dict(suggest._state, {'index': None, 'generation': None, 'checked': 0.0})
+        state.start()
+        self.addCleanup(state.stop)
+        self.client.cookies['db_primary'] = '1'
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course(title='Watercolour painting', slug='watercolour')
+
+    def labels(self, query):
+        response = self.client.get(reverse('search_suggest'), {'q': query})
+        return [entry['label'] for entry in response.json()['suggestions']]
+
+    def test_new_course_is_suggested_after_the_generation_changes(self):
+        self.assertEqual(self.labels('water'), ['Watercolour painting'])
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course(title='Water polo', slug='water-polo')
+        self.assertEqual(self.labels('water'), ['Water polo', 'Watercolour painting'])
+
+    def test_index_is_reused_while_the_generation_holds(self):
+        index = suggest.get_index()
+        with mock.patch('elearning_app.suggest.build_index') as build_index:
+            self.assertIs(suggest.get_index(), index)
+            build_index.assert_not_called()
+
+    @override_settings(SUGGEST_CHECK_SECONDS=3600)
+    def test_generation_is_read_at_most_once_per_interval(self):
+        suggest.get_index()
+        with mock.patch('elearning_app.suggest.generation') as current:
+            suggest.get_index()
+            current.assert_not_called()
+
+
+class CSSBundleTests(TestCase):
+    STYLESHEET = """
+        @charset "utf-8";
+        /* Site styles */
+        .navbar { color: red; }
+        .unused-widget { color: blue; }
+        .card .title, .ghost { margin: 0; }
+        .from-script, .js-added { display: block; }
+        .owl-item { float: left; }
+        button:not(.never-used) { cursor: pointer; }
+        @media (min-width: 768px) { .navbar { padding: 1px; } .unused-widget { padding: 2px; } }
+        @media print { .unused-widget { display: none; } }
+        .spinner { animation: spin 1s linear; }
+        @keyframes spin { to { transform: rotate(1turn); } }
+        @keyframes fade-away { to { opacity: 0; } }
+    """
+    TEMPLATE = """
+        <nav class="navbar">{% if user %}<div class="spinner"></div>{% endif %}</nav>
+        <!-- Header End -->
+        <div class="card {{ extra }}"><h2 class="title">Title</h2></div>
+        <script>menu.classList.add('js-added')</script>
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.base = Path(directory.name)
+        self.write('elearning_app/templates/page.html', self.TEMPLATE)
+        self.write('static/js/site.js', "document.querySelector('.from-script')")
+        self.write('static/css/site.css', self.STYLESHEET)
+        settings_override = override_settings(BASE_DIR=self.base)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for patcher in (
+            mock.patch('elearning_app.cssbundle.SOURCES', ['css/site.css']),
+            mock.patch.dict('elearning_app.cssbundle._loaded', clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, name, text):
+        path = self.base / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+
+    def build(self):
+        # Earlier bundles are older, so "keep the newest" is well defined
+        for path in (self.base / 'static' / 'dist').glob('bundle.*.css'):
+            os.utime(path, (path.stat().st_mtime - 10,) * 2)
+        return cssbundle.build()
+
+    def read(self, name):
+        return (self.base / 'static' / name).read_text(encoding='utf-8')
+
+    def test_unused_rules_are_purged(self):
+        bundle = self.read(self.build()['bundle'])
+        for kept in ('.navbar{', '.card .title{', '.from-script,.js-added{', '.owl-item{',
+                     'button:not(.never-used){', '@media (min-width: 768px){.navbar{', '@keyframes spin'):
+            self.assertIn(kept, bundle)
+        for dropped in ('unused-widget', '.ghost', '@media print', 'fade-away', '@charset', 'Site styles'):
+            self.assertNotIn(dropped, bundle)
+
+    def test_critical_css_covers_what_is_above_the_fold(self):
+        self.build()
+        critical = self.read('dist/critical.css')
+        self.assertIn('.navbar{', critical)
+        self.assertIn('@keyframes spin', critical)
+        self.assertNotIn('.title', critical)
+        self.assertNotIn('js-added', critical)
+
+    def test_bundle_name_follows_its_content(self):
+        manifest = self.build()
+        bundle = self.read(manifest['bundle'])
+        digest = hashlib.blake2b(bundle.encode(), digest_size=6).hexdigest()
+        self.assertEqual(manifest['bundle'], f'dist/bundle.{digest}.css')
+        self.assertEqual(self.build()['bundle'], manifest['bundle'])
+
+        names = [manifest['bundle']]
+        for colour in ('green', 'purple'):
+            self.write('static/css/site.css', self.STYLESHEET.replace('red', colour))
+            names.append(self.build()['bundle'])
+        self.assertEqual(len(set(names)), 3)
+        # The previous bundle stays for pages rendered before the build, older ones go
+        self.assertEqual(
+            sorted(f'dist/{path.name}' for path in (self.base / 'static' / 'dist').glob('bundle.*.css')),
+            sorted(names[1:]),
+        )
+
+    def test_pages_inline_critical_css_and_preload_the_bundle(self):
+        self.client.cookies['db_primary'] = '1'
+        # Without a build, the source stylesheets are linked one by one
+        self.assertContains(self.client.get('/'), '<link href="/static/css/style.css" rel="stylesheet">')
+
+        manifest = self.build()
+        response = self.client.get('/')
+        self.assertContains(response, f"<style>{self.read('dist/critical.css')}</style>")
+        self.assertContains(response, f'<link rel="preload" href="/static/{manifest["bundle"]}" as="style"')
+        self.assertNotContains(response, 'css/style.css')
+
+
+class PreloadTests(TestCase):
+
+    def setUp(self):
+        hints = mock.patch.dict(preload._hints, clear=True)
+        hints.start()
+        self.addCleanup(hints.stop)
+        self.client.cookies['db_primary'] = '1'
+
+    def test_pages_send_site_and_view_links(self):
+        course = make_course(title='Preloaded course', slug='preloaded')
+        response = self.client.get(course.get_absolute_url())
+        links = response['Link'].split(', ')
+        self.assertEqual(links[0], f'<{course.thumbnail.url}>; rel=preload; as=image')
+        self.assertEqual(links[1:], preload.site_links())
+        self.assertIn('</static/css/style.css>; rel=preload; as=style', links)
+        self.assertIn(f'<{preload.FONT_ORIGIN}>; rel=preconnect; crossorigin', links)
+        # Remembered for the next request's early hints
+        self.assertEqual(preload.hints_for(course.get_absolute_url()), links)
+
+    def test_fragments_errors_and_other_methods_get_no_links(self):
+        responses = {
+            'api': self.client.get(reverse('search_suggest'), {'q': 'math'}),
+            'not found': self.client.get('/courses/no-such-course/'),
+            'post': self.client.post('/contact/', {}),
+        }
+        for name, response in responses.items():
+            with self.subTest(name):
+                self.assertFalse(response.has_header('Link'))
+        self.assertEqual(preload._hints, {})
+
+    def test_existing_link_header_is_kept(self):
+        response = HttpResponse('<p>Page</p>')
+        response['Link'] = '</feed.xml>; rel=alternate'
+        request = RequestFactory().get('/about/')
+        preload.preload(request, '/media/banner.jpg', 'image')
+        preload.preload(request, '/media/banner.jpg', 'image')
+        response = PreloadMiddleware(lambda request: response)(request)
+        self.assertEqual(
+            response['Link'].split(', '),
+            ['</feed.xml>; rel=alternate', '</media/banner.jpg>; rel=preload; as=image', *preload.site_links()],
+        )
+
+
+class EarlyHintsTests(SimpleTestCase):
+
+    def setUp(self):
+        hints = mock.patch.dict(preload._hints, {'/courses/': ['</static/css/style.css>; rel=preload; as=style']})
+        hints.start()
+        self.addCleanup(hints.stop)
+
+    def call(self, path='/courses/', method='GET', extensions=None):
+        sent = []
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path}
+        if extensions is not None:
+            scope['extensions'] = extensions
+        async_to_sync(preload.EarlyHintsApp(app))(scope, None, send)
+        return sent
+
+    def test_remembered_links_are_sent_before_the_response(self):
+        sent = self.call(extensions={'http.response.early_hint': {}})
+        self.assertEqual(sent[0]['type'], 'http.response.early_hint')
+        self.assertEqual(sent[0]['links'], [b'</static/css/style.css>; rel=preload; as=style'])
+        self.assertEqual(sent[1]['type'], 'http.response.start')
+
+    def test_no_hints_without_server_support_or_known_links(self):
+        for name, sent in {
+            'no extension': self.call(),
+            'unknown path': self.call('/about/', extensions={'http.response.early_hint': {}}),
+            'post': self.call(method='POST', extensions={'http.response.early_hint': {}}),
+        }.items():
+            with self.subTest(name):
+                self.assertEqual([message['type'] for message in sent], ['http.response.start'])
+
+
+class ModuleDownloadTests(TestCase):
+    CONTENT = bytes(range(100))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media = directory.name
+        settings_override = override_settings(
+            MEDIA_ROOT=f'{self.media}/public', PRIVATE_MEDIA_ROOT=f'{self.media}/private', MEDIA_SENDFILE='',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.cookies['db_primary'] = '1'
+
+        self.course = make_course(slug='maths')
+        name = private_storage.save('course_modules/notes.pdf', ContentFile(self.CONTENT))
+        self.paid = Module.objects.create(course=self.course, title='Paid', attachment=name)
+        self.free = Module.objects.create(course=self.course, title='Free', attachment=name, is_free_preview=True)
+
+    def get(self, module, **headers):
+        response = self.client.get(reverse('module_download', args=[self.course.slug, module.pk]), headers=headers)
+        # Reading a streamed body to the end is what closes the file
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def test_attachments_are_stored_outside_media_root(self):
+        name = self.paid.attachment.name
+        self.assertTrue(os.path.exists(f'{self.media}/private/{name}'))
+        self.assertFalse(os.path.exists(f'{self.media}/public/{name}'))
+        with self.assertRaises(ValueError):
+            self.paid.attachment.url
+
+    def test_access(self):
+        self.assertEqual(self.get(self.free).status_code, 200)
+        self.assertEqual(self.get(self.paid).status_code, 403)
+
+        student, = make_students(1)
+        self.client.force_login(student.user)
+        self.assertEqual(self.get(self.paid).status_code, 403)
+        Enrollment.objects.create(student=student, course=self.course)
+        response = self.get(self.paid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.CONTENT)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=3600')
+
+    def test_single_range(self):
+        response = self.get(self.free, Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response.body, self.CONTENT[10:20])
+        self.assertEqual(self.get(self.free, Range='bytes=-5').body, self.CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(self.free, Range='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range_with_a_stale_etag_sends_everything(self):
+        response = self.get(self.free, Range='bytes=10-19', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.CONTENT)
+
+        etag = response['ETag']
+        self.assertEqual(self.get(self.free, Range='bytes=10-19', If_Range=etag).status_code, 206)
+
+    def test_not_modified(self):
+        etag = self.get(self.free)['ETag']
+        response = self.get(self.free, If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_nginx_sends_the_file(self):
+        response = self.get(self.free)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.free.attachment.name}')
+        self.assertEqual(response.body, b'')
+        self.assertEqual(response['Content-Disposition'], "inline; filename*=UTF-8''free.pdf")
+        # Only after the access check
+        self.assertEqual(self.get(self.paid).status_code, 403)
+
+
+class GarbageCollectMediaTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media = directory.name
+        settings_override = override_settings(MEDIA_ROOT=self.media, PRIVATE_MEDIA_ROOT=f'{self.media}-private')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, f'{self.media}-private', ignore_errors=True)
+
+    def test_rehashed_originals_outlive_the_run_that_renamed_them(self):
+        os.makedirs(f'{self.media}/courses/thumbnails')
+        with open(f'{self.media}/courses/thumbnails/old.jpg', 'wb') as image:
+            image.write(b'thumbnail bytes')
+        course = make_course(thumbnail='courses/thumbnails/old.jpg')
+        # Uploaded long ago: --min-age alone wouldn't keep it
+        os.utime(f'{self.media}/courses/thumbnails/old.jpg', (0, 0))
+
+        call_command('gc_media', rehash=True, min_age=3600, stdout=io.StringIO())
+        course.refresh_from_db()
+        self.assertNotEqual(course.thumbnail.name, 'courses/thumbnails/old.jpg')
+        self.assertTrue(os.path.exists(f'{self.media}/{course.thumbnail.name}'))
+        self.assertTrue(os.path.exists(f'{self.media}/courses/thumbnails/old.jpg'))
+
+        # Still within its grace period on the next run...
+        call_command('gc_media', min_age=3600, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(f'{self.media}/courses/thumbnails/old.jpg'))
+        # ...and collected once it is over
+        call_command('gc_media', min_age=0, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(f'{self.media}/courses/thumbnails/old.jpg'))
+        self.assertTrue(os.path.exists(f'{self.media}/{course.thumbnail.name}'))
+
+    def test_private_attachments_are_collected_too(self):
+        course = make_course()
+        kept = private_storage.save('course_modules/kept.pdf', ContentFile(b'kept'))
+        dropped = private_storage.save('course_modules/dropped.pdf', ContentFile(b'dropped'))
+        Module.objects.create(course=course, title='Lesson', attachment=kept)
+
+        call_command('gc_media', min_age=0, stdout=io.StringIO())
+        self.assertTrue(private_storage.exists(kept))
+        self.assertFalse(private_storage.exists(dropped))
+
+
+class SitemapTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings_override = override_settings(
+            SITEMAP_ROOT=self.root, SITEMAP_SHARD_SIZE=3, SITE_URL='https://example.com',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def shard_files(self):
+        return {path.name: path.read_bytes() for path in self.root.glob('sitemap-courses-*.xml')}
+
+    def test_courses_are_sharded_by_primary_key(self):
+        courses = [make_course(title=f'Course {number}', is_published=True) for number in range(7)]
+        build_sitemaps()
+
+        shards = {}
+        for course in courses:
+            shards.setdefault(f'sitemap-courses-{course.pk // 3 + 1}.xml', []).append(course)
+        files = self.shard_files()
+        self.assertEqual(set(files), set(shards))
+        index = (self.root / 'sitemap.xml').read_text()
+        for name, members in shards.items():
+            self.assertIn(f'https://example.com/{name}', index)
+            self.assertEqual(files[name].count(b'<url>'), len(members))
+            for course in members:
+                self.assertIn(f'https://example.com{course.get_absolute_url()}'.encode(), files[name])
+
+        # Emptying the last shard removes its file and leaves the others untouched
+        last = max(shards)
+        Course.objects.filter(pk__in=[course.pk for course in shards[last]]).update(is_published=False)
+        stats = build_sitemaps()
+        self.assertGreaterEqual(stats['removed'], 1)
+        self.assertEqual(self.shard_files(), {name: data for name, data in files.items() if name != last})
+        self.assertFalse(list(self.root.glob(f'{last}*')))
+        self.assertNotIn(last, (self.root / 'sitemap.xml').read_text())
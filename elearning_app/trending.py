@@ -0,0 +1,109 @@
+# elearning_app/trending.py
+"""
+Trending score: recent enrollments, ratings, testimonials and page views,
+each worth less the older it gets (half-life TRENDING_HALF_LIFE_DAYS).
+
+Decaying every course's score as time passes would mean rewriting every
+row all the time. Instead an event at time t adds
+
+    weight * 2 ** ((t - TRENDING_EPOCH) / half_life)
+
+to Course.trending_score. The true score at any moment is the stored one
+times 2 ** (-(now - epoch) / half_life), a factor shared by all courses, so
+ordering by the stored column already orders by the decayed score. Each
+event is a single UPDATE ... SET trending_score = trending_score + x; no
+scan, and the indexed column serves ORDER BY directly.
+
+The stored numbers double every half-life, so a double has roughly 19
+years of headroom at a 7-day half-life; moving TRENDING_EPOCH forward and
+running `manage.py rebuild_trending` resets them.
+
+These updates fire no signals, so nothing built from the scores is
+invalidated when they move. The job worker calls refresh_trending_pages()
+every TRENDING_REFRESH_SECONDS instead, which expires the 'trending' cache
+tag and re-renders the pre-rendered pages that carry it.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import invalidate
+from .models import Course, CourseViewCount, Enrollment, Testimonial
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def growth(when=None):
+    """Multiplier turning a weight at time `when` into stored-score units"""
+    when = when or timezone.now()
+    elapsed_days = (when - settings.TRENDING_EPOCH).total_seconds() / SECONDS_PER_DAY
+    return 2.0 ** (elapsed_days / settings.TRENDING_HALF_LIFE_DAYS)
+
+
+def decayed_score(stored, now=None):
+    """The stored value as of now, in event-weight units (for display)"""
+    return stored / growth(now)
+
+
+def add_scores(weights, when=None):
+    """Add {course_id: weight} to the trending scores, one UPDATE per course"""
+    factor = growth(when)
+    for course_id, weight in weights.items():
+        if weight:
+            Course.objects.filter(pk=course_id).update(trending_score=F('trending_score') + weight * factor)
+
+
+def _weight(kind):
+    return settings.TRENDING_WEIGHTS[kind]
+
+
+def rating_weight(rating):
+    # Relative to an average 3-star rating: a 1-star review pulls the score down
+    return _weight('rating') * (rating - 3) / 2
+
+
+def record_enrollment(course_id):
+    add_scores({course_id: _weight('enrollment')})
+
+
+def record_testimonial(course_id, rating):
+    add_scores({course_id: _weight('testimonial') + rating_weight(rating)})
+
+
+def record_rating(course_id, rating):
+    add_scores({course_id: rating_weight(rating)})
+
+
+def record_views(views):
+    """{course_id: views} from one analytics flush"""
+    add_scores({course_id: count * _weight('view') for course_id, count in views.items()})
+
+
+def rebuild_trending():
+    """Recompute every score from the stored history (backfill, epoch change)"""
+    scores = defaultdict(float)
+    for course_id, enrolled_at in Enrollment.objects.filter(is_active=True).values_list('course_id', 'enrolled_at'):
+        scores[course_id] += _weight('enrollment') * growth(enrolled_at)
+    testimonials = Testimonial.objects.filter(is_active=True, course__isnull=False)
+    for course_id, rating, created_at in testimonials.values_list('course_id', 'rating', 'created_at'):
+        scores[course_id] += (_weight('testimonial') + rating_weight(rating)) * growth(created_at)
+    for course_id, day, views in CourseViewCount.objects.values_list('course_id', 'day', 'views'):
+        # Daily totals are counted at midday
+        noon = timezone.make_aware(datetime.combine(day, time(12)))
+        scores[course_id] += views * _weight('view') * growth(noon)
+
+    courses = list(Course.objects.only('pk', 'trending_score'))
+    for course in courses:
+        course.trending_score = scores.get(course.pk, 0.0)
+    Course.objects.bulk_update(courses, ['trending_score'], batch_size=500)
+    return len(courses)
+
+
+def refresh_trending_pages():
+    """Show the current scores on pages that list trending courses"""
+    from .prerender import schedule_prerender
+    invalidate('trending')
+    schedule_prerender(['trending'])
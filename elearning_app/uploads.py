@@ -0,0 +1,272 @@
+# elearning_app/uploads.py
+"""
+Resumable chunked uploads for large files (module recordings) from the admin.
+
+The browser talks JSON to the URLs ModuleAdmin adds under
+/admin/elearning_app/module/upload/:
+
+    POST upload/                {filename, size}  -> {id, offset, chunk_size}
+        An unfinished upload of the same file by the same user is resumed
+        from its offset instead of starting over.
+    GET  upload/<id>/                             -> {id, offset, chunk_size, ...}
+    PUT  upload/<id>/           chunk bytes       -> {offset}
+        Headers: Upload-Offset (must equal the current offset) and optionally
+        Upload-Checksum: sha256 <base64 digest of the chunk>.
+    POST upload/<id>/complete/  {checksum}        -> {id, name}
+
+Chunks are exactly chunk_size bytes (the last one may be shorter) and go
+straight from the request stream to a file in CHUNKED_UPLOAD_DIR, 64 KB at
+a time, so a worker never holds more than that in memory. The checksum
+sent on completion is the SHA-256 of the concatenated SHA-256 digests of
+the chunks: browsers can hash a chunk with SubtleCrypto but not a 500 MB
+file incrementally. Once it matches, the file is renamed into media
+storage (same disk, no copy).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .models import ChunkedUpload
+from .storage import new_hasher
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+def upload_dir():
+    return Path(settings.CHUNKED_UPLOAD_DIR)
+
+
+def temp_path(upload):
+    return upload_dir() / f'{upload.pk}.part'
+
+
+# ---------- upload steps ----------
+
+def start_upload(user, filename, size):
+    """Create an upload, or return the user's unfinished one for the same file"""
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise UploadError('A file name is required.')
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f'Files must be between 1 byte and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.')
+
+    for upload in ChunkedUpload.objects.filter(
+        user=user, filename=filename, size=size, status=ChunkedUpload.STATUS_UPLOADING
+    ):
+        if temp_path(upload).exists():
+            return upload
+
+    upload = ChunkedUpload.objects.create(
+        user=user, filename=filename, size=size, chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE
+    )
+    upload_dir().mkdir(parents=True, exist_ok=True)
+    temp_path(upload).touch()
+    return upload
+
+
+def parse_checksum(header):
+    """Upload-Checksum: sha256 <base64> -> raw digest (None if absent)"""
+    if not header:
+        return None
+    algorithm, _, value = header.partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError('Only sha256 chunk checksums are supported.')
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:
+        raise UploadError('Malformed Upload-Checksum header.')
+
+
+def write_chunk(upload, offset, stream, length, checksum=None):
+    """Append one chunk read from stream; returns the new offset"""
+    if upload.status != ChunkedUpload.STATUS_UPLOADING:
+        raise UploadError('This upload is already complete.')
+    if offset != upload.offset:
+        raise OffsetMismatch(f'Expected offset {upload.offset}.')
+    expected = min(upload.chunk_size, upload.size - offset)
+    if length != expected:
+        raise UploadError(f'This chunk must be {expected} bytes.')
+
+    digest = hashlib.sha256()
+    with open(temp_path(upload), 'r+b') as file:
+        file.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                raise UploadError('The chunk ended early.')
+            digest.update(data)
+            file.write(data)
+            remaining -= len(data)
+
+    # A bad chunk is simply written again at the same offset
+    if checksum is not None and not hmac.compare_digest(digest.digest(), checksum):
+        raise UploadError('Chunk checksum mismatch.')
+
+    # Conditional update: a retried chunk racing the original only counts once
+    advanced = ChunkedUpload.objects.filter(
+        pk=upload.pk, offset=offset, status=ChunkedUpload.STATUS_UPLOADING
+    ).update(offset=offset + length, updated_at=timezone.now())
+    if not advanced:
+        upload.refresh_from_db(fields=['offset', 'status'])
+        raise OffsetMismatch(f'Expected offset {upload.offset}.')
+    upload.offset = offset + length
+    return upload.offset
+
+
+class StagedFile(File):
+    """The finished temp file, moved (not copied) into storage by FileSystemStorage"""
+
+    def __init__(self, path, name, content_hash):
+        super().__init__(open(path, 'rb'), name)
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete_upload(upload, checksum, field):
+    """Verify the whole file and move it into field's storage; returns the stored name"""
+    if upload.status == ChunkedUpload.STATUS_COMPLETE:
+        return upload.stored_name
+    if upload.offset != upload.size:
+        raise UploadError(f'Only {upload.offset} of {upload.size} bytes have arrived.')
+
+    path = temp_path(upload)
+    chunk_digests, content = hashlib.sha256(), new_hasher()
+    with open(path, 'rb') as file:
+        for start in range(0, upload.size, upload.chunk_size):
+            part = hashlib.sha256()
+            remaining = min(upload.chunk_size, upload.size - start)
+            while remaining:
+                data = file.read(min(READ_SIZE, remaining))
+                part.update(data)
+                content.update(data)
+                remaining -= len(data)
+            chunk_digests.update(part.digest())
+
+    provided = str(checksum or '').lower()
+    if not provided.isascii() or not hmac.compare_digest(chunk_digests.hexdigest(), provided):
+        # Something was corrupted on the way; make the next attempt start clean
+        discard_upload(upload)
+        raise UploadError('Checksum mismatch: the file was damaged in transit, please upload it again.')
+
+    staged = StagedFile(path, upload.filename, content.hexdigest())
+    try:
+        name = field.storage.save(field.generate_filename(None, upload.filename), staged, max_length=field.max_length)
+    finally:
+        staged.close()
+        # Left behind when storage already had the same bytes
+        path.unlink(missing_ok=True)
+
+    ChunkedUpload.objects.filter(pk=upload.pk).update(
+        status=ChunkedUpload.STATUS_COMPLETE, stored_name=name, updated_at=timezone.now()
+    )
+    upload.status, upload.stored_name = ChunkedUpload.STATUS_COMPLETE, name
+    return name
+
+
+def discard_upload(upload):
+    temp_path(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def cleanup_stale_uploads(max_age=None):
+    """Remove uploads untouched for max_age seconds and temp files without an upload"""
+    max_age = settings.CHUNKED_UPLOAD_EXPIRE_SECONDS if max_age is None else max_age
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    removed = 0
+    for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff):
+        discard_upload(upload)
+        removed += 1
+    if upload_dir().is_dir():
+        known = {f'{pk}.part' for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+        for path in upload_dir().glob('*.part'):
+            if path.name not in known and path.stat().st_mtime < time.time() - max_age:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+# ---------- views (wired up by ModuleAdmin.get_urls) ----------
+
+def _describe(upload):
+    return {
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'chunk_size': upload.chunk_size,
+        'status': upload.status,
+    }
+
+
+def _error(error, upload=None):
+    data = {'error': str(error)}
+    if upload is not None:
+        data['offset'] = upload.offset
+    return JsonResponse(data, status=error.status)
+
+
+@require_POST
+def upload_start_view(request):
+    try:
+        data = json.loads(request.body or b'{}')
+        upload = start_upload(request.user, data.get('filename'), int(data.get('size') or 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Send JSON with filename and size.'}, status=400)
+    except UploadError as error:
+        return _error(error)
+    return JsonResponse(_describe(upload), status=201)
+
+
+@require_http_methods(['GET', 'PUT'])
+def upload_chunk_view(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    if request.method == 'GET':
+        return JsonResponse(_describe(upload))
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset and Content-Length are required.'}, status=400)
+    try:
+        # The request itself is the stream; request.body would buffer the chunk
+        write_chunk(upload, offset, request, length, parse_checksum(request.headers.get('Upload-Checksum')))
+    except UploadError as error:
+        return _error(error, upload)
+    return JsonResponse({'offset': upload.offset})
+
+
+@require_POST
+def upload_complete_view(request, upload_id, field):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        data = json.loads(request.body or b'{}')
+        name = complete_upload(upload, data.get('checksum'), field)
+    except ValueError:
+        return JsonResponse({'error': 'Send JSON with the checksum.'}, status=400)
+    except UploadError as error:
+        return _error(error, upload)
+    return JsonResponse({'id': str(upload.pk), 'name': name})
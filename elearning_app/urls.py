@@ -5,8 +5,17 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('about/', views.about, name='about'),
     path('courses/', views.courses, name='courses'),
+    path('courses/<slug:slug>/', views.course_detail, name='course_detail'),
+    path('courses/<slug:slug>/enroll/', views.enroll, name='enroll'),
+    path('courses/<slug:slug>/modules/<int:module_id>/download/', views.module_download, name='module_download'),
     path('team/', views.team, name='team'),
     path('testimonials/', views.testimonials, name='testimonials'),
     path('contact/', views.contact, name='contact'),
+    path('api/courses/', views.api_courses, name='api_courses'),
+    path('api/courses/cards/', views.course_cards_fragment, name='course_cards'),
+    path('api/search/suggest', views.search_suggest, name='search_suggest'),
+    path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-<slug:section>.xml', views.sitemap, name='sitemap_section'),
 
 ]
\ No newline at end of file
@@ -1,18 +1,36 @@
 # media/views.py
+import os
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponseNotFound
+from django.http import HttpResponse, JsonResponse, HttpResponseNotFound, Http404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Sum
 from django.views.generic import ListView, DetailView, TemplateView
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_safe
+from django.core.exceptions import PermissionDenied
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.conf import settings
+from django.utils.text import slugify
+from django.urls import reverse
 from .models import (
     Category, Course, Instructor, Testimonial,
     Banner, Service, SiteSetting, Gallery,
-    ContactMessage, FAQ, Student, Enrollment
+    ContactMessage, FAQ, Student, Enrollment, TestimonialStats, Module
 )
 from .forms import ContactForm
+from .enrollment import enroll_student, CourseFull, AlreadyEnrolled
+from .ratelimit import client_ip, contact_limiter, is_duplicate_submission
+from .caching import cached
+from .preload import preload
+from .downloads import can_access_module, serve_file
+from .outline import course_outline
+from .related import related_courses
+from .suggest import suggest
+from .analytics import record_course_view, record_impressions
+from .catalog import COURSE_SORTS, course_batch, course_filters, filter_courses
+from .cards import course_cards
+from .sitemaps import INDEX_NAME, absolute, read_sitemap, section_name
 
 
 # ========== Home Page View ==========
@@ -21,91 +39,114 @@ from django.shortcuts import render
 from .models import Category, Course, Instructor, Testimonial
 
 
-# Update the home function in views.py
-def home(request):
-    """Home page view"""
-    # Get active banners ordered by display_order
-    banners = Banner.objects.filter(is_active=True).order_by('display_order')
+HOME_COURSES = 3
 
-    # Get some sample data
-    categories = Category.objects.filter(is_active=True)[:4]
-    courses = Course.objects.filter(is_published=True, is_featured=True)[:3]
-    instructors = Instructor.objects.filter(is_featured=True)[:4]
-    testimonials = Testimonial.objects.filter(is_active=True, is_featured=True)[:4]
 
-    # Get statistics
-    total_students = Student.objects.count() or 2000
-    total_courses = Course.objects.filter(is_published=True).count()
-    total_instructors = Instructor.objects.count()
+def _home_courses():
+    """Hand-picked courses, topped up with trending ones when there are too few"""
+    courses = list(Course.objects.filter(is_published=True, is_featured=True)[:HOME_COURSES])
+    if len(courses) < HOME_COURSES:
+        courses += (
+            Course.objects.filter(is_published=True, trending_score__gt=0)
+            .exclude(pk__in=[course.pk for course in courses])
+            .order_by('-trending_score')[:HOME_COURSES - len(courses)]
+        )
+    return courses
+
+
+def _home_blocks():
+    """Everything on the home page that comes from the database"""
+    return {
+        # Get active banners ordered by display_order
+        'banners': list(Banner.objects.filter(is_active=True).order_by('display_order')),
+        'categories': list(Category.objects.filter(is_active=True)[:4]),
+        'featured_instructors': list(Instructor.objects.filter(is_featured=True)[:4]),
+        'featured_testimonials': list(Testimonial.objects.filter(is_active=True, is_featured=True)[:4]),
+        'testimonial_stats': TestimonialStats.site(),
+        # Statistics
+        'total_students': Student.objects.count() or 2000,
+        'total_courses': Course.objects.filter(is_published=True).count(),
+        'total_instructors': Instructor.objects.count(),
+    }
+
 
+# Update the home function in views.py
+def home(request):
+    """Home page view"""
     context = {
-        'banners': banners,
-        'categories': categories,
-        'featured_courses': courses,
-        'featured_instructors': instructors,
-        'featured_testimonials': testimonials,
-        'total_students': total_students,
-        'total_courses': total_courses,
-        'total_instructors': total_instructors,
+        **cached(
+            'home:blocks',
+            _home_blocks,
+            tags=('banners', 'courses', 'instructors', 'testimonials', 'students'),
+        ),
+        # Trending scores change without a save: this block expires on its own
+        'featured_courses': cached(
+            'home:courses',
+            _home_courses,
+            ttl=settings.TRENDING_REFRESH_SECONDS,
+            tags=('courses', 'trending'),
+        ),
     }
+    record_impressions(request, (course.pk for course in context['featured_courses']))
+    # The first slide is a CSS background, found late without a hint
+    first_banner = next((banner for banner in context['banners'] if banner.image), None)
+    if first_banner:
+        preload(request, first_banner.image.url, 'image')
     return render(request, 'index.html', context)
 
 
-def courses(request):
-    """Courses page with filtering"""
-    # Get all published courses
-    courses_list = Course.objects.filter(is_published=True).order_by('-created_at')
-
-
-    # Get all active categories
-    categories = Category.objects.filter(is_active=True)
-
-    # Get filter parameters from request
-    category_filter = request.GET.get('category')
-    level_filter = request.GET.get('level')
-    search_query = request.GET.get('search')
+def _course_facets():
+    """Level counts and featured courses shown next to the course list"""
+    counts = Course.objects.filter(is_published=True).aggregate(
+        total=Count('id'),
+        beginner=Count('id', filter=Q(level='beginner')),
+        intermediate=Count('id', filter=Q(level='intermediate')),
+        advanced=Count('id', filter=Q(level='advanced')),
+    )
+    featured = Course.objects.filter(
+        is_featured=True,
+        is_published=True
+    ).order_by('-created_at')[:4]
+    return {
+        'categories': list(Category.objects.filter(is_active=True)),
+        'course_stats': counts,
+        'featured_courses': list(featured),
+    }
 
-    # Apply filters
-    if category_filter:
-        courses_list = courses_list.filter(category__slug=category_filter)
 
-    if level_filter:
-        courses_list = courses_list.filter(level=level_filter)
+COURSES_BATCH = 12
+COURSES_FIRST_ROW = 3  # cards above the fold on wide screens: their images load right away
 
-    if search_query:
-        courses_list = courses_list.filter(
-            Q(title__icontains=search_query) |
-            Q(short_description__icontains=search_query) |
-            Q(full_description__icontains=search_query) |
-            Q(instructor__name__icontains=search_query)
-        )
 
-    # Get course statistics
-    course_stats = {
-        'total': Course.objects.filter(is_published=True).count(),
-        'beginner': Course.objects.filter(level='beginner', is_published=True).count(),
-        'intermediate': Course.objects.filter(level='intermediate', is_published=True).count(),
-        'advanced': Course.objects.filter(level='advanced', is_published=True).count(),
-    }
+def courses(request):
+    """Courses page with filtering"""
+    filters = course_filters(request.GET)
+    courses_list = filter_courses(filters, Course.objects.select_related('instructor'))
 
-    # Get featured courses for sidebar (optional)
-    featured_courses = Course.objects.filter(
-        is_featured=True,
-        is_published=True
-    ).order_by('-created_at')[:4]
+    # Category list, level counts and featured courses are shared by every filter
+    facets = cached('courses:facets', _course_facets, tags=('courses',))
 
-    total_students = sum(course.enrolled_students for course in courses_list)
+    totals = courses_list.aggregate(avg=Avg('rating'), students=Sum('enrolled_students'))
+    total_students = totals['students'] or 0
+    avg_rating = totals['avg'] or 0
 
-    avg_rating = courses_list.aggregate(avg=Avg('rating'))['avg'] or 0
+    batch, next_cursor = course_batch(courses_list, filters['sort'], request.GET.get('cursor'), COURSES_BATCH)
+    record_impressions(request, (course.pk for course in batch))
 
     context = {
-        'courses': courses_list,
-        'categories': categories,
-        'course_stats': course_stats,
-        'featured_courses': featured_courses,
-        'selected_category': category_filter,
-        'selected_level': level_filter,
-        'search_query': search_query or '',
+        'courses': batch,
+        'cards': course_cards(batch, eager=COURSES_FIRST_ROW),
+        'next_cursor': next_cursor,
+        'categories': facets['categories'],
+        'course_stats': facets['course_stats'],
+        'featured_courses': facets['featured_courses'],
+        'selected_category': filters['category'],
+        'selected_level': filters['level'],
+        'search_query': filters['search'] or '',
+        'selected_sort': filters['sort'],
+        'min_price': filters['min_price'],
+        'max_price': filters['max_price'],
+        'sort_options': [(value, label) for value, (label, _) in COURSE_SORTS.items()],
         'title': 'Courses - SAT Fergana',
         'total_students': total_students,
         'avg_rating': avg_rating,
@@ -113,6 +154,47 @@ def courses(request):
     return render(request, 'courses.html', context)
 
 
+@require_safe
+def course_cards_fragment(request):
+    """The next batch of course cards for infinite scrolling (HTML fragment)"""
+    filters = course_filters(request.GET)
+    courses_list = filter_courses(filters, Course.objects.select_related('instructor'))
+    batch, next_cursor = course_batch(courses_list, filters['sort'], request.GET.get('cursor'), COURSES_BATCH)
+    record_impressions(request, (course.pk for course in batch))
+
+    response = render(request, 'course_cards.html', {'cards': course_cards(batch)})
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        response['X-Next-Page'] = f"{request.path}?{query.urlencode()}"
+    return response
+
+
+def course_detail(request, slug):
+    """Course page with its module outline"""
+    course = get_object_or_404(
+        Course.objects.filter(is_published=True)
+        .select_related('category', 'instructor')
+        .annotate(
+            total_minutes=Sum('modules__duration_minutes'),
+            module_count=Count('modules'),
+            free_preview_count=Count('modules', filter=Q(modules__is_free_preview=True)),
+        ),
+        slug=slug,
+    )
+    record_course_view(request, course.pk)
+    if course.thumbnail:
+        preload(request, course.thumbnail.url, 'image')
+    context = {
+        'course': course,
+        'outline': course_outline(course),
+        'related_courses': related_courses(course),
+        'total_minutes': course.total_minutes or 0,
+        'title': f'{course.title} - SAT Fergana',
+    }
+    return render(request, 'course_detail.html', context)
+
+
 def team(request):
     """Team/Instructors page"""
     # Get all active instructors, ordered by display order
@@ -126,10 +208,22 @@ def team(request):
     return render(request, 'team.html', context)
 
 
+def _testimonial_stats():
+    course_stats = TestimonialStats.objects.filter(course__isnull=False, count__gt=0).select_related('course')
+    return TestimonialStats.site(), list(course_stats)
+
+
+TESTIMONIALS_PER_PAGE = 10
+
+
 def testimonials(request):
     """Testimonials page"""
     # Get active testimonials, ordered by display order
-    testimonials_list = Testimonial.objects.filter(is_active=True).order_by('display_order', '-created_at')
+    testimonials_list = Testimonial.objects.filter(is_active=True).select_related('course').order_by('display_order', '-created_at')
+
+    # Paginate instead of rendering every testimonial at once
+    paginator = Paginator(testimonials_list, TESTIMONIALS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
     # Get featured testimonials for sidebar/widget
     featured_testimonials = Testimonial.objects.filter(
@@ -137,27 +231,18 @@ def testimonials(request):
         is_active=True
     ).order_by('display_order')[:4]
 
-    # Calculate statistics
-    total_testimonials = testimonials_list.count()
-
-    # Calculate average rating
-    if total_testimonials > 0:
-        average_rating = testimonials_list.aggregate(Avg('rating'))['rating__avg']
-        average_rating = round(average_rating, 1)
-    else:
-        average_rating = 0
-
-    # Calculate satisfaction rate (example: percentage of 4-5 star ratings)
-    high_rating_count = testimonials_list.filter(rating__gte=4).count()
-    satisfaction_rate = round((high_rating_count / total_testimonials * 100) if total_testimonials > 0 else 0)
+    # Statistics come from the precomputed rollup (see TestimonialStats)
+    stats, course_stats = cached('testimonials:stats', _testimonial_stats, tags=('testimonials',))
 
     context = {
-        'testimonials': testimonials_list,
+        'testimonials': page_obj,
         'featured_testimonials': featured_testimonials,
-        'total_testimonials': total_testimonials,
-        'average_rating': average_rating,
-        'satisfaction_rate': satisfaction_rate,
-        'active_students': total_testimonials,  # You can change this if you have actual student count
+        'testimonial_stats': stats,
+        'course_testimonial_stats': course_stats,
+        'total_testimonials': stats.count,
+        'average_rating': stats.average_rating,
+        'satisfaction_rate': stats.satisfaction_rate,
+        'active_students': stats.count,  # You can change this if you have actual student count
         'title': 'Testimonials - SAT Fergana',
     }
     return render(request, 'testimonial.html', context)
@@ -165,11 +250,21 @@ def testimonials(request):
 
 def contact(request):
     if request.method == 'POST':
+        ip_address = client_ip(request)
+
+        # Reject floods before they reach the database
+        if not contact_limiter.allow(ip_address):
+            messages.error(request, 'Too many messages. Please wait a few minutes and try again.')
+            return render(request, 'contact.html', {'form': ContactForm(request.POST)}, status=429)
+
         form = ContactForm(request.POST)
         if form.is_valid():
-            contact_message = form.save(commit=False)
-            contact_message.ip_address = request.META.get('REMOTE_ADDR')
-            contact_message.save()
+            data = form.cleaned_data
+            # Identical resubmissions are dropped silently
+            if not is_duplicate_submission(data['email'], data['subject'], data['message']):
+                contact_message = form.save(commit=False)
+                contact_message.ip_address = ip_address
+                contact_message.save()
             messages.success(request, 'Your message has been sent successfully!')
             return redirect('contact')
     else:
@@ -178,6 +273,126 @@ def contact(request):
     return render(request, 'contact.html', {'form': form})
 
 
+@require_POST
+def enroll(request, slug):
+    """Claim a seat in a course for the logged-in student"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Please log in to enroll.'}, status=401)
+
+    student = Student.objects.filter(user=request.user).first()
+    if student is None:
+        return JsonResponse({'error': 'Only students can enroll in courses.'}, status=403)
+
+    course = get_object_or_404(Course, slug=slug, is_published=True)
+    try:
+        enroll_student(student, course)
+    except CourseFull as error:
+        return JsonResponse({'error': str(error)}, status=409)
+    except AlreadyEnrolled as error:
+        return JsonResponse({'error': str(error)}, status=409)
+
+    course.refresh_from_db(fields=['enrolled_students', 'max_students'])
+    return JsonResponse({
+        'status': 'enrolled',
+        'course': course.slug,
+        'seats_left': course.seats_left,
+    }, status=201)
+
+
+@require_safe
+def module_download(request, slug, module_id):
+    """Serve a module's attachment to enrolled students (free previews to everyone)"""
+    module = get_object_or_404(
+        Module.objects.select_related('course'),
+        pk=module_id, course__slug=slug, course__is_published=True,
+    )
+    if not module.attachment:
+        raise Http404('This module has no attachment.')
+    if not can_access_module(request.user, module):
+        raise PermissionDenied('Enroll in this course to download its materials.')
+    # Stored names are content hashes; offer a readable one instead
+    extension = os.path.splitext(module.attachment.name)[1]
+    try:
+        return serve_file(request, module.attachment, filename=f'{slugify(module.title)}{extension}')
+    except FileNotFoundError:
+        raise Http404('Attachment file is missing.')
+
+
+API_PAGE_SIZE = 12
+API_MAX_PAGE_SIZE = 50
+
+
+@require_safe
+def api_courses(request):
+    """Published courses as JSON, with the same filters and sorts as the courses page"""
+    filters = course_filters(request.GET)
+    courses_list = filter_courses(filters, Course.objects.select_related('category', 'instructor'))
+    try:
+        page_size = min(max(int(request.GET.get('page_size', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = API_PAGE_SIZE
+    page = Paginator(courses_list, page_size).get_page(request.GET.get('page'))
+    return JsonResponse({
+        'count': page.paginator.count,
+        'page': page.number,
+        'pages': page.paginator.num_pages,
+        'sort': filters['sort'],
+        'results': [
+            {
+                'title': course.title,
+                'url': course.get_absolute_url(),
+                'category': course.category.name if course.category else None,
+                'instructor': course.instructor.name if course.instructor else None,
+                'level': course.level,
+                'price': str(course.price),
+                'effective_price': str(course.effective_price),
+                'discount_percent': course.discount_percent,
+                'rating': str(course.rating),
+                'enrolled_students': course.enrolled_students,
+            }
+            for course in page
+        ],
+    })
+
+
+SUGGEST_MAX_QUERY = 100
+
+
+@require_safe
+def search_suggest(request):
+    """Autocomplete for the course search box, answered from memory"""
+    query = request.GET.get('q', '')[:SUGGEST_MAX_QUERY]
+    response = JsonResponse({'query': query, 'suggestions': suggest(query)})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@require_safe
+def sitemap(request, section=None):
+    """The pre-generated sitemap index or one of its sections (sitemaps.py)"""
+    found = read_sitemap(section_name(section) if section else INDEX_NAME,
+                         request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if found is None:
+        raise Http404("No such sitemap")
+    content, encoding = found
+    response = HttpResponse(content, content_type='application/xml; charset=utf-8')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=60 * 60)
+    return response
+
+
+@require_safe
+def robots_txt(request):
+    """Keep crawlers off the filter/search combinations; the sitemap lists what to index"""
+    response = render(request, 'robots.txt', {
+        'sitemap_url': absolute(reverse('sitemap')),
+    }, content_type='text/plain; charset=utf-8')
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
+
+
 # Update the about function in views.py
 def about(request):
     """About page"""
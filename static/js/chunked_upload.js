@@ -0,0 +1,141 @@
+// Resumable chunked uploads for admin file inputs marked with data-chunked-upload
+// (see elearning_app/uploads.py for the protocol).
+(function () {
+    "use strict";
+
+    function csrfToken() {
+        var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        if (match) {
+            return decodeURIComponent(match[1]);
+        }
+        var input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function request(method, url, body, headers) {
+        headers = Object.assign({'X-CSRFToken': csrfToken()}, headers || {});
+        if (body && !(body instanceof Blob)) {
+            headers['Content-Type'] = 'application/json';
+            body = JSON.stringify(body);
+        }
+        return fetch(url, {method: method, body: body, headers: headers, credentials: 'same-origin'})
+            .then(function (response) {
+                return response.json().then(function (data) {
+                    data.httpStatus = response.status;
+                    if (!response.ok && response.status !== 409) {
+                        throw new Error(data.error || ('Upload failed (' + response.status + ')'));
+                    }
+                    return data;
+                });
+            });
+    }
+
+    function sha256(blob) {
+        return blob.arrayBuffer().then(function (buffer) {
+            return crypto.subtle.digest('SHA-256', buffer);
+        });
+    }
+
+    function toBase64(buffer) {
+        return btoa(String.fromCharCode.apply(null, new Uint8Array(buffer)));
+    }
+
+    function toHex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function (byte) {
+            return ('0' + byte.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function upload(input, file, status) {
+        var startUrl = input.dataset.chunkedUpload;
+        var hidden = input.form.querySelector('input[name="' + input.name + '_upload"]');
+        var submits = input.form.querySelectorAll('[type="submit"]');
+        var digests = [];
+
+        function setBusy(busy) {
+            submits.forEach(function (button) { button.disabled = busy; });
+        }
+
+        function report(offset, size) {
+            status.textContent = 'Uploading ' + file.name + ': ' + Math.floor(offset * 100 / size) + '%';
+        }
+
+        function digestFor(index, chunkSize) {
+            // Chunks sent before a resume are hashed again locally; only the bytes go over the wire once
+            if (digests[index]) {
+                return Promise.resolve(digests[index]);
+            }
+            var start = index * chunkSize;
+            return sha256(file.slice(start, start + chunkSize)).then(function (digest) {
+                digests[index] = digest;
+                return digest;
+            });
+        }
+
+        function sendFrom(state) {
+            report(state.offset, file.size);
+            if (state.offset >= file.size) {
+                return state;
+            }
+            var chunk = file.slice(state.offset, state.offset + state.chunk_size);
+            var index = Math.floor(state.offset / state.chunk_size);
+            return digestFor(index, state.chunk_size).then(function (digest) {
+                return request('PUT', startUrl + state.id + '/', chunk, {
+                    'Upload-Offset': String(state.offset),
+                    'Upload-Checksum': 'sha256 ' + toBase64(digest)
+                });
+            }).then(function (data) {
+                // 409: the server has a different offset (e.g. a retried chunk already landed)
+                state.offset = data.offset;
+                return sendFrom(state);
+            });
+        }
+
+        function finish(state) {
+            var count = Math.ceil(file.size / state.chunk_size);
+            var all = [];
+            for (var index = 0; index < count; index++) {
+                all.push(digestFor(index, state.chunk_size));
+            }
+            return Promise.all(all).then(function (parts) {
+                var joined = new Uint8Array(parts.length * 32);
+                parts.forEach(function (part, index) { joined.set(new Uint8Array(part), index * 32); });
+                return crypto.subtle.digest('SHA-256', joined);
+            }).then(function (checksum) {
+                return request('POST', startUrl + state.id + '/complete/', {checksum: toHex(checksum)});
+            });
+        }
+
+        setBusy(true);
+        hidden.value = '';
+        return request('POST', startUrl, {filename: file.name, size: file.size})
+            .then(sendFrom)
+            .then(finish)
+            .then(function (data) {
+                hidden.value = data.id;
+                // The bytes are on the server already; don't post them again with the form
+                input.value = '';
+                status.textContent = file.name + ' uploaded. Save to attach it.';
+            })
+            .catch(function (error) {
+                status.textContent = error.message + ' Choose the file again to resume.';
+            })
+            .finally(function () {
+                setBusy(false);
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        if (!window.crypto || !crypto.subtle || !window.fetch) {
+            return;  // Falls back to a normal form upload
+        }
+        document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(function (input) {
+            var status = input.form.querySelector('.chunked-upload-status[data-for="' + input.name + '"]');
+            input.addEventListener('change', function () {
+                if (input.files.length) {
+                    upload(input, input.files[0], status);
+                }
+            });
+        });
+    });
+})();
@@ -0,0 +1,46 @@
+// Infinite scrolling for the courses grid: the "Load more" block is replaced by
+// batches of cards fetched from its data-next-cards URL as it comes into view.
+(function () {
+    "use strict";
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var sentinel = document.querySelector('[data-next-cards]');
+        var grid = document.getElementById('course-grid');
+        if (!sentinel || !grid || !window.IntersectionObserver || !window.fetch) {
+            return;  // The "Load more" link still works
+        }
+        var next = sentinel.dataset.nextCards;
+        var loading = false;
+
+        var observer = new IntersectionObserver(function (entries) {
+            if (!entries[0].isIntersecting || loading || !next) {
+                return;
+            }
+            loading = true;
+            fetch(next, {credentials: 'same-origin'})
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error('Could not load more courses');
+                    }
+                    next = response.headers.get('X-Next-Page');
+                    return response.text();
+                })
+                .then(function (html) {
+                    grid.insertAdjacentHTML('beforeend', html);
+                    if (!next) {
+                        observer.disconnect();
+                        sentinel.remove();
+                    }
+                })
+                .catch(function () {
+                    // Leave the link for a normal page load
+                    observer.disconnect();
+                })
+                .finally(function () {
+                    loading = false;
+                });
+        }, {rootMargin: '600px 0px'});
+
+        observer.observe(sentinel);
+    });
+})();
@@ -0,0 +1,98 @@
+// Search-as-you-type suggestions for inputs marked with data-suggest-url
+// (answered by elearning_app/suggest.py).
+(function () {
+    "use strict";
+
+    var DEBOUNCE_MS = 80;
+    var LABELS = {course: 'Course', category: 'Category', instructor: 'Instructor'};
+
+    function attach(input) {
+        var list = input.closest('form').querySelector('.search-suggestions');
+        var timer = null;
+        var latest = '';
+        var cache = {};
+
+        function hide() {
+            list.hidden = true;
+            list.innerHTML = '';
+        }
+
+        function show(suggestions) {
+            list.innerHTML = '';
+            suggestions.forEach(function (item) {
+                var link = document.createElement('a');
+                link.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+                link.href = item.url;
+                var label = document.createElement('span');
+                label.textContent = item.label;
+                var kind = document.createElement('small');
+                kind.className = 'text-muted';
+                kind.textContent = LABELS[item.type] || '';
+                link.appendChild(label);
+                link.appendChild(kind);
+                list.appendChild(link);
+            });
+            list.hidden = suggestions.length === 0;
+        }
+
+        function lookup(query) {
+            if (cache[query]) {
+                show(cache[query]);
+                return;
+            }
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    cache[query] = data.suggestions;
+                    // Answers can arrive out of order; only the newest query is shown
+                    if (query === latest) {
+                        show(data.suggestions);
+                    }
+                })
+                .catch(hide);
+        }
+
+        input.addEventListener('input', function () {
+            latest = input.value.trim();
+            clearTimeout(timer);
+            if (!latest) {
+                hide();
+                return;
+            }
+            timer = setTimeout(function () { lookup(latest); }, DEBOUNCE_MS);
+        });
+
+        input.addEventListener('keydown', function (event) {
+            if (event.key === 'Escape') {
+                hide();
+            } else if (event.key === 'ArrowDown' && !list.hidden) {
+                event.preventDefault();
+                list.firstChild.focus();
+            }
+        });
+
+        list.addEventListener('keydown', function (event) {
+            var current = document.activeElement;
+            if (event.key === 'ArrowDown' && current.nextSibling) {
+                event.preventDefault();
+                current.nextSibling.focus();
+            } else if (event.key === 'ArrowUp') {
+                event.preventDefault();
+                (current.previousSibling || input).focus();
+            } else if (event.key === 'Escape') {
+                hide();
+                input.focus();
+            }
+        });
+
+        document.addEventListener('click', function (event) {
+            if (!list.contains(event.target) && event.target !== input) {
+                hide();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('input[data-suggest-url]').forEach(attach);
+    });
+})();